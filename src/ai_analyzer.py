@@ -1,9 +1,18 @@
 import json
-
-from anthropic import Anthropic
+import math
 import os
-from dotenv import load_dotenv
-from src.vision_analyzer import analyze_image_with_vision
+import threading
+from src.vision_analyzer import VisionPipeline
+from src.verdict_schema import (
+    FIX_TOOL,
+    PARAGRAPHS_TOOL,
+    VERDICT_TOOL,
+    TokenBudget,
+    invalid_fields,
+    paragraph_verdicts_tool,
+    verdict_schema,
+    verdict_tool
+)
 
 from src.semantic_validator import (
     analyze_links,
@@ -12,7 +21,52 @@ from src.semantic_validator import (
     enrich_elements
 )
 
-load_dotenv()
+
+MODEL = "claude-sonnet-4-20250514"
+
+# Readability chunks: estimated input tokens and paragraphs per request, requests per page (None for no limit)
+TEXT_CHUNK_TOKENS = 2000
+TEXT_CHUNK_PARAGRAPHS = 12
+MAX_TEXT_CHUNKS = None
+
+
+def _estimate_tokens(block: dict) -> int:
+    # About four characters per token, plus the paragraph's header line
+    return len(block.get("text") or "") // 4 + 25
+
+
+def chunk_text_blocks(blocks: list, max_tokens=TEXT_CHUNK_TOKENS, max_paragraphs=TEXT_CHUNK_PARAGRAPHS) -> list:
+    """
+    Groups consecutive text blocks with the same heading_context into sections
+    and packs them, in page order, into chunks of at most max_tokens and
+    max_paragraphs. A section that fits is never split.
+    Returns the chunks as lists of indices into blocks.
+    """
+    sections = []
+    for i, block in enumerate(blocks):
+        heading = block.get("heading_context") or ""
+        if sections and sections[-1][0] == heading:
+            sections[-1][1].append(i)
+        else:
+            sections.append((heading, [i]))
+
+    chunks, current, used = [], [], 0
+    for _, indices in sections:
+        size = sum(_estimate_tokens(blocks[i]) for i in indices)
+        # Start a new chunk rather than split a section that fits in one
+        if current and (used + size > max_tokens or len(current) + len(indices) > max_paragraphs):
+            chunks.append(current)
+            current, used = [], 0
+        for i in indices:
+            tokens = _estimate_tokens(blocks[i])
+            if current and (used + tokens > max_tokens or len(current) >= max_paragraphs):
+                chunks.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
 
 
 class AIAnalyzer:
@@ -21,10 +75,46 @@ class AIAnalyzer:
     semantic analysis using the Claude API.
     """
 
-    def __init__(self):
-        self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-    def analyze(self, elements: dict) -> dict:
+    def __init__(self, use_vision=True, client=None, cassette=None, cassette_mode=None, cassette_match=None,
+                 max_text_chunks=MAX_TEXT_CHUNKS):
+        """
+        cassette: file to record responses to or replay them from (see CassetteClient),
+        defaults to the AI_CASSETTE environment variable, as do AI_CASSETTE_MODE
+        ('replay', 'record' or 'auto') and AI_CASSETTE_MATCH ('strict' or 'lenient')
+        max_text_chunks: readability requests per page, None to assess every paragraph;
+        paragraphs beyond the limit are marked {"skipped": "chunk_limit"}
+        """
+        self.max_text_chunks = max_text_chunks
+        cassette = cassette or os.getenv("AI_CASSETTE")
+        if cassette:
+            from src.ai_cassette import CassetteClient
+
+            # Replay needs no API key, the real client is only created when recording
+            client = CassetteClient(
+                cassette,
+                mode=cassette_mode or os.getenv("AI_CASSETTE_MODE", "replay"),
+                match=cassette_match or os.getenv("AI_CASSETTE_MATCH", "strict"),
+                client=client
+            )
+        # The client pools HTTP connections, so long running processes should share one
+        if client is None:
+            # Imported here so code paths without AI never load the SDK
+            from anthropic import Anthropic
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.client = client
+        # Output token limits per criterion, tuned from the tokens verdicts use
+        self.token_budget = TokenBudget()
+        self.stats = {"calls": 0, "output_tokens": 0, "reasks": 0, "invalid_after_reask": 0, "text_fallbacks": 0,
+                      "invalid_paragraphs": 0}
+        # Analyzers are shared by service and load test threads
+        self._lock = threading.Lock()
+        # One pipeline per analyzer so identical images are described once across pages
+        self.vision = VisionPipeline(describe=self._describe_image) if use_vision else None
+
+    def analyze(self, elements: dict, base_url: str = None) -> dict:
         """
                Main entry point for AI analysis.
 
@@ -41,7 +131,7 @@ class AIAnalyzer:
         links_advice = self._analyze_links_with_ai(enriched["links"])
 
         print("Analyzing images with AI...")
-        images_advice = self._analyze_images_with_ai(enriched["images"])
+        images_advice = self._analyze_images_with_ai(enriched["images"], base_url)
 
         print("Analyzing text readability with AI...")
         text_advice = self._analyze_text_blocks(enriched["text_blocks"])
@@ -74,19 +164,10 @@ Semantic Role: {link.get('semantic_role', 'unknown')}
 
 Evaluate whether a screen reader user can understand this link's purpose without visual context.
 
-Respond with ONLY a JSON object (no markdown backticks):
-{{
-  "is_accessible": true or false,
-  "wcag_criterion": "2.4.4",
-  "severity": "critical" or "serious" or "moderate" or "minor" or null,
-  "issue": "brief description if problematic, or null",
-  "recommendation": "specific improvement or null",
-  "reasoning": "brief explanation"
-}}"""
+Report your verdict with the {VERDICT_TOOL} tool."""
 
             try:
-                ai_result = self._ask_claude(prompt)
-                parsed = self._parse_json_response(ai_result)
+                parsed = self._ask_verdict(prompt, "2.4.4")
             except Exception as e:
                 print(f"AI analysis failed for link '{link.get('text')}': {e}")
                 parsed = {"error": str(e)}
@@ -99,7 +180,7 @@ Respond with ONLY a JSON object (no markdown backticks):
 
         return results
 
-    def _analyze_images_with_ai(self, images: list) -> list:
+    def _analyze_images_with_ai(self, images: list, base_url: str = None) -> list:
         """
             Evaluates alt text quality using WCAG 1.1.1.
             Combines rule-based alt text validation with AI interpretation of context and vision-based semantic consistency check
@@ -117,25 +198,13 @@ Respond with ONLY a JSON object (no markdown backticks):
 
             Evaluate whether the alt text appropriately describes the image for screen reader users.
 
-            Respond with ONLY a JSON object (no markdown backticks):
-            {{
-              "is_accessible": true or false,
-              "wcag_criterion": "1.1.1",
-              "severity": "critical" or "serious" or "moderate" or "minor" or null,
-              "issue": "brief description if problematic, or null",
-              "recommendation": "specific alt text suggestion or null",
-              "reasoning": "brief explanation"
-            }}"""
+            Report your verdict with the {VERDICT_TOOL} tool, recommending specific alt text if needed."""
 
             try:
-                ai_result = self._ask_claude(prompt)
-                parsed = self._parse_json_response(ai_result)
-                vision_result = analyze_image_with_vision(
-                    image=image,
-                    # Cross-check AI reasoning with vision-based image meaning
-                    vision_description=parsed.get("reasoning", "")
-                )
-                parsed["vision_validation"] = vision_result
+                parsed = self._ask_verdict(prompt, "1.1.1")
+                if self.vision:
+                    # Cross-check alt text with what the image actually shows
+                    parsed["vision_validation"] = self.vision.validate(image, base_url)
             except Exception as e:
                 print(f" AI analysis failed for image: {e}")
                 parsed = {"error": str(e),
@@ -152,61 +221,223 @@ Respond with ONLY a JSON object (no markdown backticks):
     def _analyze_text_blocks(self, blocks: list) -> list:
         """
            Evaluates text complexity using WCAG 3.1.5 (Reading Level).
+           Paragraphs rated easy by the rule check are skipped; the others are sent
+           in section-grouped chunks, one call per chunk with a verdict per paragraph.
         """
         results = []
-
-        for block in blocks[:5]:
+        for block in blocks:
             readability = analyze_readability(block.get("text", ""))
+            results.append({
+                "text_block": block,
+                "readability": readability,
+                "ai_analysis": {"skipped": "easy"} if readability["level"] == "easy" else None
+            })
 
-            prompt = f"""You are a WCAG accessibility expert. Analyze this text for WCAG 3.1.5 (Reading Level).
-
-Text: "{block.get('text')[:500]}"
-Word Count: {block.get('word_count', 0)}
-Heading: {block.get('heading_context', 'No heading')}
-Semantic Role: {block.get('semantic_role', 'unknown')}
+        pending = [item for item in results if item["ai_analysis"] is None]
+        chunks = chunk_text_blocks([item["text_block"] for item in pending])
+        if self.max_text_chunks is not None and len(chunks) > self.max_text_chunks:
+            for chunk in chunks[self.max_text_chunks:]:
+                for i in chunk:
+                    pending[i]["ai_analysis"] = {"skipped": "chunk_limit"}
+            print(f" Text is {len(chunks)} chunks, assessing the first {self.max_text_chunks}")
+            chunks = chunks[:self.max_text_chunks]
+
+        for chunk in chunks:
+            items = [pending[i] for i in chunk]
+            try:
+                verdicts = self._ask_paragraph_verdicts(self._text_chunk_prompt(items), len(items))
+            except Exception as e:
+                print(f" AI analysis failed for text chunk: {e}")
+                verdicts = [{"error": str(e)} for _ in items]
+            for item, verdict in zip(items, verdicts):
+                item["ai_analysis"] = verdict
 
-Current readability: {readability.get('level')} 
-(avg {readability.get('avg_words_per_sentence')} words/sentence)
+        print(f"   - {len(pending)} of {len(blocks)} text blocks sent in {len(chunks)} request(s), "
+              f"{len(blocks) - len(pending)} rated easy")
+        return results
 
-Evaluate whether this text is understandable for a broad audience (general public education level).
+    def _text_chunk_prompt(self, items: list) -> str:
+        paragraphs = []
+        heading = None
+        for number, item in enumerate(items, 1):
+            block, readability = item["text_block"], item["readability"]
+            if block.get("heading_context") != heading or number == 1:
+                heading = block.get("heading_context")
+                paragraphs.append(f"Section: {heading or 'No heading'}")
+            paragraphs.append(f"[{number}] ({block.get('word_count', 0)} words, readability {readability.get('level')}, "
+                              f"avg {readability.get('avg_words_per_sentence')} words/sentence, "
+                              f"role {block.get('semantic_role', 'unknown')})\n"
+                              f"Text: \"{block.get('text')}\"")
+        text = "\n\n".join(paragraphs)
 
-Respond with ONLY a JSON object (no markdown backticks):
-{{
-  "is_accessible": true or false,
-  "wcag_criterion": "3.1.5",
-  "severity": "moderate" or "minor" or null,
-  "issue": "brief description if too complex, or null",
-  "recommendation": "how to simplify or null",
-  "reasoning": "brief explanation"
-}}"""
+        return f"""You are a WCAG accessibility expert. Analyze these paragraphs of one page for WCAG 3.1.5 (Reading Level).
 
-            try:
-                ai_result = self._ask_claude(prompt)
-                parsed = self._parse_json_response(ai_result)
-            except Exception as e:
-                print(f" AI analysis failed for text block: {e}")
-                parsed = {"error": str(e)}
+{text}
 
-            results.append({
-                "text_block": block,
-                "readability": readability,
-                "ai_analysis": parsed
-            })
+Evaluate for each numbered paragraph whether it is understandable for a broad audience (general public education level).
 
-        return results
+Report one verdict per paragraph with the {PARAGRAPHS_TOOL} tool, recommending how to simplify where needed."""
 
-    def _ask_claude(self, prompt: str) -> str:
-        #Send prompt to Claude and return response text
-        response = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            temperature=0,
-            messages=[
-                {"role": "user", "content": prompt}
+    def _ask_paragraph_verdicts(self, prompt: str, count: int) -> list:
+        """
+        Asks for the verdicts of count numbered paragraphs in one call.
+        Paragraphs with a missing or invalid verdict are re-asked once, together,
+        like _ask_verdict does. Returns one verdict per paragraph, in order;
+        fields still invalid are set to None and listed under 'invalid_fields',
+        a verdict still missing is an error.
+        """
+        tool = paragraph_verdicts_tool("3.1.5", count)
+        messages = [{"role": "user", "content": prompt}]
+        response = self._create_with_tool("3.1.5", messages, [tool], PARAGRAPHS_TOOL, items=count)
+        tool_use = self._tool_use(response, PARAGRAPHS_TOOL)
+        if tool_use is None:
+            self._count("text_fallbacks")
+            text = "".join(getattr(block, "text", "") for block in response.content)
+            answer = self._parse_json_response(text)
+        else:
+            answer = tool_use.input
+
+        schema = verdict_schema("3.1.5")
+        verdicts, problems = self._check_paragraphs(answer, range(1, count + 1), schema)
+        if problems and tool_use is not None:
+            self._count("reasks")
+            numbers = sorted(problems)
+            messages += [
+                {"role": "assistant", "content": [
+                    {"type": "tool_use", "id": tool_use.id, "name": PARAGRAPHS_TOOL, "input": tool_use.input}]},
+                {"role": "user", "content": [{
+                    "type": "tool_result", "tool_use_id": tool_use.id, "is_error": True,
+                    "content": "; ".join(f"Paragraph {n}: {problems[n]}" for n in numbers)
+                }]}
+            ]
+            fix_tool = paragraph_verdicts_tool("3.1.5", count, numbers)
+            response = self._create_with_tool("3.1.5", messages, [tool, fix_tool], FIX_TOOL, items=len(numbers))
+            fixed = self._tool_use(response, FIX_TOOL)
+            if fixed is not None:
+                fixed_verdicts, still_invalid = self._check_paragraphs(fixed.input, numbers, schema)
+                for number in numbers:
+                    if number not in still_invalid:
+                        verdicts[number] = fixed_verdicts[number]
+                        del problems[number]
+
+        for number in problems:
+            if "invalid_fields" in verdicts[number]:
+                self._count("invalid_paragraphs")
+        return [verdicts[number] for number in range(1, count + 1)]
+
+    def _check_paragraphs(self, answer, numbers, schema):
+        # Returns ({paragraph: verdict}, {paragraph: what is wrong with its verdict})
+        items = answer.get("verdicts") if isinstance(answer.get("verdicts"), list) else []
+        by_paragraph = {item.get("paragraph"): item for item in items if isinstance(item, dict)}
+
+        verdicts, problems = {}, {}
+        for number in numbers:
+            if number not in by_paragraph:
+                verdicts[number] = {"error": "No verdict for this paragraph"}
+                problems[number] = "verdict missing"
+                continue
+            verdict = {field: by_paragraph[number].get(field) for field in schema["properties"]
+                       if field in by_paragraph[number]}
+            invalid = invalid_fields(verdict, schema)
+            if invalid:
+                verdict.update(dict.fromkeys(invalid))
+                verdict["invalid_fields"] = sorted(invalid)
+                problems[number] = "; ".join(f"{f} {invalid[f]}" for f in sorted(invalid))
+            verdicts[number] = verdict
+        return verdicts, problems
+
+    def _ask_verdict(self, prompt: str, criterion: str) -> dict:
+        """
+        Asks for a verdict through the criterion's tool schema and validates it.
+        Invalid fields are re-asked once, on their own; fields still invalid
+        after that are set to None and listed under 'invalid_fields'.
+        """
+        tool = verdict_tool(criterion)
+        messages = [{"role": "user", "content": prompt}]
+        response = self._create_with_tool(criterion, messages, [tool], VERDICT_TOOL)
+        tool_use = self._tool_use(response, VERDICT_TOOL)
+        if tool_use is None:
+            # A plain text answer, e.g. from a cassette recorded before tool use
+            self._count("text_fallbacks")
+            text = "".join(getattr(block, "text", "") for block in response.content)
+            return self._parse_json_response(text)
+
+        verdict = dict(tool_use.input)
+        problems = invalid_fields(verdict, tool["input_schema"])
+        if problems:
+            self._count("reasks")
+            fields = sorted(problems)
+            messages += [
+                {"role": "assistant", "content": [
+                    {"type": "tool_use", "id": tool_use.id, "name": VERDICT_TOOL, "input": tool_use.input}]},
+                {"role": "user", "content": [{
+                    "type": "tool_result", "tool_use_id": tool_use.id, "is_error": True,
+                    "content": "Invalid fields: " + "; ".join(f"{f} {problems[f]}" for f in fields)
+                }]}
             ]
+            response = self._create_with_tool(criterion, messages, [tool, verdict_tool(criterion, fields)], FIX_TOOL)
+            fixed = self._tool_use(response, FIX_TOOL)
+            if fixed is not None:
+                verdict.update({f: fixed.input[f] for f in fields if f in fixed.input})
+
+            problems = invalid_fields(verdict, tool["input_schema"])
+            if problems:
+                self._count("invalid_after_reask")
+                verdict.update(dict.fromkeys(problems))
+                verdict["invalid_fields"] = sorted(problems)
+
+        # Fields outside the schema are dropped
+        return {field: verdict.get(field) for field in list(tool["input_schema"]["properties"]) + ["invalid_fields"]
+                if field in verdict}
+
+    def _create_with_tool(self, criterion, messages, tools, tool_name, items=1):
+        # Limits are per verdict, a call for several paragraphs gets one per paragraph
+        # Re-asks answer only part of a verdict, so only full verdicts tune the limit
+        response = self.client.messages.create(
+            model=MODEL,
+            max_tokens=self.token_budget.limit(criterion) * items,
+            tools=tools,
+            tool_choice={"type": "tool", "name": tool_name},
+            messages=messages,
+            # Sent as extra body field: recent SDK versions dropped the temperature argument
+            extra_body={"temperature": 0}
+        )
+        output_tokens = getattr(getattr(response, "usage", None), "output_tokens", 0) or 0
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["output_tokens"] += output_tokens
+            if tool_name != FIX_TOOL:
+                self.token_budget.record(criterion, math.ceil(output_tokens / items),
+                                         truncated=response.stop_reason == "max_tokens")
+        return response
+
+    def _tool_use(self, response, name):
+        for block in response.content:
+            if getattr(block, "type", None) == "tool_use" and block.name == name:
+                return block
+        return None
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _describe_image(self, image_data: str, media_type: str) -> str:
+        #Ask Claude to describe a base64 encoded image in one sentence
+        response = self.client.messages.create(
+            model=MODEL,
+            max_tokens=150,
+            extra_body={"temperature": 0},
+            messages=[{
+                "role": "user",
+                "content": [
+                    {"type": "image", "source": {"type": "base64", "media_type": media_type, "data": image_data}},
+                    {"type": "text", "text": "Describe what this image shows in one short sentence, "
+                                             "as you would for alt text. Reply with the sentence only."}
+                ]
+            }]
         )
 
-        return response.content[0].text
+        return response.content[0].text.strip()
 
     def _parse_json_response(self, response: str) -> dict:
         """Parse Claude's JSON response, handling Markdown code blocks"""
@@ -0,0 +1,211 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+from types import SimpleNamespace
+
+CASSETTE_FORMAT = "ai-cassette/1"
+
+MODES = ["record", "replay", "auto"]
+
+MATCHING = ["strict", "lenient"]
+
+
+class CassetteMissError(Exception):
+    """A request in replay mode that is not in the cassette"""
+
+
+def _hash(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def normalize_request(kwargs: dict) -> dict:
+    """
+    The request as stored in the cassette: everything passed to
+    messages.create, with base64 image data replaced by its hash.
+    """
+    def strip_images(value):
+        if isinstance(value, dict):
+            if value.get("type") == "base64" and "data" in value:
+                return {**value, "data": f"sha256:{_hash(value['data'])}"}
+            return {k: strip_images(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [strip_images(v) for v in value]
+        return value
+
+    return strip_images(kwargs)
+
+
+def prompt_text(request: dict) -> str:
+    """All text blocks of the request messages, for error messages and lenient matching"""
+    parts = []
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for block in content or []:
+            if block.get("type") == "text":
+                parts.append(block["text"])
+            elif block.get("type") == "image":
+                parts.append(f"[image {block['source'].get('data', '')}]")
+            elif block.get("type") == "tool_use":
+                parts.append(f"[tool_use {block.get('name')} {json.dumps(block.get('input'), sort_keys=True)}]")
+            elif block.get("type") == "tool_result":
+                parts.append(f"[tool_result {json.dumps(block.get('content'), sort_keys=True)}]")
+    return "\n".join(parts)
+
+
+def request_key(request: dict, match: str = "strict") -> str:
+    """
+    strict: the whole request (model, tools, messages ...) except max_tokens,
+    which the TokenBudget tunes at runtime, so a recording replays under any
+    concurrency or budget history
+    lenient: the prompt text with whitespace collapsed plus the tools and
+    tool_choice, so model upgrades and prompt re-indentation still replay
+    """
+    if match == "lenient":
+        tools = json.dumps([request.get("tools"), request.get("tool_choice")], sort_keys=True, default=str)
+        return _hash(re.sub(r"\s+", " ", prompt_text(request)).strip() + "\n" + tools)
+    request = {key: value for key, value in request.items() if key != "max_tokens"}
+    return _hash(json.dumps(request, sort_keys=True, default=str))
+
+
+def response_to_dict(response) -> dict:
+    blocks = []
+    for block in response.content:
+        if hasattr(block, "model_dump"):
+            blocks.append(block.model_dump())
+        else:
+            blocks.append({k: v for k, v in vars(block).items() if not k.startswith("_")})
+    usage = getattr(response, "usage", None)
+    return {
+        "content": blocks,
+        "stop_reason": getattr(response, "stop_reason", None),
+        "model": getattr(response, "model", None),
+        "usage": {
+            "input_tokens": getattr(usage, "input_tokens", 0),
+            "output_tokens": getattr(usage, "output_tokens", 0)
+        }
+    }
+
+
+def response_from_dict(data: dict):
+    """Rebuilds a response with the attributes the analyzer reads (content[i].text, stop_reason, usage)"""
+    return SimpleNamespace(
+        content=[SimpleNamespace(**block) for block in data["content"]],
+        stop_reason=data.get("stop_reason"),
+        model=data.get("model"),
+        usage=SimpleNamespace(**data.get("usage", {}))
+    )
+
+
+class CassetteClient:
+    """
+    Stand-in for the Anthropic client that records messages.create calls to a
+    cassette file or replays them from it.
+
+    Modes:
+        record: every call goes to the real client and is appended to the cassette
+        replay: calls are answered from the cassette only, unknown requests raise CassetteMissError
+        auto: replay what is recorded, record the rest
+
+    The cassette is a JSON lines file: a header line, then one interaction
+    (request, response) per line, so interrupted recordings stay readable.
+
+    Args:
+        path (str): Cassette file
+        mode (str): 'record', 'replay' or 'auto'
+        match (str): 'strict' or 'lenient', see request_key
+        client: Real Anthropic client, created from ANTHROPIC_API_KEY when needed
+    """
+
+    def __init__(self, path, mode="replay", match="strict", client=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', use one of {MODES}")
+        if match not in MATCHING:
+            raise ValueError(f"Unknown cassette matching '{match}', use one of {MATCHING}")
+        if mode == "replay" and not os.path.exists(path):
+            raise FileNotFoundError(f"Cassette {path} does not exist, record it first with mode='record'")
+
+        self.path = path
+        self.mode = mode
+        self.match = match
+        self._client = client
+        self._lock = threading.Lock()
+        self.interactions = {}
+        self.stats = {"replayed": 0, "recorded": 0, "missed": 0}
+        self.messages = SimpleNamespace(create=self.create)
+
+        if mode == "record" and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            self._load()
+
+    def create(self, **kwargs):
+        request = normalize_request(kwargs)
+        key = request_key(request, self.match)
+
+        with self._lock:
+            interaction = self.interactions.get(key) if self.mode != "record" else None
+            if interaction is not None:
+                self.stats["replayed"] += 1
+            elif self.mode == "replay":
+                self.stats["missed"] += 1
+        if interaction is not None:
+            return response_from_dict(interaction["response"])
+        if self.mode == "replay":
+            raise CassetteMissError(self._miss_message(request))
+
+        response = self._real_client().messages.create(**kwargs)
+        self._record(key, request, response_to_dict(response))
+        return response
+
+    def _record(self, key, request, response):
+        interaction = {"key": key, "request": request, "response": response}
+        with self._lock:
+            if key in self.interactions:
+                return
+            self.interactions[key] = interaction
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if new_file:
+                    f.write(json.dumps({"format": CASSETTE_FORMAT, "match": self.match}) + "\n")
+                f.write(json.dumps(interaction, default=str) + "\n")
+            self.stats["recorded"] += 1
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("format") != CASSETTE_FORMAT:
+                raise ValueError(f"{self.path} is not an {CASSETTE_FORMAT} cassette")
+            for line in f:
+                if not line.strip():
+                    continue
+                interaction = json.loads(line)
+                # Keys are recomputed, so a strict recording also replays leniently
+                self.interactions.setdefault(request_key(interaction["request"], self.match), interaction)
+
+    def _real_client(self):
+        if self._client is None:
+            from anthropic import Anthropic
+            from dotenv import load_dotenv
+
+            # Same key lookup as AIAnalyzer, which skips its own when a cassette is set
+            load_dotenv()
+            self._client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        return self._client
+
+    def _miss_message(self, request):
+        prompt = prompt_text(request)
+        recorded = [prompt_text(i["request"]) for i in self.interactions.values()]
+        closest = difflib.get_close_matches(prompt, recorded, n=1, cutoff=0)
+        message = (f"No recorded response in {self.path} ({self.match} matching) for prompt:\n"
+                   f"{prompt[:300]}")
+        if closest:
+            diff = difflib.unified_diff(closest[0].splitlines(), prompt.splitlines(),
+                                        "recorded", "requested", lineterm="", n=0)
+            message += "\nClosest recorded prompt differs in:\n" + "\n".join(list(diff)[2:12])
+        return message + "\nRe-record with mode='record' or 'auto', or use lenient matching"
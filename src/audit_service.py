@@ -0,0 +1,388 @@
+import argparse
+import itertools
+import json
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.scraper import AccessibilityScraper, create_driver
+from src.tab_pool import TabPool
+
+
+class DriverPool:
+    """
+    Keeps a fixed number of warm Chrome drivers and hands them out one at a time.
+
+    A slot whose driver could not be replaced stays in the pool empty and
+    gets a new driver when it is next used. Drivers handed back after
+    close() are quit instead of kept.
+
+    Args:
+        size (int): Number of drivers
+        driver_factory (callable): Creates a new driver, defaults to create_driver
+    """
+
+    def __init__(self, size=2, driver_factory=None):
+        self.driver_factory = driver_factory or create_driver
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self.driver_factory())
+
+    @contextmanager
+    def driver(self):
+        driver = self._idle.get()
+        if driver is None:
+            try:
+                driver = self.driver_factory()
+            except Exception:
+                self._put_back(None)
+                raise
+        try:
+            yield driver
+        except Exception:
+            # A failed audit may leave the browser crashed or on a broken page
+            self._quit(driver)
+            driver = self._replacement()
+            raise
+        finally:
+            self._put_back(driver)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            while not self._idle.empty():
+                self._quit(self._idle.get_nowait())
+
+    def _replacement(self):
+        try:
+            return self.driver_factory()
+        except Exception as e:
+            print(f" Could not start a new driver ({e}), retrying on next use")
+            return None
+
+    def _put_back(self, driver):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(driver)
+                return
+        self._quit(driver)
+
+    def _quit(self, driver):
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+class AuditJob:
+    def __init__(self, urls, priority=0, options=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.urls = list(urls)
+        self.priority = priority
+        self.options = options or {}
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.results = []
+        self.errors = []
+        self.changed = threading.Condition()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "urls": len(self.urls),
+            "completed": len(self.results),
+            "failed": len(self.errors),
+            "errors": self.errors,
+            "created": self.created,
+            "finished": self.finished
+        }
+
+    def add(self, result: dict = None, error: dict = None):
+        with self.changed:
+            if result is not None:
+                self.results.append(result)
+            if error is not None:
+                self.errors.append(error)
+            if self.status == "running" and len(self.results) + len(self.errors) == len(self.urls):
+                self.status = "done"
+                self.finished = time.time()
+            self.changed.notify_all()
+
+    def cancel(self):
+        with self.changed:
+            if self.status in ("queued", "running"):
+                self.status = "cancelled"
+                self.finished = time.time()
+            self.changed.notify_all()
+
+
+class AuditService:
+    """
+    Long running audit service: a priority queue of page audits processed
+    by worker threads that share warm drivers and one AI analyzer.
+
+    Args:
+        workers (int): Concurrent page audits, one warm driver each
+        use_ai (bool): Create the shared AI analyzer at start instead of on the first AI job
+        driver_factory (callable): Creates drivers for the pool
+        audit_fn (callable): audit_fn(url, driver, options, ai_analyzer) -> dict, replaces the scraper
+        tabs (bool): Audit in tabs of one shared browser instead of one browser per worker
+        tab_options (dict): Extra TabPool arguments, e.g. tab_timeout and min_free_mb
+        job_ttl (float): Seconds a finished job and its results are kept, None to keep them until evicted by count
+        max_finished_jobs (int): Finished jobs kept at most, the oldest are dropped first
+    """
+
+    def __init__(self, workers=2, use_ai=False, driver_factory=None, audit_fn=None, tabs=False, tab_options=None,
+                 job_ttl=3600, max_finished_jobs=1000):
+        self.audit_fn = audit_fn or self._audit_page
+        if tabs:
+            self.pool = TabPool(workers, driver_factory, **(tab_options or {}))
+        else:
+            self.pool = DriverPool(workers, driver_factory)
+        self.jobs = {}
+        self.job_ttl = job_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs_lock = threading.Lock()
+        self._tasks = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._ai_analyzer = None
+        self._ai_lock = threading.Lock()
+        self._running = True
+
+        if use_ai:
+            self.ai_analyzer()
+
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def ai_analyzer(self):
+        # One analyzer (and HTTP client) for the whole process, created on first use
+        with self._ai_lock:
+            if self._ai_analyzer is None:
+                from src.ai_analyzer import AIAnalyzer
+                self._ai_analyzer = AIAnalyzer()
+            return self._ai_analyzer
+
+    def submit(self, urls, priority=0, options=None) -> AuditJob:
+        """Queues a job; higher priority jobs are processed first"""
+        job = AuditJob(urls, priority, options)
+        self.evict_finished()
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+        for url in job.urls:
+            self._tasks.put((-priority, next(self._sequence), job.id, url))
+        if not job.urls:
+            job.status = "done"
+            job.finished = time.time()
+        return job
+
+    def evict_finished(self) -> int:
+        """Drops finished jobs older than job_ttl and the oldest beyond max_finished_jobs; returns how many"""
+        with self._jobs_lock:
+            finished = sorted((job for job in self.jobs.values() if job.finished is not None),
+                              key=lambda job: job.finished)
+            cutoff = time.time() - self.job_ttl if self.job_ttl is not None else None
+            expired = [job for job in finished if cutoff is not None and job.finished < cutoff]
+            kept = finished[len(expired):]
+            if self.max_finished_jobs is not None and len(kept) > self.max_finished_jobs:
+                expired += kept[:len(kept) - self.max_finished_jobs]
+            for job in expired:
+                del self.jobs[job.id]
+        return len(expired)
+
+    def cancel(self, job_id: str) -> AuditJob:
+        job = self.jobs[job_id]
+        job.cancel()
+        return job
+
+    def stream(self, job_id: str, offset: int = 0, timeout: float = None):
+        """Yields results of a job as they arrive, until the job is finished"""
+        job = self.jobs[job_id]
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            with job.changed:
+                while len(job.results) <= offset and job.status in ("queued", "running"):
+                    remaining = deadline - time.time() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        return
+                    job.changed.wait(remaining)
+                pending = job.results[offset:]
+                finished = job.status not in ("queued", "running")
+            for result in pending:
+                yield result
+            offset += len(pending)
+            if finished and offset >= len(job.results):
+                return
+
+    def shutdown(self):
+        self._running = False
+        for _ in self._threads:
+            self._tasks.put((float("inf"), next(self._sequence), None, None))
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.pool.close()
+
+    def _work(self):
+        while self._running:
+            _, _, job_id, url = self._tasks.get()
+            if job_id is None:
+                return
+            # A cancelled job may already be evicted while its pages are still queued
+            job = self.jobs.get(job_id)
+            if job is None or job.status == "cancelled":
+                continue
+            if job.status == "queued":
+                job.status = "running"
+
+            try:
+                with self.pool.driver() as driver:
+                    ai = self.ai_analyzer() if job.options.get("use_ai") else None
+                    result = self.audit_fn(url, driver, job.options, ai)
+                job.add(result=result)
+            except Exception as e:
+                print(f" Audit failed for {url}: {e}")
+                job.add(error={"url": url, "error": str(e)})
+
+    def _audit_page(self, url, driver, options, ai_analyzer):
+        scraper = AccessibilityScraper(
+            url,
+            use_ai=ai_analyzer is not None,
+            ai_analyzer=ai_analyzer,
+            compact_axe=options.get("compact_axe", False),
+            driver=driver
+        )
+        return scraper.extract_data()
+
+
+def make_handler(service: AuditService):
+    """Builds the HTTP/JSON request handler bound to a service"""
+
+    class AuditRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts, query = self._route()
+            if parts == ["health"]:
+                return self._send(200, {"status": "ok", "jobs": len(service.jobs)})
+            if parts == ["jobs"]:
+                service.evict_finished()
+                return self._send(200, [job.summary() for job in list(service.jobs.values())])
+            if len(parts) == 2 and parts[0] == "jobs":
+                return self._with_job(parts[1], lambda job: self._send(200, job.summary()))
+            if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "results":
+                return self._with_job(parts[1], lambda job: self._stream(job, query))
+            self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            parts, _ = self._route()
+            if parts != ["jobs"]:
+                return self._send(404, {"error": "Not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                urls = body["urls"]
+                if isinstance(urls, str) or not all(isinstance(u, str) for u in urls):
+                    raise ValueError("'urls' must be a list of strings")
+                priority = int(body.get("priority", 0))
+                options = body.get("options", {})
+                if not isinstance(options, dict):
+                    raise ValueError("'options' must be an object")
+            except (KeyError, TypeError, ValueError) as e:
+                return self._send(400, {"error": f"Invalid job: {e}"})
+
+            job = service.submit(urls, priority, options)
+            self._send(201, job.summary())
+
+        def do_DELETE(self):
+            parts, _ = self._route()
+            if len(parts) == 2 and parts[0] == "jobs":
+                return self._with_job(parts[1], lambda job: self._send(200, service.cancel(job.id).summary()))
+            self._send(404, {"error": "Not found"})
+
+        def _route(self):
+            parsed = urlparse(self.path)
+            return [p for p in parsed.path.split("/") if p], parse_qs(parsed.query)
+
+        def _with_job(self, job_id, action):
+            if job_id not in service.jobs:
+                return self._send(404, {"error": f"Unknown job {job_id}"})
+            return action(service.jobs[job_id])
+
+        def _stream(self, job, query):
+            # Newline delimited JSON, one line per page result, flushed as results arrive
+            offset = int(query.get("offset", ["0"])[0])
+            wait = query.get("wait", ["1"])[0] != "0"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            results = service.stream(job.id, offset) if wait else job.results[offset:]
+            for result in results:
+                self.wfile.write(json.dumps(result, default=str).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return AuditRequestHandler
+
+
+def serve(service: AuditService, host="127.0.0.1", port=8765) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accessibility audit service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="warm browsers / concurrent audits")
+    parser.add_argument("--tabs", action="store_true", help="run the concurrent audits as tabs of one browser")
+    parser.add_argument("--tab-timeout", type=float, default=300, help="seconds one audit may use a tab")
+    parser.add_argument("--min-free-mb", type=int, default=500, help="available memory needed to open another tab")
+    parser.add_argument("--job-ttl", type=float, default=3600, help="seconds finished jobs and their results are kept")
+    parser.add_argument("--max-finished-jobs", type=int, default=1000, help="finished jobs kept at most")
+    parser.add_argument("--use-ai", action="store_true", help="create the AI client at startup")
+    parser.add_argument("--show-browser", action="store_true")
+    args = parser.parse_args(argv)
+
+    service = AuditService(
+        workers=args.workers,
+        use_ai=args.use_ai,
+        driver_factory=lambda: create_driver(headless=not args.show_browser),
+        tabs=args.tabs,
+        tab_options={"tab_timeout": args.tab_timeout, "min_free_mb": args.min_free_mb},
+        job_ttl=args.job_ttl,
+        max_finished_jobs=args.max_finished_jobs
+    )
+    server = serve(service, args.host, args.port)
+    print(f" Audit service listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import hashlib
+import json
+
+COMPACT_FORMAT = "axe-compact/1"
+
+# Rule level fields that axe repeats on every result entry
+RULE_FIELDS = ["description", "help", "helpUrl", "tags"]
+
+# Result groups in axe output, ordered by how useful they are for reporting
+RESULT_GROUPS = ["violations", "incomplete", "passes", "inapplicable"]
+
+CHECK_LISTS = ["any", "all", "none"]
+
+
+def compact_axe_results(axe_results: dict, html_limit: int = 200, hash_html: bool = False,
+                        passes: str = "counts", inapplicable: str = "counts") -> dict:
+    """
+    Converts raw axe-core output into a normalised, deduplicated form.
+
+    Rule metadata (description, help, helpUrl, tags) is stored once per rule,
+    check results and failure summaries are stored once in shared tables and
+    referenced by index from each node, and node HTML (also that of the
+    related nodes inside checks) is truncated or hashed.
+
+    Args:
+        axe_results (dict): Output of ``Axe.run()``
+        html_limit (int): Max characters of node HTML to keep (None keeps all)
+        hash_html (bool): Replace node HTML by its sha1 instead of truncating
+        passes (str): "full", "counts" or "drop" for passing rules
+        inapplicable (str): "full", "counts" or "drop" for inapplicable rules
+
+    Returns:
+        dict: Compact results, see ``expand_axe_results`` for the way back
+    """
+    if axe_results.get("format") == COMPACT_FORMAT:
+        return axe_results
+
+    modes = {"violations": "full", "incomplete": "full", "passes": passes, "inapplicable": inapplicable}
+    compact = {
+        "format": COMPACT_FORMAT,
+        "meta": {k: v for k, v in axe_results.items() if k not in RESULT_GROUPS},
+        "options": {"html_limit": html_limit, "hash_html": hash_html, "modes": modes},
+        "rules": {},
+        "checks": [],
+        "summaries": [],
+        "lossy": []
+    }
+    check_index = {}
+    summary_index = {}
+
+    def intern(table, index, value):
+        key = json.dumps(value, sort_keys=True, default=str)
+        if key not in index:
+            index[key] = len(table)
+            table.append(value)
+        return index[key]
+
+    for group in RESULT_GROUPS:
+        mode = modes[group]
+        entries = axe_results.get(group, []) or []
+
+        if mode == "drop":
+            if entries:
+                compact["lossy"].append(f"{group}:dropped")
+            continue
+
+        for entry in entries:
+            rule_id = entry.get("id")
+            compact["rules"].setdefault(rule_id, {f: entry.get(f) for f in RULE_FIELDS if f in entry})
+
+        if mode == "counts":
+            compact[group] = {entry.get("id"): {"nodes": len(entry.get("nodes", []) or []), "impact": entry.get("impact")}
+                              for entry in entries}
+            if any(entry.get("nodes") for entry in entries):
+                compact["lossy"].append(f"{group}:nodes")
+            continue
+
+        compact_entries = []
+        for entry in entries:
+            nodes = []
+            for node in entry.get("nodes", []) or []:
+                compact_node = {
+                    "target": node.get("target"),
+                    "impact": node.get("impact"),
+                }
+                compact_node.update(_compact_html(node.get("html", ""), html_limit, hash_html))
+                if compact_node.get("html_truncated") or "html_sha1" in compact_node:
+                    if "nodes:html" not in compact["lossy"]:
+                        compact["lossy"].append("nodes:html")
+
+                if "failureSummary" in node:
+                    compact_node["summary"] = intern(compact["summaries"], summary_index,
+                                                     node["failureSummary"])
+                # Lists are kept when axe sent them, even empty, so expanding adds none
+                for check_list in CHECK_LISTS:
+                    if check_list in node:
+                        checks = [_compact_check(c, html_limit, hash_html) for c in node[check_list] or []]
+                        if any(r.get("html_truncated") or "html_sha1" in r
+                               for c in checks for r in c.get("relatedNodes") or []):
+                            if "checks:html" not in compact["lossy"]:
+                                compact["lossy"].append("checks:html")
+                        compact_node[check_list] = [intern(compact["checks"], check_index, c) for c in checks]
+
+                extra = {k: v for k, v in node.items()
+                         if k not in ("target", "impact", "html", "failureSummary", *CHECK_LISTS)}
+                if extra:
+                    compact_node["extra"] = extra
+                nodes.append(compact_node)
+
+            compact_entries.append({
+                "id": entry.get("id"),
+                "impact": entry.get("impact"),
+                "nodes": nodes
+            })
+        compact[group] = compact_entries
+
+    return compact
+
+
+def expand_axe_results(compact: dict) -> dict:
+    """
+    Rebuilds the original axe-core result shape from ``compact_axe_results`` output.
+
+    Everything that survived compaction is restored exactly. Whatever was lost
+    (truncated or hashed HTML, nodes of rules kept as counts, dropped groups)
+    is listed under ``_lossy`` so callers know the result is not complete.
+    """
+    if compact.get("format") != COMPACT_FORMAT:
+        return compact
+
+    rules = compact.get("rules", {})
+    checks = [_expand_check(check) for check in compact.get("checks", [])]
+    summaries = compact.get("summaries", [])
+
+    expanded = dict(compact.get("meta", {}))
+
+    for group in RESULT_GROUPS:
+        value = compact.get(group)
+        if value is None:
+            expanded[group] = []
+            continue
+
+        entries = []
+        if isinstance(value, dict):
+            # Counts only: restore the rule entry without its nodes
+            for rule_id, counts in value.items():
+                # Older compact results stored the node count alone
+                if not isinstance(counts, dict):
+                    counts = {"nodes": counts}
+                entry = {"id": rule_id, **rules.get(rule_id, {}), "nodes": []}
+                if "impact" in counts:
+                    entry["impact"] = counts["impact"]
+                entry["_node_count"] = counts["nodes"]
+                entries.append(entry)
+        else:
+            for compact_entry in value:
+                rule_id = compact_entry.get("id")
+                entry = {"id": rule_id, "impact": compact_entry.get("impact"), **rules.get(rule_id, {})}
+                entry["nodes"] = [_expand_node(n, checks, summaries) for n in compact_entry.get("nodes", [])]
+                entries.append(entry)
+        expanded[group] = entries
+
+    if compact.get("lossy"):
+        expanded["_lossy"] = list(compact["lossy"])
+    return expanded
+
+
+def violation_summaries(axe_results: dict) -> list:
+    """
+    Returns the violation fields the reporter needs (id, impact, description,
+    helpUrl, node count) for either raw or compact axe results.
+    """
+    rules = axe_results.get("rules", {}) if axe_results.get("format") == COMPACT_FORMAT else {}
+    summaries = []
+    for v in axe_results.get("violations", []) or []:
+        meta = rules.get(v.get("id"), v)
+        summaries.append({
+            "id": v.get("id"),
+            "impact": v.get("impact"),
+            "description": meta.get("description", ""),
+            "helpUrl": meta.get("helpUrl", "#"),
+            "tags": meta.get("tags", []),
+            "node_count": len(v.get("nodes", []) or [])
+        })
+    return summaries
+
+
+def _compact_html(html: str, html_limit, hash_html: bool) -> dict:
+    # Keep a short prefix or a stable hash of the node's HTML
+    html = html or ""
+    if hash_html:
+        return {"html_sha1": hashlib.sha1(html.encode("utf-8")).hexdigest(), "html_length": len(html)}
+    if html_limit is not None and len(html) > html_limit:
+        return {"html": html[:html_limit], "html_truncated": True, "html_length": len(html)}
+    return {"html": html}
+
+
+def _expand_html(compact_node: dict) -> str:
+    if "html_sha1" in compact_node:
+        return f"<!-- sha1:{compact_node['html_sha1']} ({compact_node.get('html_length', 0)} chars) -->"
+    html = compact_node.get("html", "")
+    return html + "..." if compact_node.get("html_truncated") else html
+
+
+def _compact_check(check: dict, html_limit, hash_html: bool) -> dict:
+    # Related nodes of a check carry HTML as well, limited like the node's own
+    if not check.get("relatedNodes"):
+        return check
+    related = []
+    for node in check["relatedNodes"]:
+        if "html" in node:
+            node = {**{k: v for k, v in node.items() if k != "html"},
+                    **_compact_html(node["html"], html_limit, hash_html)}
+        related.append(node)
+    return dict(check, relatedNodes=related)
+
+
+def _expand_check(check: dict) -> dict:
+    if not check.get("relatedNodes"):
+        return check
+    related = []
+    for compact in check["relatedNodes"]:
+        if "html" in compact or "html_sha1" in compact:
+            node = {k: v for k, v in compact.items() if k not in ("html", "html_truncated", "html_sha1", "html_length")}
+            node["html"] = _expand_html(compact)
+            related.append(node)
+        else:
+            related.append(compact)
+    return dict(check, relatedNodes=related)
+
+
+def _expand_node(compact_node: dict, checks: list, summaries: list) -> dict:
+    node = {"html": _expand_html(compact_node)}
+    node["target"] = compact_node.get("target")
+    node["impact"] = compact_node.get("impact")
+    if "summary" in compact_node:
+        node["failureSummary"] = summaries[compact_node["summary"]]
+    for check_list in CHECK_LISTS:
+        if check_list in compact_node:
+            node[check_list] = [checks[i] for i in compact_node[check_list]]
+    node.update(compact_node.get("extra", {}))
+    return node
@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import time
+
+# Per page stages, in order. Only 'extracted' and 'ai' carry data that is reused on resume;
+# 'loaded' and 'axe' record how far a page got before a crash.
+STAGES = ["queued", "loaded", "axe", "extracted", "ai", "reported"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS frontier (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    depth INTEGER NOT NULL,
+    stage TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS frontier_stage ON frontier (stage, position);
+CREATE TABLE IF NOT EXISTS artifacts (
+    url TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (url, stage)
+);
+CREATE TABLE IF NOT EXISTS templates (
+    fingerprint TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS template_pages (
+    fingerprint TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    UNIQUE (fingerprint, url)
+);
+"""
+
+
+class CrawlCheckpoint:
+    """
+    SQLite store for a crawl: the URL frontier, the stage each page reached
+    and the expensive per-stage results, so an interrupted crawl can resume.
+
+    Args:
+        path (str): Database file, ':memory:' keeps the crawl in memory only
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.persistent = path != ":memory:"
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        # WAL keeps reads cheap while pages are written
+        if self.persistent:
+            self.db.execute("PRAGMA journal_mode=WAL")
+
+    def reset(self):
+        with self.db:
+            self.db.execute("DELETE FROM crawl")
+            self.db.execute("DELETE FROM frontier")
+            self.db.execute("DELETE FROM artifacts")
+            self.db.execute("DELETE FROM templates")
+            self.db.execute("DELETE FROM template_pages")
+
+    def is_empty(self) -> bool:
+        return self.db.execute("SELECT COUNT(*) FROM frontier").fetchone()[0] == 0
+
+    def get(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM crawl WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, key: str, value):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO crawl (key, value) VALUES (?, ?)",
+                            (key, json.dumps(value, default=str)))
+
+    def add_urls(self, urls: list) -> int:
+        """Adds (url, depth) pairs to the frontier, ignoring known URLs; returns the number added"""
+        with self.db:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO frontier (url, depth, updated) VALUES (?, ?, ?)",
+                                [(url, depth, time.time()) for url, depth in urls])
+            return self.db.total_changes - before
+
+    def next_page(self, max_attempts: int = 2):
+        """Returns (position, url, depth, stage) of the first unfinished page, or None"""
+        return self.db.execute(
+            "SELECT position, url, depth, stage FROM frontier "
+            "WHERE stage != 'reported' AND attempts < ? ORDER BY position LIMIT 1",
+            (max_attempts,)
+        ).fetchone()
+
+    def set_stage(self, url: str, stage: str, data=None):
+        with self.db:
+            self.db.execute("UPDATE frontier SET stage = ?, error = NULL, updated = ? WHERE url = ?",
+                            (stage, time.time(), url))
+            if data is not None:
+                self.db.execute("INSERT OR REPLACE INTO artifacts (url, stage, data) VALUES (?, ?, ?)",
+                                (url, stage, json.dumps(data, default=str)))
+
+    def mark_reported(self, url: str):
+        self.set_stage(url, "reported")
+        if not self.persistent:
+            # Nothing resumes an in-memory crawl, so do not keep every page around
+            with self.db:
+                self.db.execute("DELETE FROM artifacts WHERE url = ?", (url,))
+
+    def fail(self, url: str, error: str):
+        """Records an error; the page keeps its stage and is retried until max_attempts"""
+        with self.db:
+            self.db.execute("UPDATE frontier SET attempts = attempts + 1, error = ?, updated = ? WHERE url = ?",
+                            (error, time.time(), url))
+
+    def load(self, url: str, stage: str):
+        row = self.db.execute("SELECT data FROM artifacts WHERE url = ? AND stage = ?", (url, stage)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self, stage: str = None) -> int:
+        if stage is None:
+            return self.db.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+        return self.db.execute("SELECT COUNT(*) FROM frontier WHERE stage = ?", (stage,)).fetchone()[0]
+
+    def progress(self) -> dict:
+        counts = dict(self.db.execute("SELECT stage, COUNT(*) FROM frontier GROUP BY stage").fetchall())
+        failed = self.db.execute("SELECT COUNT(*) FROM frontier WHERE error IS NOT NULL").fetchone()[0]
+        return {**{stage: counts.get(stage, 0) for stage in STAGES}, "failed": failed}
+
+    def pages(self) -> list:
+        rows = self.db.execute("SELECT position, url, depth, stage, attempts, error FROM frontier ORDER BY position")
+        return [dict(zip(["position", "url", "depth", "stage", "attempts", "error"], row)) for row in rows]
+
+    def results(self, max_attempts: int = None):
+        """
+        Yields the assembled result of every reported page still stored, e.g. to
+        rebuild reports on resume. With max_attempts, pages that were given up
+        are yielded as error results, like the crawl reported them.
+        """
+        for page in self.pages():
+            if page["stage"] != "reported":
+                if max_attempts is not None and page["error"] and page["attempts"] >= max_attempts:
+                    yield {"url": page["url"], "page_number": page["position"], "error": page["error"]}
+                continue
+            result = self.load(page["url"], "extracted")
+            if result is None:
+                continue
+            ai_results = self.load(page["url"], "ai")
+            if ai_results is not None:
+                result["ai_results"] = ai_results
+            result["depth"] = page["depth"]
+            result["page_number"] = page["position"]
+            yield result
+
+    def save_templates(self, templates: list, sightings: list):
+        """Stores newly analysed templates (without their page lists) and new (fingerprint, url) sightings"""
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO templates (fingerprint, data) VALUES (?, ?)", [
+                (t["fingerprint"], json.dumps({k: v for k, v in t.items() if k != "pages"}, default=str))
+                for t in templates
+            ])
+            self.db.executemany("INSERT OR IGNORE INTO template_pages (fingerprint, url) VALUES (?, ?)", sightings)
+
+    def load_templates(self):
+        """Returns (templates, sightings) as TemplateDetector.restore expects them"""
+        sightings = {}
+        for fingerprint, url in self.db.execute("SELECT fingerprint, url FROM template_pages ORDER BY position"):
+            sightings.setdefault(fingerprint, []).append(url)
+        templates = {fingerprint: json.loads(data)
+                     for fingerprint, data in self.db.execute("SELECT fingerprint, data FROM templates")}
+        return templates, sightings
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,409 @@
+"""
+Command line entry point: python -m src.cli <command>
+
+Commands:
+    audit   Audit one URL in a browser (axe, rules and optionally AI)
+    crawl   Audit a site page by page, following links on the same host
+    report  Render an HTML report from saved JSON results, no browser needed
+    site-report  Render one navigable report for many saved JSON results
+    rules   Run only the rule based checks on an HTML file or URL
+    serve   Start the long running audit service
+    coordinator  Own the frontier of a distributed crawl in a shared queue
+    worker       Lease audit jobs from a shared queue and run them
+    results      Ingest JSON results into an indexed database and query it
+
+With --ai-cassette (before the command) AI responses are recorded to or
+replayed from a cassette file, so runs can be repeated offline.
+
+Heavy dependencies (selenium, axe, anthropic) are imported inside the
+commands that need them, so report and rules start quickly.
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def _write_json(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f" Results saved to: {path}")
+
+
+def _write_report(results, path=None, templates=None):
+    from src.reporter import AccessibilityReporter
+
+    reporter = AccessibilityReporter()
+    filename = reporter.save_report(reporter.generate_report(results, templates=templates), path)
+    print(f" Report saved to: {filename}")
+    return filename
+
+
+def _load_profile(args):
+    if not args.lightweight:
+        return None
+    from src.load_profile import LoadProfile
+    return LoadProfile.lightweight(use_vision=args.ai, cache_dir=args.cache_dir)
+
+
+def _limits(args):
+    from src.page_limits import PageLimits
+    return PageLimits(max_dom_size=args.max_dom_size, max_elements=args.max_elements)
+
+
+def cmd_audit(args):
+    from src.scraper import AccessibilityScraper
+
+    scraper = AccessibilityScraper(
+        args.url,
+        headless=not args.show_browser,
+        use_ai=args.ai,
+        compact_axe=args.compact_axe,
+        load_profile=_load_profile(args),
+        limits=_limits(args)
+    )
+    if args.viewports or args.states:
+        results = scraper.extract_states(
+            viewports=args.viewports.split(',') if args.viewports else ('desktop',),
+            states=args.states.split(',') if args.states else ()
+        )
+    else:
+        results = scraper.extract_data()
+
+    if args.json:
+        _write_json(results, args.json)
+    _write_report(results, args.report)
+
+
+def cmd_crawl(args):
+    from src.checkpoint import CrawlCheckpoint
+    from src.crawler import Crawler, normalize_url
+    from src.site_report import SiteReportBuilder
+
+    if args.resume and not args.checkpoint:
+        sys.exit(" --resume needs --checkpoint")
+    if args.resume and not os.path.exists(args.checkpoint):
+        sys.exit(f" No checkpoint found at {args.checkpoint}")
+
+    checkpoint = CrawlCheckpoint(args.checkpoint) if args.checkpoint else CrawlCheckpoint()
+    if not args.resume:
+        checkpoint.reset()
+    elif checkpoint.get('start_url') != normalize_url(args.url):
+        sys.exit(f" Checkpoint {args.checkpoint} is a crawl of {checkpoint.get('start_url')}, not {args.url}")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    site_report = SiteReportBuilder(os.path.join(args.out_dir, 'site'))
+    crawler = Crawler(
+        args.url,
+        max_pages=args.max_pages,
+        max_depth=args.max_depth,
+        use_ai=args.ai,
+        headless=not args.show_browser,
+        load_profile=_load_profile(args),
+        scraper_options={'compact_axe': args.compact_axe, 'limits': _limits(args)},
+        checkpoint=checkpoint
+    )
+
+    store = run_id = None
+    if args.results_db:
+        from src.results_store import ResultsStore
+        store = ResultsStore(args.results_db)
+        run_id = store.create_run(args.url)
+
+    if args.resume:
+        # Pages finished before the restart are not yielded again, but belong in the run
+        resumed = 0
+        for results in checkpoint.results(crawler.max_attempts):
+            if store is not None:
+                store.ingest(run_id, [results])
+            site_report.add(results)
+            resumed += 1
+        print(f" Added {resumed} page(s) finished before the restart")
+
+    for results in crawler.crawl():
+        name = f"page_{results['page_number']:05d}"
+        if store is not None:
+            store.ingest(run_id, [results])
+        site_report.add(results)
+        if 'error' not in results:
+            _write_json(results, os.path.join(args.out_dir, f"{name}.json"))
+            templates = crawler.template_detector.templates if crawler.template_detector else None
+            _write_report(results, os.path.join(args.out_dir, f"{name}.html"), templates)
+
+    pages = checkpoint.pages()
+    _write_json(pages, os.path.join(args.out_dir, 'pages.json'))
+    templates = crawler.template_detector.templates if crawler.template_detector else None
+    print(f" Site report saved to: {site_report.finish(title=args.url, templates=templates)}")
+    progress = checkpoint.progress()
+    print(f"\n Crawled {progress['reported']} page(s), {progress['failed']} with errors")
+    if store is not None:
+        if templates:
+            store.ingest_templates(run_id, templates)
+        print(f" Findings stored as run {run_id} in {args.results_db}")
+        store.close()
+    checkpoint.close()
+
+
+def cmd_report(args):
+    with open(args.results, encoding='utf-8') as f:
+        results = json.load(f)
+    _write_report(results, args.output)
+
+
+def cmd_site_report(args):
+    from src.site_report import build_site_report
+
+    paths = []
+    for source in args.results:
+        if os.path.isdir(source):
+            # Crawl output directory: page_00001.json, ...
+            paths += sorted(os.path.join(source, name) for name in os.listdir(source)
+                            if name.startswith('page_') and name.endswith('.json'))
+        else:
+            paths.append(source)
+
+    def load_all():
+        # One page in memory at a time
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            yield from data if isinstance(data, list) else [data]
+
+    path = build_site_report(load_all(), args.out_dir, title=args.title)
+    print(f" Site report for {len(paths)} file(s) saved to: {path}")
+
+
+def cmd_rules(args):
+    from src.scraper import AccessibilityScraper
+
+    if args.source.startswith(('http://', 'https://')):
+        import requests
+        response = requests.get(args.source, timeout=30)
+        response.raise_for_status()
+        html, url = response.text, args.source
+    else:
+        with open(args.source, encoding='utf-8', errors='replace') as f:
+            html, url = f.read(), args.source
+
+    results = AccessibilityScraper(url, browser=False).analyze_html(html)
+
+    if args.json:
+        _write_json(results, args.json)
+    else:
+        week2 = results['week2']
+        print(json.dumps({
+            'url': url,
+            'link_issues': week2['links'],
+            'image_issues': week2['images'],
+            'readability': week2['readability']
+        }, indent=2))
+    if args.report:
+        _write_report(results, args.report)
+
+
+def cmd_serve(args):
+    from src.audit_service import main as serve_main
+
+    service_args = ['--host', args.host, '--port', str(args.port), '--workers', str(args.workers)]
+    if args.use_ai:
+        service_args.append('--use-ai')
+    if args.show_browser:
+        service_args.append('--show-browser')
+    if args.tabs:
+        service_args += ['--tabs', '--tab-timeout', str(args.tab_timeout), '--min-free-mb', str(args.min_free_mb)]
+    serve_main(service_args)
+
+
+def cmd_coordinator(args):
+    from src.job_queue import SQLiteJobQueue
+    from src.worker import Coordinator
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    queue = SQLiteJobQueue(args.queue, visibility_timeout=args.visibility_timeout)
+    coordinator = Coordinator(queue, args.url, max_pages=args.max_pages, max_depth=args.max_depth,
+                              options={'use_ai': args.ai, 'compact_axe': args.compact_axe})
+
+    for job in coordinator.run():
+        if job['state'] != 'done':
+            print(f" Gave up on {job['payload']['url']}: {job['error']}")
+            continue
+        print(f" Done: {job['payload']['url']}")
+        _write_json(job['result'], os.path.join(args.out_dir, f"page_{job['id']:05d}.json"))
+    print(f"\n Queue: {queue.stats()}")
+
+
+def cmd_worker(args):
+    from src.job_queue import SQLiteJobQueue
+    from src.worker import Worker
+
+    queue = SQLiteJobQueue(args.queue, visibility_timeout=args.visibility_timeout)
+    worker = Worker(queue, worker_id=args.worker_id, headless=not args.show_browser)
+    worker.run(max_jobs=args.max_jobs, idle_timeout=args.idle_timeout)
+    print(f" Worker processed {worker.processed} job(s)")
+
+
+def cmd_results(args):
+    from src.results_store import ResultsStore
+
+    store = ResultsStore(args.db)
+    if args.action == 'ingest':
+        def load_all():
+            for path in args.files:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+                # Accept single results as well as lists of results
+                yield from data if isinstance(data, list) else [data]
+
+        run_id = args.run or store.create_run(args.label)
+        count = store.ingest(run_id, load_all())
+        print(f" Ingested {count} finding(s) into run {run_id}")
+    elif args.action == 'runs':
+        output = store.runs()
+    elif args.action == 'aggregate':
+        output = store.aggregate(args.run, by=args.by, source=args.source, criterion=args.criterion)
+    elif args.action == 'top':
+        output = store.top_offenders(args.run, limit=args.limit, min_severity=args.min_severity,
+                                     source=args.source, criterion=args.criterion)
+    elif args.action == 'diff':
+        output = store.diff(args.base, args.run, source=args.source, criterion=args.criterion)
+
+    if args.action != 'ingest':
+        print(json.dumps(output, indent=2))
+    store.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description='AI-powered accessibility analysis')
+    parser.add_argument('--ai-cassette', help='record AI responses to this file or replay them from it')
+    parser.add_argument('--ai-cassette-mode', choices=['replay', 'record', 'auto'], default='replay')
+    parser.add_argument('--ai-cassette-match', choices=['strict', 'lenient'], default='strict')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def browser_options(command):
+        command.add_argument('--ai', action='store_true', help='run the AI semantic analysis')
+        command.add_argument('--compact-axe', action='store_true', help='store axe results in compact form')
+        command.add_argument('--lightweight', action='store_true', help='block media, trackers and fonts')
+        command.add_argument('--cache-dir', help='disk cache shared between pages and runs')
+        command.add_argument('--show-browser', action='store_true')
+        command.add_argument('--max-dom-size', type=int, default=5_000_000,
+                             help='DOM size in characters above which pages are extracted in streaming mode')
+        command.add_argument('--max-elements', type=int,
+                             help='links, images and text blocks kept per page and category (default: all)')
+
+    audit = commands.add_parser('audit', help='audit one URL')
+    audit.add_argument('url')
+    audit.add_argument('--json', help='save raw results as JSON')
+    audit.add_argument('--report', help='HTML report filename')
+    audit.add_argument('--viewports', help='comma separated viewports, e.g. desktop,mobile')
+    audit.add_argument('--states', help='comma separated states, e.g. accept_cookies,open_menu')
+    browser_options(audit)
+    audit.set_defaults(func=cmd_audit)
+
+    crawl = commands.add_parser('crawl', help='audit a site')
+    crawl.add_argument('url')
+    crawl.add_argument('--max-pages', type=int, default=50)
+    crawl.add_argument('--max-depth', type=int, default=3)
+    crawl.add_argument('--out-dir', default='crawl_results')
+    crawl.add_argument('--checkpoint', help='SQLite file holding frontier, stages and results')
+    crawl.add_argument('--resume', action='store_true', help='continue the crawl in --checkpoint')
+    crawl.add_argument('--results-db', help='also ingest findings into this results database')
+    browser_options(crawl)
+    crawl.set_defaults(func=cmd_crawl)
+
+    report = commands.add_parser('report', help='render a report from JSON results')
+    report.add_argument('results')
+    report.add_argument('-o', '--output', help='HTML report filename')
+    report.set_defaults(func=cmd_report)
+
+    site_report = commands.add_parser('site-report', help='render one report for many JSON results')
+    site_report.add_argument('results', nargs='+', help='JSON files or crawl output directories')
+    site_report.add_argument('-o', '--out-dir', default='site_report')
+    site_report.add_argument('--title', help='site name shown in the report')
+    site_report.set_defaults(func=cmd_site_report)
+
+    rules = commands.add_parser('rules', help='rule based checks only, no browser or AI')
+    rules.add_argument('source', help='HTML file or URL')
+    rules.add_argument('--json', help='save results as JSON')
+    rules.add_argument('--report', help='HTML report filename')
+    rules.set_defaults(func=cmd_rules)
+
+    serve = commands.add_parser('serve', help='start the audit service')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--workers', type=int, default=2)
+    serve.add_argument('--use-ai', action='store_true')
+    serve.add_argument('--show-browser', action='store_true')
+    serve.add_argument('--tabs', action='store_true', help='run the workers as tabs of one browser')
+    serve.add_argument('--tab-timeout', type=float, default=300, help='seconds one audit may use a tab')
+    serve.add_argument('--min-free-mb', type=int, default=500, help='available memory needed to open another tab')
+    serve.set_defaults(func=cmd_serve)
+
+    results = commands.add_parser('results', help='results database: ingest, runs, aggregate, top, diff')
+    results.add_argument('db', help='SQLite results database')
+    actions = results.add_subparsers(dest='action', required=True)
+
+    ingest = actions.add_parser('ingest', help='add JSON result files as a run')
+    ingest.add_argument('files', nargs='+')
+    ingest.add_argument('--label', help='name of the new run')
+    ingest.add_argument('--run', type=int, help='add to an existing run instead')
+
+    actions.add_parser('runs', help='list runs')
+
+    def query_options(command):
+        command.add_argument('--run', type=int, required=True)
+        command.add_argument('--source', choices=['axe', 'rule', 'ai'])
+        command.add_argument('--criterion', help='WCAG criterion, e.g. 1.1.1')
+
+    aggregate = actions.add_parser('aggregate', help='findings and pages per group')
+    query_options(aggregate)
+    aggregate.add_argument('--by', default='rule', choices=['rule', 'criterion', 'severity', 'source', 'url'])
+
+    top = actions.add_parser('top', help='pages with the most findings')
+    query_options(top)
+    top.add_argument('--limit', type=int, default=10)
+    top.add_argument('--min-severity', choices=['critical', 'serious', 'moderate', 'minor'])
+
+    diff = actions.add_parser('diff', help='regressions and fixes between two runs')
+    query_options(diff)
+    diff.add_argument('--base', type=int, required=True, help='earlier run to compare against')
+    results.set_defaults(func=cmd_results)
+
+    def queue_options(command):
+        command.add_argument('--queue', required=True, help='SQLite queue file shared by coordinator and workers')
+        command.add_argument('--visibility-timeout', type=float, default=300,
+                             help='seconds before an unfinished lease is handed to another worker')
+
+    coordinator = commands.add_parser('coordinator', help='queue a site crawl and collect results')
+    coordinator.add_argument('url')
+    coordinator.add_argument('--max-pages', type=int, default=50)
+    coordinator.add_argument('--max-depth', type=int, default=3)
+    coordinator.add_argument('--out-dir', default='crawl_results')
+    coordinator.add_argument('--ai', action='store_true', help='workers run the AI semantic analysis')
+    coordinator.add_argument('--compact-axe', action='store_true')
+    queue_options(coordinator)
+    coordinator.set_defaults(func=cmd_coordinator)
+
+    worker = commands.add_parser('worker', help='run audit jobs from a shared queue')
+    worker.add_argument('--worker-id')
+    worker.add_argument('--max-jobs', type=int)
+    worker.add_argument('--idle-timeout', type=float, default=60, help='exit after this many idle seconds')
+    worker.add_argument('--show-browser', action='store_true')
+    queue_options(worker)
+    worker.set_defaults(func=cmd_worker)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.ai_cassette:
+        # Read by every AIAnalyzer, including those created in service and worker threads
+        os.environ['AI_CASSETTE'] = args.ai_cassette
+        os.environ['AI_CASSETTE_MODE'] = args.ai_cassette_mode
+        os.environ['AI_CASSETTE_MATCH'] = args.ai_cassette_match
+    args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from src.checkpoint import CrawlCheckpoint
+from src.scraper import AccessibilityScraper, create_driver
+from src.template_detector import TemplateDetector
+
+# Links that never lead to an auditable HTML page
+SKIPPED_EXTENSIONS = (".pdf", ".zip", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".mp4", ".mp3",
+                      ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx")
+
+
+def normalize_url(url: str) -> str:
+    url, _ = urldefrag(url)
+    return url
+
+
+def is_crawlable(url: str, start_url: str) -> bool:
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        return False
+    if parsed.netloc != urlparse(start_url).netloc:
+        return False
+    return not parsed.path.lower().endswith(SKIPPED_EXTENSIONS)
+
+
+def discovered_links(result: dict, templates: dict) -> list:
+    """All hrefs on a page, including those in skipped site-wide template regions"""
+    hrefs = [link.get('href', '') for link in result.get('raw_elements', {}).get('links', [])]
+    for ref in (result.get('site_wide') or {}).get('templates', []):
+        template = templates.get(ref['fingerprint'], {})
+        hrefs += template.get('findings', {}).get('hrefs', [])
+    return hrefs
+
+
+class Crawler:
+    """
+    Breadth-first crawl of one site that audits every page with a single warm browser.
+
+    Progress is kept in a CrawlCheckpoint. With a file based checkpoint an
+    interrupted crawl resumes where it stopped: finished pages are skipped and
+    pages that got past extraction or AI reuse the stored results.
+
+    Args:
+        start_url (str): First page, also defines the host that is crawled
+        max_pages (int): Stop after this many audited pages
+        max_depth (int): Maximum link distance from the start page
+        use_ai (bool): Run the AI analysis on every page
+        headless (bool): Run browser in background
+        load_profile (LoadProfile): Request blocking for all pages
+        detect_templates (bool): Analyse site-wide header/nav/footer once
+        scraper_options (dict): Extra keyword arguments for AccessibilityScraper
+        checkpoint (CrawlCheckpoint): Store to resume from, in memory when not given
+        max_attempts (int): Tries per page before it is given up
+    """
+
+    def __init__(self, start_url, max_pages=50, max_depth=3, use_ai=False, headless=True,
+                 load_profile=None, detect_templates=True, scraper_options=None,
+                 checkpoint=None, max_attempts=2):
+        self.start_url = normalize_url(start_url)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.use_ai = use_ai
+        self.headless = headless
+        self.load_profile = load_profile
+        self.template_detector = TemplateDetector() if detect_templates else None
+        self.scraper_options = scraper_options or {}
+        self.checkpoint = checkpoint or CrawlCheckpoint()
+        self.max_attempts = max_attempts
+        self.ai_analyzer = None
+
+    def crawl(self):
+        """Yields one result dict per page; failed pages have an 'error' key instead"""
+        if self.use_ai:
+            from src.ai_analyzer import AIAnalyzer
+            self.ai_analyzer = AIAnalyzer()
+
+        if self.checkpoint.is_empty():
+            self.checkpoint.put('start_url', self.start_url)
+            self.checkpoint.add_urls([(self.start_url, 0)])
+        else:
+            started = self.checkpoint.get('start_url')
+            if started != self.start_url:
+                raise ValueError(f"Checkpoint belongs to a crawl of {started}, not {self.start_url}")
+            print(f" Resuming crawl: {self.checkpoint.progress()}")
+            if self.template_detector:
+                self.template_detector.restore(*self.checkpoint.load_templates())
+
+        driver = None
+        try:
+            while self.checkpoint.count('reported') < self.max_pages:
+                page = self.checkpoint.next_page(self.max_attempts)
+                if page is None:
+                    break
+                position, url, depth, stage = page
+                print(f"\n[{self.checkpoint.count('reported') + 1}/{self.max_pages}] {url}")
+
+                try:
+                    if driver is None and self.checkpoint.load(url, 'extracted') is None:
+                        driver = create_driver(self.headless, self.load_profile)
+                    result = self._audit(url, driver)
+                except Exception as e:
+                    print(f" Page failed: {e}")
+                    self.checkpoint.fail(url, str(e))
+                    # The browser may have crashed, start from a clean one
+                    driver = self._quit(driver)
+                    yield {'url': url, 'page_number': position, 'error': str(e)}
+                    continue
+
+                result['depth'] = depth
+                result['page_number'] = position
+                if depth < self.max_depth:
+                    self._add_links(url, depth, result)
+
+                yield result
+                # Reported once the consumer has processed the result
+                self.checkpoint.mark_reported(url)
+        finally:
+            self._quit(driver)
+
+    def _audit(self, url, driver):
+        # Each stage stored in the checkpoint is reused instead of redone
+        result = self.checkpoint.load(url, 'extracted')
+        if result is None:
+            scraper = AccessibilityScraper(
+                url,
+                use_ai=self.use_ai,
+                ai_analyzer=self.ai_analyzer,
+                template_detector=self.template_detector,
+                load_profile=self.load_profile,
+                driver=driver,
+                on_stage=lambda stage: self.checkpoint.set_stage(url, stage),
+                defer_ai=True,
+                **self.scraper_options
+            )
+            result = scraper.extract_data()
+            self.checkpoint.set_stage(url, 'extracted', result)
+            if self.template_detector:
+                self.checkpoint.save_templates(*self.template_detector.changes())
+
+        if self.use_ai:
+            ai_results = self.checkpoint.load(url, 'ai')
+            if ai_results is None:
+                print(" Running AI semantic analysis...")
+                ai_results = self.ai_analyzer.analyze(result['raw_elements'], base_url=url)
+                self.checkpoint.set_stage(url, 'ai', ai_results)
+            result['ai_results'] = ai_results
+
+        return result
+
+    def _add_links(self, url, depth, result):
+        templates = self.template_detector.templates if self.template_detector else {}
+        links = []
+        for href in discovered_links(result, templates):
+            link = normalize_url(urljoin(url, href))
+            if is_crawlable(link, self.start_url):
+                links.append((link, depth + 1))
+        self.checkpoint.add_urls(links)
+
+    def _quit(self, driver):
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        return None
@@ -0,0 +1,135 @@
+import time
+
+# Device profiles for Emulation.setDeviceMetricsOverride
+VIEWPORTS = {
+    "desktop": {"width": 1366, "height": 768, "deviceScaleFactor": 1, "mobile": False},
+    "tablet": {"width": 768, "height": 1024, "deviceScaleFactor": 2, "mobile": True, "touch": True},
+    "mobile": {
+        "width": 375, "height": 812, "deviceScaleFactor": 3, "mobile": True, "touch": True,
+        "user_agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 "
+                      "(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1"
+    },
+}
+
+# Scripted interactions, each script returns the number of elements it changed
+INTERACTION_STATES = {
+    "accept_cookies": """
+        const words = ['accept', 'akkoord', 'accepteren', 'agree', 'allow', 'toestaan'];
+        const buttons = [...document.querySelectorAll('button, [role=button], a')].filter(b =>
+            words.some(w => (b.innerText || '').toLowerCase().includes(w)) &&
+            (b.closest('[id*=cookie], [class*=cookie], [aria-label*=cookie i]') || b.id.includes('cookie')));
+        buttons.slice(0, 1).forEach(b => b.click());
+        return buttons.length ? 1 : 0;
+    """,
+    "open_menu": """
+        const toggles = [...document.querySelectorAll(
+            'header [aria-expanded=false], nav [aria-expanded=false], [aria-controls][aria-expanded=false]')]
+            .filter(t => t.offsetParent !== null);
+        toggles.forEach(t => t.click());
+        return toggles.length;
+    """,
+}
+
+
+def resolve_viewport(viewport) -> dict:
+    """Accepts a profile name from VIEWPORTS or a dict, returns a dict with a 'name'"""
+    if isinstance(viewport, str):
+        return {"name": viewport, **VIEWPORTS[viewport]}
+    return {"name": viewport.get("name", f"{viewport['width']}x{viewport['height']}"), **viewport}
+
+
+def resolve_state(state) -> dict:
+    """Accepts a state name from INTERACTION_STATES or a dict with 'name' and 'script'"""
+    if isinstance(state, str):
+        return {"name": state, "script": INTERACTION_STATES[state]}
+    return state
+
+
+def apply_viewport(driver, viewport: dict):
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+        "width": viewport["width"],
+        "height": viewport["height"],
+        "deviceScaleFactor": viewport.get("deviceScaleFactor", 1),
+        "mobile": viewport.get("mobile", False)
+    })
+    driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": viewport.get("touch", False)})
+    if viewport.get("user_agent"):
+        # Only affects scripts reading navigator.userAgent and later requests, not the loaded HTML
+        driver.execute_cdp_cmd("Emulation.setUserAgentOverride", {"userAgent": viewport["user_agent"]})
+
+
+def clear_viewport(driver):
+    driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+    driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": False})
+
+
+def run_state(driver, state: dict, settle: float = 0.5) -> int:
+    """Runs an interaction script and waits for the page to settle"""
+    changed = driver.execute_script(state["script"])
+    time.sleep(settle)
+    return changed or 0
+
+
+# Element keys used to recognise the same element in different states
+ELEMENT_KEYS = {
+    "links": lambda e: (e.get("text"), e.get("href")),
+    "images": lambda e: (e.get("src"), e.get("alt")),
+    "text_blocks": lambda e: (e.get("text"),),
+}
+
+AXE_GROUPS = ["violations", "incomplete", "passes", "inapplicable"]
+
+
+def merge_captures(captures: list) -> dict:
+    """
+    Merges axe results and extracted elements of several states into one result.
+
+    Each capture is a dict with 'state', 'axe_results' and 'raw_elements'.
+    Axe rules, axe nodes and elements found in more than one state are kept
+    once and list every state they were found in under 'states'.
+
+    Returns:
+        dict: Merged 'axe_results' and 'raw_elements'
+    """
+    axe_results = {}
+    raw_elements = {category: [] for category in ELEMENT_KEYS}
+    seen_rules = {group: {} for group in AXE_GROUPS}
+    seen_nodes = {}
+    seen_elements = {category: {} for category in ELEMENT_KEYS}
+
+    for capture in captures:
+        state = capture["state"]
+        axe = capture["axe_results"]
+        for key, value in axe.items():
+            if key not in AXE_GROUPS:
+                axe_results.setdefault(key, value)
+
+        for group in AXE_GROUPS:
+            merged_group = axe_results.setdefault(group, [])
+            for rule in axe.get(group, []):
+                merged_rule = seen_rules[group].get(rule["id"])
+                if merged_rule is None:
+                    merged_rule = {**rule, "nodes": [], "states": []}
+                    seen_rules[group][rule["id"]] = merged_rule
+                    merged_group.append(merged_rule)
+                if state not in merged_rule["states"]:
+                    merged_rule["states"].append(state)
+
+                for node in rule.get("nodes", []):
+                    node_key = (group, rule["id"], str(node.get("target")))
+                    if node_key not in seen_nodes:
+                        seen_nodes[node_key] = {**node, "states": []}
+                        merged_rule["nodes"].append(seen_nodes[node_key])
+                    if state not in seen_nodes[node_key]["states"]:
+                        seen_nodes[node_key]["states"].append(state)
+
+        for category, key_of in ELEMENT_KEYS.items():
+            for element in capture["raw_elements"].get(category, []):
+                key = key_of(element)
+                if key not in seen_elements[category]:
+                    seen_elements[category][key] = {**element, "states": []}
+                    raw_elements[category].append(seen_elements[category][key])
+                if state not in seen_elements[category][key]["states"]:
+                    seen_elements[category][key]["states"].append(state)
+
+    return {"axe_results": axe_results, "raw_elements": raw_elements}
@@ -0,0 +1,254 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.results_store import SEVERITIES
+from src.semantic_validator import analyze_alt_text, analyze_links, analyze_readability
+
+
+def parse_latency(spec: str):
+    """
+    Latency distribution in seconds from a short spec:
+        fixed:0.3            always 0.3
+        uniform:0.1,0.8      uniformly between 0.1 and 0.8
+        lognormal:0.5,0.6    median 0.5, sigma 0.6 (long tail like a real API)
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}', use fixed:, uniform: or lognormal:")
+
+
+def _field(prompt, name):
+    match = re.search(rf'^\s*{name}: "?(.*?)"?\s*$', prompt, re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def rule_verdict(prompt: str) -> dict:
+    """
+    Derives the verdict from the prompt with the rule based checks, in the
+    format of the verdict tool schema, so pipelines see realistic answers.
+    """
+    if "WCAG 2.4.4" in prompt:
+        result = analyze_links({"text": _field(prompt, "Link Text")})
+        criterion, issue, fix = "2.4.4", "Link text does not describe its destination", "Describe the destination"
+    elif "WCAG 1.1.1" in prompt:
+        alt = _field(prompt, "Alt Text")
+        result = analyze_alt_text({"alt": "" if alt == "(missing)" else alt})
+        criterion, issue, fix = "1.1.1", "Alt text does not describe the image", "Describe what the image shows"
+    elif "WCAG 3.1.5" in prompt:
+        readability = analyze_readability(_field(prompt, "Text") or "")
+        hard = readability["level"] == "hard"
+        result = {"issue": "hard_to_read" if hard else None, "severity": "low" if hard else None}
+        criterion, issue, fix = "3.1.5", "Sentences are long and complex", "Use shorter sentences"
+    else:
+        return {"is_accessible": True, "issue": None, "recommendation": None, "reasoning": "Fake verdict"}
+
+    problem = result["issue"] is not None
+    return {
+        "is_accessible": not problem,
+        "wcag_criterion": criterion,
+        "severity": SEVERITIES.get(result["severity"]) if problem else None,
+        "issue": issue if problem else None,
+        "recommendation": fix if problem else None,
+        "reasoning": f"Rule check: {result['issue'] or 'no issue'}"
+    }
+
+
+def paragraph_verdicts(prompt: str, verdict: dict = None) -> list:
+    """Verdicts for every numbered paragraph of a readability chunk prompt, rule based unless canned"""
+    paragraphs = re.findall(r'^\[(\d+)\] .*\n\s*Text: "(.*)"\s*$', prompt, re.MULTILINE)
+    return [dict(verdict or rule_verdict(f'WCAG 3.1.5\nText: "{text}"'), paragraph=int(number))
+            for number, text in paragraphs]
+
+
+class FakeAnthropic:
+    """
+    Behaviour of a fake Messages API: latency, injected overload and rate
+    limit errors, a requests-per-minute budget and the verdicts returned.
+
+    Args:
+        latency (str): Distribution spec, see parse_latency
+        error_429 (float): Share of requests answered with 429 rate_limit_error
+        error_529 (float): Share of requests answered with 529 overloaded_error
+        requests_per_minute (int): Budget after which real 429s are returned, None for unlimited
+        verdict (dict): Canned verdict for every analysis prompt, instead of rule based ones
+        seed (int): Seed for latency and error injection, for repeatable runs
+    """
+
+    def __init__(self, latency="fixed:0", error_429=0.0, error_529=0.0, requests_per_minute=None,
+                 verdict=None, seed=0):
+        self.latency = parse_latency(latency)
+        self.error_429 = error_429
+        self.error_529 = error_529
+        self.requests_per_minute = requests_per_minute
+        self.verdict = verdict
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = []
+        self.stats = {"requests": 0, "ok": 0, "429": 0, "529": 0, "retries": 0, "images": 0, "latencies": []}
+
+    def handle(self, request: dict, retry_count: int = 0):
+        """Returns (status, headers, body) for one Messages API request"""
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["retries"] += retry_count > 0
+            roll = self._random.random()
+            delay = self.latency(self._random)
+            now = time.time()
+            self._window = [t for t in self._window if t > now - 60]
+            over_budget = self.requests_per_minute is not None and len(self._window) >= self.requests_per_minute
+            if not over_budget:
+                self._window.append(now)
+            remaining = None if self.requests_per_minute is None else self.requests_per_minute - len(self._window)
+            reset = self._window[0] + 60 if self._window else now
+
+        headers = {}
+        if self.requests_per_minute is not None:
+            headers = {
+                "anthropic-ratelimit-requests-limit": str(self.requests_per_minute),
+                "anthropic-ratelimit-requests-remaining": str(max(remaining, 0)),
+                "anthropic-ratelimit-requests-reset": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(reset))
+            }
+
+        if over_budget or roll < self.error_429:
+            self._count("429")
+            headers["retry-after"] = str(max(int(reset - time.time()), 1) if over_budget else 1)
+            return 429, headers, _error("rate_limit_error", "Number of requests has exceeded your rate limit")
+        if roll < self.error_429 + self.error_529:
+            # Overload errors come after part of the latency, like a real gateway timeout
+            time.sleep(delay / 2)
+            self._count("529")
+            return 529, headers, _error("overloaded_error", "Overloaded")
+
+        time.sleep(delay)
+        with self._lock:
+            self.stats["ok"] += 1
+            self.stats["latencies"].append(delay)
+        return 200, headers, self._message(request)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _message(self, request):
+        # The analysis prompt is the first user message, later ones are tool results of a re-ask
+        content = request["messages"][0]["content"]
+        if isinstance(content, list):
+            has_image = any(block.get("type") == "image" for block in content)
+            prompt = "\n".join(block.get("text", "") for block in content if block.get("type") == "text")
+        else:
+            has_image, prompt = False, content
+        if has_image:
+            self._count("images")
+
+        verdict = self.verdict if self.verdict is not None else rule_verdict(prompt)
+        tool_choice = request.get("tool_choice") or {}
+        if tool_choice.get("type") == "tool":
+            # Forced tool call: answer with the fields of the requested tool's schema
+            tool = next(t for t in request.get("tools", []) if t["name"] == tool_choice["name"])
+            if "verdicts" in tool["input_schema"]["properties"]:
+                arguments = {"verdicts": paragraph_verdicts(prompt, self.verdict)}
+            else:
+                arguments = {field: verdict.get(field) for field in tool["input_schema"]["properties"]}
+            blocks = [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": tool["name"],
+                       "input": arguments}]
+            stop_reason, output = "tool_use", json.dumps(arguments)
+        else:
+            output = "A photo used for testing" if has_image else json.dumps(verdict)
+            blocks = [{"type": "text", "text": output}]
+            stop_reason = "end_turn"
+
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "fake"),
+            "content": blocks,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(output) // 4}
+        }
+
+
+def _error(kind, message):
+    return {"type": "error", "error": {"type": kind, "message": message}}
+
+
+def make_handler(fake: FakeAnthropic):
+    class FakeAnthropicHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.split("?")[0] != "/v1/messages":
+                return self._send(404, {}, _error("not_found_error", "Not found"))
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length))
+                request["messages"][-1]["content"]
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                return self._send(400, {}, _error("invalid_request_error", str(e)))
+
+            retry_count = int(self.headers.get("x-stainless-retry-count", 0) or 0)
+            self._send(*fake.handle(request, retry_count))
+
+        def _send(self, status, headers, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeAnthropicHandler
+
+
+def serve(fake: FakeAnthropic, host="127.0.0.1", port=0) -> ThreadingHTTPServer:
+    """Starts the server in a background thread; point clients at base_url=http://host:port"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-429", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--error-529", type=float, default=0.0, help="share of requests answered with 529")
+    parser.add_argument("--rpm", type=int, help="requests per minute before real 429s")
+    parser.add_argument("--verdict", help="canned JSON verdict instead of rule based ones")
+    args = parser.parse_args(argv)
+
+    fake = FakeAnthropic(args.latency, args.error_429, args.error_529, args.rpm,
+                         json.loads(args.verdict) if args.verdict else None)
+    server = serve(fake, args.host, args.port)
+    print(f" Fake Anthropic API on http://{args.host}:{server.server_port} "
+          f"(set ANTHROPIC_BASE_URL to use it)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import functools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+JOB_STATES = ["pending", "leased", "done", "dead"]
+
+
+class JobQueue(ABC):
+    """
+    Interface for the job queue shared by a coordinator and its workers.
+
+    Jobs are leased, not popped: a worker that does not complete or extend its
+    lease within the visibility timeout loses it, and the job becomes
+    available to other workers again until max_attempts is reached.
+    """
+
+    @abstractmethod
+    def put(self, jobs: list, priority: int = 0) -> int:
+        """Adds (key, payload) pairs, ignoring keys already queued; returns the number added"""
+        ...
+
+    @abstractmethod
+    def lease(self, worker_id: str, visibility_timeout: float = None):
+        """Returns a job dict with 'id', 'lease_id', 'payload' and 'attempts', or None"""
+        ...
+
+    @abstractmethod
+    def extend(self, job_id: int, lease_id: str, visibility_timeout: float = None) -> bool:
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: int, lease_id: str, result) -> bool:
+        """Stores the result; False when the lease was lost to another worker"""
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: int, lease_id: str, error: str) -> bool:
+        ...
+
+    @abstractmethod
+    def collect(self, limit: int = 100) -> list:
+        """Returns finished jobs (done or dead) not collected before"""
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_id TEXT,
+    lease_expires REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    collected INTEGER NOT NULL DEFAULT 0,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_available ON jobs (state, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_collect ON jobs (collected, state);
+"""
+
+
+def _locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue in a SQLite file, shared by processes on one machine. The file
+    uses WAL mode, which needs shared memory between the processes, so it
+    must not live on a network filesystem.
+
+    Args:
+        path (str): Database file
+        visibility_timeout (float): Seconds a lease lasts unless extended
+        max_attempts (int): Leases per job before it is marked dead
+    """
+
+    def __init__(self, path, visibility_timeout=300, max_attempts=3):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        # Autocommit mode, transactions are opened explicitly where needed
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        # A worker extends its lease from a heartbeat thread while the main thread audits
+        self._lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    @_locked
+    def put(self, jobs: list, priority: int = 0) -> int:
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO jobs (key, payload, priority, updated) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(payload), priority, now) for key, payload in jobs]
+            )
+            added = self.db.total_changes - before
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return added
+
+    @_locked
+    def lease(self, worker_id: str, visibility_timeout: float = None):
+        now = time.time()
+        timeout = visibility_timeout or self.visibility_timeout
+        # BEGIN IMMEDIATE takes the write lock, so two workers never lease the same job
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire(now)
+            row = self.db.execute(
+                "SELECT id, payload, attempts FROM jobs "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                self.db.execute("COMMIT")
+                return None
+
+            job_id, payload, attempts = row
+            lease_id = uuid.uuid4().hex
+            self.db.execute(
+                "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_id = ?, lease_expires = ?, "
+                "worker = ?, updated = ? WHERE id = ?",
+                (lease_id, now + timeout, worker_id, now, job_id)
+            )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+        return {"id": job_id, "lease_id": lease_id, "payload": json.loads(payload), "attempts": attempts + 1}
+
+    @_locked
+    def extend(self, job_id: int, lease_id: str, visibility_timeout: float = None) -> bool:
+        timeout = visibility_timeout or self.visibility_timeout
+        cursor = self.db.execute(
+            "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND lease_id = ? AND state = 'leased'",
+            (time.time() + timeout, time.time(), job_id, lease_id)
+        )
+        return cursor.rowcount == 1
+
+    @_locked
+    def complete(self, job_id: int, lease_id: str, result) -> bool:
+        cursor = self.db.execute(
+            "UPDATE jobs SET state = 'done', result = ?, error = NULL, lease_id = NULL, updated = ? "
+            "WHERE id = ? AND lease_id = ? AND state = 'leased'",
+            (json.dumps(result, default=str), time.time(), job_id, lease_id)
+        )
+        return cursor.rowcount == 1
+
+    @_locked
+    def fail(self, job_id: int, lease_id: str, error: str) -> bool:
+        # Retry while attempts are left, the job becomes available immediately
+        cursor = self.db.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END, "
+            "error = ?, lease_id = NULL, updated = ? WHERE id = ? AND lease_id = ? AND state = 'leased'",
+            (self.max_attempts, error, time.time(), job_id, lease_id)
+        )
+        return cursor.rowcount == 1
+
+    @_locked
+    def collect(self, limit: int = 100) -> list:
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.db.execute(
+                "SELECT id, key, payload, state, result, error, attempts FROM jobs "
+                "WHERE collected = 0 AND state IN ('done', 'dead') ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+            self.db.executemany("UPDATE jobs SET collected = 1 WHERE id = ?", [(row[0],) for row in rows])
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+        return [{
+            "id": job_id,
+            "key": key,
+            "payload": json.loads(payload),
+            "state": state,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "attempts": attempts
+        } for job_id, key, payload, state, result, error, attempts in rows]
+
+    @_locked
+    def stats(self) -> dict:
+        # Swept here too, so a coordinator without live workers still sees those jobs finish
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire(time.time())
+            counts = dict(self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return {state: counts.get(state, 0) for state in JOB_STATES}
+
+    def _expire(self, now):
+        # Expired leases that used up their attempts are given up; call inside a transaction
+        self.db.execute(
+            "UPDATE jobs SET state = 'dead', error = COALESCE(error, 'Lease expired'), lease_id = NULL, "
+            "updated = ? WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        )
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,156 @@
+import json
+
+
+def extension_patterns(extensions: list) -> list:
+    """
+    Network.setBlockedURLs patterns matching a file extension at the end of the
+    path only, so hosts or paths merely containing it (www.movistar.es) load.
+    """
+    patterns = []
+    for extension in extensions:
+        patterns += [f"*.{extension}", f"*.{extension}?*", f"*.{extension}#*"]
+    return patterns
+
+
+# URL patterns per resource type, used with Network.setBlockedURLs
+RESOURCE_PATTERNS = {
+    "media": extension_patterns(["mp4", "webm", "ogg", "ogv", "mp3", "wav", "m4a", "mov", "m3u8"]),
+    "font": extension_patterns(["woff", "woff2", "ttf", "otf", "eot"]),
+    "image": extension_patterns(["png", "jpg", "jpeg", "gif", "webp", "avif", "ico", "bmp"]),
+}
+
+# Analytics, advertising and session recording hosts that never affect an audit
+TRACKER_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*adservice.google.*", "*connect.facebook.net*",
+    "*hotjar.com*", "*clarity.ms*", "*scorecardresearch.com*", "*cdn.segment.com*",
+    "*nr-data.net*", "*js-agent.newrelic.com*", "*snap.licdn.com*", "*bat.bing.com*"
+]
+
+# Chrome features an audit does not need
+LIGHTWEIGHT_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+]
+
+
+class LoadProfile:
+    """
+    Browser load profile: which requests to block and which Chrome features to switch off.
+
+    Args:
+        block_media (bool): Block video and audio
+        block_trackers (bool): Block analytics and ad hosts
+        block_fonts (bool): Block web fonts (may change text rendering and contrast results)
+        block_images (bool): Block images, only sensible when vision analysis is off
+        extra_patterns (list): Additional URL patterns to block
+        cache_dir (str): Disk cache directory reused between pages and runs
+        collect_stats (bool): Record network events to report requests and bytes per page
+    """
+
+    def __init__(self, block_media=True, block_trackers=True, block_fonts=False, block_images=False,
+                 extra_patterns=None, cache_dir=None, collect_stats=True):
+        self.block_media = block_media
+        self.block_trackers = block_trackers
+        self.block_fonts = block_fonts
+        self.block_images = block_images
+        self.extra_patterns = extra_patterns or []
+        self.cache_dir = cache_dir
+        self.collect_stats = collect_stats
+
+    @classmethod
+    def lightweight(cls, use_vision=True, cache_dir=None):
+        """Profile for plain audits: media, trackers and fonts blocked, images only without vision"""
+        return cls(block_fonts=True, block_images=not use_vision, cache_dir=cache_dir)
+
+    def blocked_patterns(self) -> list:
+        patterns = []
+        if self.block_media:
+            patterns += RESOURCE_PATTERNS["media"]
+        if self.block_fonts:
+            patterns += RESOURCE_PATTERNS["font"]
+        if self.block_images:
+            patterns += RESOURCE_PATTERNS["image"]
+        if self.block_trackers:
+            patterns += TRACKER_PATTERNS
+        return patterns + self.extra_patterns
+
+    def configure_options(self, chrome_options):
+        """Adds Chrome arguments and capabilities, call before the driver starts"""
+        for argument in LIGHTWEIGHT_ARGUMENTS:
+            chrome_options.add_argument(argument)
+        if self.cache_dir:
+            chrome_options.add_argument(f"--disk-cache-dir={self.cache_dir}")
+        if self.collect_stats:
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    def apply(self, driver):
+        """Enables request blocking through CDP, call once after the driver starts"""
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_patterns()})
+        # Keep the cache on so a warm cache is reused between pages
+        driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": False})
+
+    def start_page(self, driver):
+        """Drops network events of earlier pages so stats cover one page only"""
+        if self.collect_stats:
+            driver.get_log("performance")
+
+    def page_stats(self, driver) -> dict:
+        if not self.collect_stats:
+            return None
+        return summarize_network_log(driver.get_log("performance"))
+
+
+# Summarises Chrome performance log entries into request and byte counts
+def summarize_network_log(entries: list) -> dict:
+    requests = set()
+    resource_types = {}
+    cached = {}
+    blocked_by_type = {}
+    bytes_loaded = 0
+
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params", {})
+        request_id = params.get("requestId")
+
+        if method == "Network.requestWillBeSent":
+            requests.add(request_id)
+            resource_types[request_id] = params.get("type", "Other")
+        elif method == "Network.responseReceived":
+            response = params.get("response", {})
+            if response.get("fromDiskCache") or response.get("fromMemoryCache"):
+                headers = {k.lower(): v for k, v in response.get("headers", {}).items()}
+                length = headers.get("content-length", "0")
+                cached[request_id] = int(length) if str(length).isdigit() else 0
+        elif method == "Network.requestServedFromCache":
+            cached.setdefault(request_id, 0)
+        elif method == "Network.loadingFinished":
+            if request_id not in cached:
+                bytes_loaded += int(params.get("encodedDataLength", 0))
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            resource_type = params.get("type") or resource_types.get(request_id, "Other")
+            blocked_by_type[resource_type] = blocked_by_type.get(resource_type, 0) + 1
+
+    blocked = sum(blocked_by_type.values())
+    return {
+        "requests": len(requests),
+        "requests_loaded": len(requests) - blocked - len(cached),
+        "bytes_loaded": bytes_loaded,
+        "requests_blocked": blocked,
+        "blocked_by_type": blocked_by_type,
+        "requests_from_cache": len(cached),
+        # Cache hits only: blocked requests never start, so their size is unknown and not estimated
+        "bytes_saved_by_cache": sum(cached.values())
+    }
@@ -0,0 +1,250 @@
+import argparse
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.request import urlopen
+
+from src.fake_anthropic import FakeAnthropic, serve as serve_fake_anthropic
+from src.tab_pool import TabPool
+
+# Link and alt texts mixing good and bad examples, so verdicts vary like on a real site
+LINK_TEXTS = ["Lees meer", "Contact us", "klik hier", "Opening hours of the library", "meer", "Annual report 2024"]
+ALT_TEXTS = ["", "photo", "Logo", "Children reading in the library garden", "icon"]
+PARAGRAPH = ("The library offers courses, workshops and reading groups for all ages, and volunteers help "
+             "visitors find books, use the computers and apply for a membership card online. ")
+
+
+def build_site(directory: str, pages: int = 20, links: int = 8, images: int = 4, paragraphs: int = 3) -> list:
+    """Writes a static site fixture of linked pages and their images; returns the page file names"""
+    from PIL import Image
+
+    # Small PNGs with a different pattern each, so the vision pipeline fetches and describes them
+    for j in range(images):
+        image = Image.new("RGB", (64, 64))
+        image.putdata([((x * (j + 1) * 16) % 256, (y * (j + 2) * 8) % 256, ((x + y) * (j + 3) * 4) % 256)
+                       for y in range(64) for x in range(64)])
+        image.save(os.path.join(directory, f"img_{j}.png"))
+
+    names = [f"page_{i:04d}.html" for i in range(pages)]
+    for i, name in enumerate(names):
+        body = [f"<h1>Page {i}</h1>", "<main>"]
+        for j in range(paragraphs):
+            body.append(f"<h2>Section {j}</h2><p>{PARAGRAPH * (j + 1)}</p>")
+        for j in range(links):
+            body.append(f'<p>See <a href="{names[(i + j + 1) % pages]}">{LINK_TEXTS[(i + j) % len(LINK_TEXTS)]}</a></p>')
+        for j in range(images):
+            body.append(f'<img src="img_{j}.png" alt="{ALT_TEXTS[(i + j) % len(ALT_TEXTS)]}">')
+        body.append("</main>")
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(f"<html><head><title>Page {i}</title></head><body>{''.join(body)}</body></html>")
+    return names
+
+
+def serve_directory(directory: str, host="127.0.0.1", port=0) -> ThreadingHTTPServer:
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), functools.partial(QuietHandler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentiles(values: list, points=(50, 90, 99)) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 4) for p in points}
+    summary["max"] = round(ordered[-1], 4)
+    return summary
+
+
+class TimedClient:
+    # Wraps an Anthropic client to time every messages.create call as the pipeline sees it, retries included
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.client.messages.create(**kwargs)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+class LoadDriver:
+    """
+    Runs concurrent audits with AI analysis and measures the pipeline.
+
+    Without a browser, pages are fetched over HTTP and run through
+    analyze_html, which exercises extraction, rules and the AI calls; with
+    browser=True each worker thread drives its own Chrome through extract_data.
+
+    Args:
+        urls (list): Pages to audit
+        client: Anthropic client, usually pointed at a FakeAnthropic server
+        concurrency (int): Audits running at the same time
+        use_vision (bool): Also describe images through the API
+        browser (bool): Audit in Chrome instead of from fetched HTML
+        tabs (bool): With browser, audit in tabs of one shared Chrome instead of one Chrome per thread
+    """
+
+    def __init__(self, urls, client, concurrency=8, use_vision=False, browser=False, tabs=False):
+        from src.ai_analyzer import AIAnalyzer
+
+        self.urls = urls
+        self.client = TimedClient(client)
+        self.concurrency = concurrency
+        self.browser = browser
+        # Shared like in the service, so token limits are tuned across all audits
+        self.analyzer = AIAnalyzer(use_vision=use_vision, client=self.client)
+        self.tab_pool = TabPool(concurrency) if browser and tabs else None
+        self._local = threading.local()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            outcomes = list(pool.map(self._audit, self.urls))
+        duration = time.perf_counter() - start
+
+        for driver in self._drivers:
+            driver.quit()
+        if self.tab_pool:
+            self.tab_pool.close()
+
+        latencies = [o["latency"] for o in outcomes]
+        failed = [o for o in outcomes if o["error"]]
+        ai_results = sum(o["ai_results"] for o in outcomes)
+        ai_failed = sum(o["ai_errors"] for o in outcomes)
+        return {
+            "pages": len(outcomes),
+            "concurrency": self.concurrency,
+            "duration_s": round(duration, 3),
+            "throughput_pages_per_s": round(len(outcomes) / duration, 3) if duration else None,
+            "audit_latency_s": percentiles(latencies),
+            "audit_errors": len(failed),
+            "audit_error_rate": round(len(failed) / max(len(outcomes), 1), 4),
+            "ai_calls": len(self.client.latencies),
+            "ai_latency_s": percentiles(self.client.latencies),
+            "ai_call_errors": self.client.errors,
+            # Elements whose AI analysis ended in an error after the client gave up retrying
+            "ai_element_error_rate": round(ai_failed / max(ai_results, 1), 4),
+            "ai_verdicts": dict(self.analyzer.stats),
+            "ai_max_tokens": dict(self.analyzer.token_budget.limits),
+            "errors": sorted({o["error"] for o in failed})[:5],
+            "tabs": dict(self.tab_pool.stats) if self.tab_pool else None
+        }
+
+    def _audit(self, url):
+        from src.scraper import AccessibilityScraper
+
+        start = time.perf_counter()
+        outcome = {"url": url, "error": None, "ai_results": 0, "ai_errors": 0}
+        analyzer = self.analyzer
+        try:
+            if self.tab_pool:
+                with self.tab_pool.driver() as driver:
+                    results = AccessibilityScraper(url, use_ai=True, ai_analyzer=analyzer, driver=driver).extract_data()
+            elif self.browser:
+                results = AccessibilityScraper(url, use_ai=True, ai_analyzer=analyzer,
+                                               driver=self._driver()).extract_data()
+            else:
+                with urlopen(url, timeout=30) as response:
+                    html = response.read().decode("utf-8", errors="replace")
+                results = AccessibilityScraper(url, browser=False, use_ai=True, ai_analyzer=analyzer).analyze_html(html)
+
+            for items in results["ai_results"]["ai_advice"].values():
+                outcome["ai_results"] += len(items)
+                outcome["ai_errors"] += sum(1 for item in items if "error" in item["ai_analysis"])
+        except Exception as e:
+            outcome["error"] = f"{type(e).__name__}: {e}"
+        outcome["latency"] = time.perf_counter() - start
+        return outcome
+
+    def _driver(self):
+        # One warm browser per worker thread
+        if getattr(self._local, "driver", None) is None:
+            from src.scraper import create_driver
+            self._local.driver = create_driver()
+            with self._lock:
+                self._drivers.append(self._local.driver)
+        return self._local.driver
+
+
+def run_load_test(pages=20, concurrency=8, latency="lognormal:0.5,0.5", error_429=0.0, error_529=0.0,
+                  rpm=None, max_retries=2, use_vision=False, browser=False, site_dir=None, seed=0,
+                  tabs=False) -> dict:
+    """Starts a fake API and a static site, runs the load driver and returns its report"""
+    from anthropic import Anthropic
+
+    fake = FakeAnthropic(latency, error_429, error_529, rpm, seed=seed)
+    api = serve_fake_anthropic(fake)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = site_dir or tmp
+        names = build_site(directory, pages) if site_dir is None else sorted(
+            name for name in os.listdir(directory) if name.endswith(".html"))
+        site = serve_directory(directory)
+        base = f"http://127.0.0.1:{site.server_port}/"
+
+        client = Anthropic(api_key="fake-key", base_url=f"http://127.0.0.1:{api.server_port}",
+                           max_retries=max_retries)
+        try:
+            report = LoadDriver([base + name for name in names], client, concurrency,
+                                use_vision=use_vision, browser=browser, tabs=tabs).run()
+        finally:
+            site.shutdown()
+            api.shutdown()
+
+    report["api"] = {key: fake.stats[key] for key in ("requests", "ok", "429", "529", "retries")}
+    report["api"]["vision_requests"] = fake.stats["images"]
+    report["api"]["server_latency_s"] = percentiles(fake.stats["latencies"])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the audit pipeline against a fake Anthropic API")
+    parser.add_argument("--pages", type=int, default=20, help="pages in the generated site")
+    parser.add_argument("--site-dir", help="audit the .html files in this directory instead")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.5,0.5", help="fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-529", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, help="requests per minute the fake API allows")
+    parser.add_argument("--max-retries", type=int, default=2, help="client retries on 429/529")
+    parser.add_argument("--vision", action="store_true", help="also describe images")
+    parser.add_argument("--browser", action="store_true", help="audit in Chrome instead of fetched HTML")
+    parser.add_argument("--tabs", action="store_true", help="with --browser, use tabs of one Chrome")
+    parser.add_argument("--json", help="save the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.pages, args.concurrency, args.latency, args.error_429, args.error_529,
+                           args.rpm, args.max_retries, args.vision, args.browser, args.site_dir,
+                           tabs=args.tabs)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
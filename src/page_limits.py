@@ -0,0 +1,215 @@
+import random
+
+HEADINGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# Elements whose text is read when they end, so their subtree must not be freed earlier
+TEXT_ELEMENTS = ('a', 'p', 'title') + HEADINGS
+
+# Characters read from the browser per call in the streaming path
+CHUNK_SIZE = 1_000_000
+
+# Returns the serialized DOM, or stores it in the page when it is too big to pull
+# at once and returns its size in characters, so the page is serialized only once
+MEASURE_DOM_SCRIPT = """
+var html = document.documentElement.outerHTML;
+if (html.length <= arguments[0]) { return html; }
+window.__a11yPageSource = html;
+return html.length;
+"""
+
+READ_CHUNK_SCRIPT = "return window.__a11yPageSource.substr(arguments[0], arguments[1]);"
+
+RELEASE_DOM_SCRIPT = "delete window.__a11yPageSource;"
+
+
+class PageLimits:
+    """
+    Limits that keep memory and time bounded on pathological pages.
+
+    Pages above max_dom_size are not parsed into a BeautifulSoup tree but read
+    from the browser in chunks and extracted with a streaming lxml parser.
+    Anything cut by a limit is noted under 'degraded' in the results.
+
+    Args:
+        max_dom_size (int): Serialized DOM size (characters) above which the streaming path is used
+        max_elements (int): Links, images and text blocks kept per category, spread over the page, None for all
+        max_text_chars (int): Text block length after which text is truncated, None for no limit
+        max_context_chars (int): Length of the paragraph text used as element context
+        axe_timeout (int): Seconds axe may run before the page is reported without axe results
+        chunk_size (int): Characters read from the browser per call when streaming
+    """
+
+    def __init__(self, max_dom_size=5_000_000, max_elements=None, max_text_chars=None,
+                 max_context_chars=200, axe_timeout=60, chunk_size=CHUNK_SIZE):
+        self.max_dom_size = max_dom_size
+        self.max_elements = max_elements
+        self.max_text_chars = max_text_chars
+        self.max_context_chars = max_context_chars
+        self.axe_timeout = axe_timeout
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def unlimited(cls):
+        return cls(max_dom_size=None, max_elements=None, max_text_chars=None, max_context_chars=200,
+                   axe_timeout=None)
+
+    def over_dom_size(self, size: int) -> bool:
+        return self.max_dom_size is not None and size > self.max_dom_size
+
+    def truncate(self, text: str, limit: int = None):
+        """Returns (text, truncated)"""
+        limit = self.max_text_chars if limit is None else limit
+        if limit is None or len(text) <= limit:
+            return text, False
+        return text[:limit] + "...", True
+
+
+def spread_sample(items: list, limit: int) -> list:
+    """Keeps limit items spread evenly over the list, in their original order"""
+    if limit is None or len(items) <= limit:
+        return items
+    return [items[i * len(items) // limit] for i in range(limit)]
+
+
+def read_page_source(driver, limits: PageLimits):
+    """
+    Returns (html, size). html is None when the page is larger than
+    max_dom_size; it is then kept in the page for read_chunks.
+    """
+    if limits.max_dom_size is None:
+        return driver.page_source, None
+    measured = driver.execute_script(MEASURE_DOM_SCRIPT, limits.max_dom_size)
+    if isinstance(measured, str):
+        return measured, len(measured)
+    return None, measured
+
+
+def read_chunks(driver, size: int, chunk_size: int = CHUNK_SIZE):
+    """Yields the HTML stored by read_page_source piece by piece and releases it afterwards"""
+    try:
+        for offset in range(0, size, chunk_size):
+            yield driver.execute_script(READ_CHUNK_SCRIPT, offset, chunk_size)
+    finally:
+        driver.execute_script(RELEASE_DOM_SCRIPT)
+
+
+class _Reservoir:
+    # Uniform sample of a stream of unknown length, seeded so runs are repeatable
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.seen = 0
+        self.items = []
+        self._random = random.Random(0)
+
+    def add(self, item):
+        self.seen += 1
+        if self.limit is None or len(self.items) < self.limit:
+            self.items.append((self.seen, item))
+            return
+        slot = self._random.randrange(self.seen)
+        if slot < self.limit:
+            self.items[slot] = (self.seen, item)
+
+    def sample(self):
+        return [item for _, item in sorted(self.items, key=lambda pair: pair[0])]
+
+
+def stream_extract(chunks, limits: PageLimits):
+    """
+    Extracts links, images and text blocks from HTML chunks with lxml's
+    HTMLPullParser, freeing each finished subtree so memory stays bounded.
+
+    Context is simpler than in the BeautifulSoup path: the last heading seen
+    and the enclosing paragraph, and text blocks come from every <p>, not
+    only those in <main>.
+
+    Returns:
+        tuple: (elements dict like _extract_elements, info dict with
+        'page_title', 'main_heading', 'found' per category and 'truncated')
+    """
+    from lxml import etree
+
+    parser = etree.HTMLPullParser(events=('start', 'end'), huge_tree=True)
+    samples = {category: _Reservoir(limits.max_elements) for category in ('links', 'images', 'text_blocks')}
+    info = {'page_title': '', 'main_heading': '', 'truncated': 0}
+    state = {'heading': '', 'keep': 0, 'paragraph': []}
+
+    def context():
+        return f"Section: {state['heading']}" if state['heading'] else 'No context available'
+
+    def handle(event, element):
+        tag = element.tag if isinstance(element.tag, str) else ''
+        if event == 'start':
+            if tag in TEXT_ELEMENTS:
+                state['keep'] += 1
+            if tag == 'img':
+                image = {
+                    'src': element.get('src', ''),
+                    'alt': element.get('alt', ''),
+                    'aria_label': element.get('aria-label', ''),
+                    'title': element.get('title', ''),
+                    'context': context(),
+                    'role': element.get('role', ''),
+                    'is_decorative': element.get('role') == 'presentation' or element.get('alt') == ''
+                }
+                samples['images'].add(image)
+                if state['keep']:
+                    state['paragraph'].append(image)
+            return
+
+        if tag in TEXT_ELEMENTS:
+            text = ''.join(element.itertext()).strip()
+            state['keep'] -= 1
+            if tag == 'title' and not info['page_title']:
+                info['page_title'] = text
+            elif tag in HEADINGS:
+                state['heading'] = text
+                if tag == 'h1' and not info['main_heading']:
+                    info['main_heading'] = text
+            elif tag == 'a' and element.get('href') is not None and text not in ['', '«', '»', '<', '>']:
+                link = {
+                    'text': text,
+                    'href': element.get('href', ''),
+                    'context': context(),
+                    'aria_label': element.get('aria-label'),
+                    'title': element.get('title'),
+                    'role': element.get('role')
+                }
+                samples['links'].add(link)
+                state['paragraph'].append(link)
+            elif tag == 'p':
+                # Links and images inside the paragraph get its text as context
+                paragraph, _ = limits.truncate(text, limits.max_context_chars)
+                for item in state['paragraph']:
+                    item['context'] = f"{item['context']} | Paragraph: {paragraph}"
+                state['paragraph'] = []
+
+                if len(text.split()) > 15:
+                    block_text, truncated = limits.truncate(text)
+                    info['truncated'] += truncated
+                    samples['text_blocks'].add({
+                        'text': block_text,
+                        'heading_context': state['heading'],
+                        'word_count': len(text.split())
+                    })
+
+            if not state['keep']:
+                state['paragraph'] = []
+
+        if not state['keep']:
+            # Nothing open needs this subtree any more
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            handle(event, element)
+    parser.close()
+    for event, element in parser.read_events():
+        handle(event, element)
+
+    info['found'] = {category: sample.seen for category, sample in samples.items()}
+    return {category: sample.sample() for category, sample in samples.items()}, info
@@ -1,11 +1,17 @@
 from datetime import datetime
 
+from src.axe_compactor import violation_summaries
+
 
 class AccessibilityReporter:
     #HTML report generator for accessibility analysis
 
-    def generate_report(self, results: dict) -> str:
-        """Generate HTML report from analysis results"""
+    def generate_report(self, results: dict, templates: dict = None) -> str:
+        """Generate HTML report from analysis results
+
+        templates: findings per template fingerprint, usually
+        TemplateDetector.templates, used to render the site-wide section
+        """
         url = results.get('url', 'Unknown')
         axe = results.get('axe_results', {})
         week2 = results.get('week2', {})
@@ -45,17 +51,40 @@ class AccessibilityReporter:
         <h1> Accessibility Analysis Report</h1>
         <p><strong>URL:</strong> {url}</p>
         <p><strong>Generated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+        {self._degraded_section(results.get('degraded'))}
 
         {self._summary_section(axe, week2, ai)}
         {self._axe_section(axe)}
         {self._rule_section(week2)}
         {self._ai_section(ai)}
+        {self._site_wide_section(results.get('site_wide'), templates or {})}
         {self._actions_section()}
     </div>
 </body>
 </html>"""
         return html
 
+    def _degraded_section(self, degraded):
+        """Note when page limits cut the analysis short"""
+        if not degraded:
+            return ''
+
+        notes = []
+        if 'streamed' in degraded:
+            notes.append(f"Page too large ({degraded['streamed']['dom_size']} characters), "
+                         f"elements were extracted in streaming mode with simplified context")
+        for category, counts in degraded.get('sampled', {}).items():
+            notes.append(f"Only {counts['kept']} of {counts['found']} {category.replace('_', ' ')} were analyzed")
+        if degraded.get('truncated_text_blocks'):
+            notes.append(f"{degraded['truncated_text_blocks']} text block(s) were truncated")
+        if 'axe_timeout' in degraded:
+            notes.append(f"Axe-core did not finish within {degraded['axe_timeout']}s, technical issues are missing")
+        if degraded.get('templates_skipped'):
+            notes.append("Site-wide template detection was skipped")
+
+        items = ''.join(f'<li>{note}</li>' for note in notes)
+        return f'<div class="ai-insight"><strong>Partial analysis:</strong><ul>{items}</ul></div>'
+
     def _summary_section(self, axe, week2, ai):
         """Summary"""
         violations = len(axe.get('violations', []))
@@ -92,7 +121,7 @@ class AccessibilityReporter:
 
     def _axe_section(self, axe):
         """Axe-core violations"""
-        violations = axe.get('violations', [])
+        violations = violation_summaries(axe)
         if not violations:
             return '<h2>Technical Issues (Axe-core)</h2><p>No violations found!</p>'
 
@@ -104,7 +133,7 @@ class AccessibilityReporter:
                 <strong>{v.get('id', 'Unknown').replace('-', ' ').title()}</strong>
                 <span class="badge {impact}">{impact}</span>
                 <p>{v.get('description', '')}</p>
-                <p><strong>Affected:</strong> {len(v.get('nodes', []))} element(s)</p>
+                <p><strong>Affected:</strong> {v['node_count']} element(s)</p>
                 <a href="{v.get('helpUrl', '#')}" class="wcag-link" target="_blank">Learn More</a>
             </div>
             """
@@ -219,6 +248,51 @@ class AccessibilityReporter:
                     </div>
                     """
 
+        # Paragraphs past the analyzer's text chunk limit were never sent, so they did not pass either
+        unassessed = [item for item in advice.get('text_blocks', [])
+                      if (item.get('ai_analysis') or {}).get('skipped') == 'chunk_limit']
+        if unassessed:
+            paragraphs = ''.join(f"<li>{item['text_block'].get('heading_context') or 'No heading'}: "
+                                 f"{(item['text_block'].get('text') or '')[:80]}...</li>" for item in unassessed)
+            html += f"""
+            <div class="ai-insight">
+                <strong>Not assessed:</strong> {len(unassessed)} paragraph(s) were past the text chunk limit
+                and were not checked for reading level
+                <ul>{paragraphs}</ul>
+            </div>
+            """
+
+        return html
+
+    def _site_wide_section(self, site_wide, templates):
+        """Site-wide template findings, shown once instead of on every page"""
+        refs = (site_wide or {}).get('templates', [])
+        if not refs:
+            return ''
+
+        html = '<h2>Site-wide Findings</h2>'
+        html += '<p>These regions repeat across the site and were analyzed once:</p>'
+        for ref in refs:
+            template = templates.get(ref['fingerprint'])
+            if not template:
+                html += f"""
+            <div class="issue">
+                <strong>&lt;{ref['region']}&gt;</strong> <code>{ref['fingerprint']}</code>
+            </div>
+            """
+                continue
+
+            findings = template.get('findings', {})
+            violations = findings.get('axe_violations', [])
+            rule_issues = len(findings.get('links', [])) + len(findings.get('images', []))
+            html += f"""
+            <div class="issue">
+                <strong>&lt;{template['region']}&gt;</strong> <code>{ref['fingerprint']}</code>
+                <p><strong>Seen on:</strong> {len(template.get('pages', []))} page(s), first on {template.get('first_url')}</p>
+                <p><strong>Technical (Axe):</strong> {len(violations)} &nbsp; <strong>Semantic (Rules):</strong> {rule_issues}</p>
+                {''.join(f'<span class="badge {v.get("impact") or "moderate"}">{v["id"]}</span> ' for v in violations)}
+            </div>
+            """
         return html
 
     def _actions_section(self):
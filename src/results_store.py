@@ -0,0 +1,297 @@
+import re
+import sqlite3
+import time
+
+from src.axe_compactor import COMPACT_FORMAT
+
+# Rule based issue ids and the WCAG criterion they check
+RULE_CRITERIA = {
+    "vague_link_text": "2.4.4",
+    "missing_alt": "1.1.1",
+    "generic_alt": "1.1.1",
+    "weak_alt": "1.1.1",
+}
+
+# AI advice categories, their rule name and default criterion
+AI_CATEGORIES = {
+    "links": ("ai-link-purpose", "2.4.4", "link", "href"),
+    "images": ("ai-alt-text", "1.1.1", "image", "src"),
+    "text_blocks": ("ai-reading-level", "3.1.5", "text_block", "heading_context"),
+}
+
+# Rule based checks use high/medium/low, axe and AI use axe impact levels
+SEVERITIES = {"high": "serious", "medium": "moderate", "low": "minor"}
+
+SEVERITY_ORDER = ["critical", "serious", "moderate", "minor"]
+
+WCAG_TAG = re.compile(r"^wcag(\d)(\d)(\d+)$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    url TEXT NOT NULL,
+    UNIQUE (run_id, url)
+);
+
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    criterion TEXT NOT NULL DEFAULT '',
+    UNIQUE (source, rule, criterion)
+);
+CREATE INDEX IF NOT EXISTS rules_criterion ON rules (criterion);
+
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    page_id INTEGER NOT NULL,
+    rule_id INTEGER NOT NULL,
+    severity TEXT,
+    target TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS findings_run_rule ON findings (run_id, rule_id, page_id);
+CREATE INDEX IF NOT EXISTS findings_run_severity ON findings (run_id, severity, rule_id);
+CREATE INDEX IF NOT EXISTS findings_page ON findings (page_id, rule_id);
+"""
+
+
+def wcag_criterion(tags: list):
+    """First WCAG success criterion in axe tags, e.g. 'wcag1410' -> '1.4.10'"""
+    for tag in tags or []:
+        match = WCAG_TAG.match(tag)
+        if match:
+            return ".".join(match.groups())
+    return None
+
+
+def normalize_severity(severity):
+    if severity is None:
+        return None
+    return SEVERITIES.get(severity, severity)
+
+
+def flatten_findings(results: dict) -> list:
+    """
+    Turns one extract_data result into flat findings:
+    (source, rule, criterion, severity, target, message) tuples.
+    """
+    findings = []
+
+    axe = results.get("axe_results") or {}
+    rules = axe.get("rules", {}) if axe.get("format") == COMPACT_FORMAT else {}
+    for violation in axe.get("violations", []) or []:
+        meta = rules.get(violation.get("id"), violation)
+        criterion = wcag_criterion(meta.get("tags"))
+        for node in violation.get("nodes", []) or [{}]:
+            findings.append((
+                "axe", violation.get("id"), criterion,
+                normalize_severity(node.get("impact") or violation.get("impact")),
+                " ".join(map(str, node.get("target") or [])) or None,
+                meta.get("help") or meta.get("description")
+            ))
+
+    week2 = results.get("week2") or {}
+    for category in ("links", "images"):
+        for issue in week2.get(category, []):
+            rule = issue.get("issue")
+            findings.append(("rule", rule, RULE_CRITERIA.get(rule), normalize_severity(issue.get("severity")),
+                             None, None))
+
+    advice = (results.get("ai_results") or {}).get("ai_advice", {})
+    for category, (rule, default_criterion, element_key, target_key) in AI_CATEGORIES.items():
+        for item in advice.get(category, []):
+            analysis = item.get("ai_analysis") or {}
+            # Failed calls, unparsable answers and verdicts with invalid fields are not findings
+            if analysis.get("is_accessible") is not False or "error" in analysis or analysis.get("invalid_fields"):
+                continue
+            element = item.get(element_key) or {}
+            findings.append((
+                "ai", rule, analysis.get("wcag_criterion") or default_criterion,
+                normalize_severity(analysis.get("severity")) or "moderate",
+                element.get(target_key), analysis.get("issue")
+            ))
+
+    return findings
+
+
+def template_results(template: dict) -> dict:
+    """A site-wide template's stored findings in extract_data form, for flatten_findings"""
+    findings = template.get("findings") or {}
+    return {
+        "url": f"site-wide:{template.get('region')}:{template.get('fingerprint')}",
+        "axe_results": {"violations": [
+            {"id": v["id"], "impact": v.get("impact"), "tags": v.get("tags", []), "help": v.get("description"),
+             "nodes": [{}] * max(v.get("node_count", 1), 1)}
+            for v in findings.get("axe_violations", [])
+        ]},
+        "week2": {"links": findings.get("links", []), "images": findings.get("images", [])},
+        "ai_results": findings.get("ai_results")
+    }
+
+
+class ResultsStore:
+    """
+    Indexed SQLite store of findings from many audits, for trends and diffs across runs.
+
+    Findings reference a page (url per run) and a rule (source, rule id, WCAG criterion),
+    so queries by run, url, rule, criterion, severity or source all hit an index.
+
+    Args:
+        path (str): Database file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self._rule_ids = {}
+
+    def create_run(self, label: str = None) -> int:
+        with self.db:
+            cursor = self.db.execute("INSERT INTO runs (label, started) VALUES (?, ?)", (label, time.time()))
+        return cursor.lastrowid
+
+    def runs(self) -> list:
+        rows = self.db.execute(
+            "SELECT r.id, r.label, r.started, "
+            "(SELECT COUNT(*) FROM pages p WHERE p.run_id = r.id), "
+            "(SELECT COUNT(*) FROM findings f WHERE f.run_id = r.id) "
+            "FROM runs r ORDER BY r.id"
+        )
+        return [dict(zip(["id", "label", "started", "pages", "findings"], row)) for row in rows]
+
+    def ingest(self, run_id: int, results_list) -> int:
+        """Bulk inserts the findings of many extract_data results; returns the number of findings"""
+        count = 0
+        try:
+            with self.db:
+                for results in results_list:
+                    if "error" in results:
+                        continue
+                    page_id = self._page_id(run_id, results.get("url", ""))
+                    # A page ingested twice replaces its earlier findings
+                    self.db.execute("DELETE FROM findings WHERE page_id = ?", (page_id,))
+                    rows = [
+                        (run_id, page_id, self._rule_id(source, rule, criterion), severity, target, message)
+                        for source, rule, criterion, severity, target, message in flatten_findings(results)
+                    ]
+                    self.db.executemany(
+                        "INSERT INTO findings (run_id, page_id, rule_id, severity, target, message) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", rows
+                    )
+                    count += len(rows)
+        except Exception:
+            # Rule ids cached during the rolled back transaction no longer exist
+            self._rule_ids.clear()
+            raise
+        return count
+
+    def ingest_templates(self, run_id: int, templates: dict) -> int:
+        """
+        Stores the findings of site-wide templates once per run, each as a page
+        'site-wide:<region>:<fingerprint>', since pages skip those regions.
+        """
+        return self.ingest(run_id, [template_results(template) for template in templates.values()])
+
+    def aggregate(self, run_id: int, by: str = "rule", source: str = None, criterion: str = None) -> list:
+        """Findings and affected pages per rule, criterion, severity, source or url"""
+        columns = {"rule": "r.source, r.rule, r.criterion", "criterion": "r.criterion", "severity": "f.severity",
+                   "source": "r.source", "url": "p.url"}
+        if by not in columns:
+            raise ValueError(f"Cannot aggregate by '{by}', use one of {sorted(columns)}")
+
+        where, params = self._filters(run_id, source, criterion)
+        rows = self.db.execute(
+            f"SELECT {columns[by]}, COUNT(*) AS findings, COUNT(DISTINCT f.page_id) AS pages "
+            f"FROM findings f JOIN rules r ON r.id = f.rule_id JOIN pages p ON p.id = f.page_id "
+            f"WHERE {where} GROUP BY {columns[by]} ORDER BY findings DESC",
+            params
+        ).fetchall()
+        keys = [c.split(".")[1] for c in columns[by].split(", ")] + ["findings", "pages"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def top_offenders(self, run_id: int, limit: int = 10, min_severity: str = None,
+                      source: str = None, criterion: str = None) -> list:
+        """Pages with the most findings, optionally only at or above a severity"""
+        where, params = self._filters(run_id, source, criterion)
+        if min_severity:
+            levels = SEVERITY_ORDER[:SEVERITY_ORDER.index(min_severity) + 1]
+            where += f" AND f.severity IN ({', '.join('?' * len(levels))})"
+            params += levels
+        rows = self.db.execute(
+            f"SELECT p.url, COUNT(*) AS findings, COUNT(DISTINCT f.rule_id) AS rules "
+            f"FROM findings f JOIN rules r ON r.id = f.rule_id JOIN pages p ON p.id = f.page_id "
+            f"WHERE {where} GROUP BY f.page_id ORDER BY findings DESC LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [dict(zip(["url", "findings", "rules"], row)) for row in rows]
+
+    def diff(self, base_run: int, run_id: int, source: str = None, criterion: str = None) -> dict:
+        """
+        Compares two runs per (url, rule): 'regressed' pairs are new or have more
+        findings in run_id, 'fixed' pairs disappeared. Only pages audited in both
+        runs are compared, so a partial crawl does not show up as fixes.
+        """
+        where_base, params_base = self._filters(base_run, source, criterion)
+        where_new, params_new = self._filters(run_id, source, criterion)
+        query = (
+            "WITH base AS ("
+            " SELECT p.url, f.rule_id, COUNT(*) AS n FROM findings f JOIN rules r ON r.id = f.rule_id"
+            f" JOIN pages p ON p.id = f.page_id WHERE {where_base} GROUP BY p.url, f.rule_id),"
+            " new AS ("
+            " SELECT p.url, f.rule_id, COUNT(*) AS n FROM findings f JOIN rules r ON r.id = f.rule_id"
+            f" JOIN pages p ON p.id = f.page_id WHERE {where_new} GROUP BY p.url, f.rule_id),"
+            " shared AS ("
+            " SELECT a.url FROM pages a JOIN pages b ON b.url = a.url AND b.run_id = ? WHERE a.run_id = ?)"
+            " SELECT x.url, r.source, r.rule, r.criterion, COALESCE(y.n, 0), x.n"
+            " FROM {current} x JOIN rules r ON r.id = x.rule_id"
+            " LEFT JOIN {other} y ON y.url = x.url AND y.rule_id = x.rule_id"
+            " WHERE x.url IN (SELECT url FROM shared) AND x.n > COALESCE(y.n, 0)"
+            " ORDER BY x.url, r.rule"
+        )
+        params = params_base + params_new + [run_id, base_run]
+        keys = ["url", "source", "rule", "criterion", "before", "after"]
+
+        regressed = self.db.execute(query.format(current="new", other="base"), params).fetchall()
+        fixed = self.db.execute(query.format(current="base", other="new"), params).fetchall()
+        return {
+            "regressed": [dict(zip(keys, row)) for row in regressed],
+            # For fixes x is the base run, so before/after are swapped back
+            "fixed": [dict(zip(keys, (*row[:4], row[5], row[4]))) for row in fixed]
+        }
+
+    def close(self):
+        self.db.close()
+
+    def _filters(self, run_id, source=None, criterion=None):
+        where, params = "f.run_id = ?", [run_id]
+        if source:
+            where += " AND r.source = ?"
+            params.append(source)
+        if criterion:
+            where += " AND r.criterion = ?"
+            params.append(criterion)
+        return where, params
+
+    def _page_id(self, run_id, url):
+        self.db.execute("INSERT OR IGNORE INTO pages (run_id, url) VALUES (?, ?)", (run_id, url))
+        return self.db.execute("SELECT id FROM pages WHERE run_id = ? AND url = ?", (run_id, url)).fetchone()[0]
+
+    def _rule_id(self, source, rule, criterion):
+        # '' instead of NULL, since UNIQUE treats every NULL as distinct
+        key = (source, rule or "", criterion or "")
+        if key not in self._rule_ids:
+            self.db.execute("INSERT OR IGNORE INTO rules (source, rule, criterion) VALUES (?, ?, ?)", key)
+            self._rule_ids[key] = self.db.execute(
+                "SELECT id FROM rules WHERE source = ? AND rule = ? AND criterion = ?", key
+            ).fetchone()[0]
+        return self._rule_ids[key]
@@ -1,138 +1,435 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+# selenium, axe, bs4 and the AI client are imported where they are used, so
+# importing this module (e.g. for the CLI or a report rebuild) stays cheap
 from src.semantic_validator import enrich_elements
-from axe_selenium_python import Axe
-from bs4 import BeautifulSoup
-from src.ai_analyzer import AIAnalyzer
+from src.axe_compactor import compact_axe_results, violation_summaries
+from src.emulation import apply_viewport, clear_viewport, merge_captures, resolve_state, resolve_viewport, run_state
+from src.page_limits import PageLimits, read_chunks, read_page_source, spread_sample, stream_extract
 from src.semantic_validator import (
     analyze_readability,
     analyze_alt_text,
     analyze_links,
 )
 import time
+from urllib.parse import urlparse
 
 """ Initialize the scraper
          Args:
              url (str): Website URL to analyze
              headless (bool): Run browser in background
+             compact_axe (bool | dict): Return axe results in compact form,
+                 a dict is passed on as options to compact_axe_results
+             ai_analyzer (AIAnalyzer): Existing analyzer to share between pages
+             template_detector (TemplateDetector): Shared detector so site-wide
+                 header/nav/footer regions are analysed once per crawl
+             load_profile (LoadProfile): Request blocking and lightweight browser settings
+             driver (WebDriver): Warm driver to reuse, e.g. from a pool; it is not quit afterwards
+             browser (bool): Start a browser; without one only analyze_html can be used
+             on_stage (callable): Called with 'loaded' and 'axe' as the page progresses
+             defer_ai (bool): Skip the page level AI analysis so the caller can run
+                 (and checkpoint) it separately; template regions still use AI
+             limits (PageLimits): DOM size, element and text limits for huge pages
 """
 
 
+# Starts a configured Chrome driver, shared by the scraper and the driver pools
+def create_driver(headless=True, load_profile=None):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    # Configure Chrome options
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    if load_profile:
+        load_profile.configure_options(chrome_options)
+
+    # Initialize Chrome driver
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.set_page_load_timeout(30)
+    if load_profile:
+        load_profile.apply(driver)
+    return driver
+
+
 class AccessibilityScraper:
-    def __init__(self, url, headless=True, use_ai=False):
+    def __init__(self, url, headless=True, use_ai=False, compact_axe=False, ai_analyzer=None,
+                 template_detector=None, load_profile=None, driver=None, browser=True,
+                 on_stage=None, defer_ai=False, limits=None):
         self.url = url
         self.use_ai = use_ai
-        self.ai_analyzer = AIAnalyzer() if use_ai else None
-
-        # Configure Chrome options
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-
-        # Initialize Chrome driver
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.set_page_load_timeout(30)
+        self.compact_axe = compact_axe
+        self.template_detector = template_detector
+        self.load_profile = load_profile
+        self.on_stage = on_stage
+        self.defer_ai = defer_ai
+        self.limits = limits or PageLimits()
+        # What the limits cut on the current page, reported as 'degraded'
+        self.degraded = {}
+        # Pass a shared analyzer to reuse its client and image descriptions across pages
+        self.ai_analyzer = ai_analyzer
+        if use_ai and ai_analyzer is None:
+            from src.ai_analyzer import AIAnalyzer
+            self.ai_analyzer = AIAnalyzer()
+
+        # A driver passed in belongs to the caller (e.g. a pool) and is not quit here
+        self._owns_driver = driver is None and browser
+        self.driver = driver or (create_driver(headless, load_profile) if browser else None)
 
     # Gets both Axe results and elements for AI
     # Returns:  dict: Contains 'axe_results' and 'elements_for_ai'
     def extract_data(self):
         try:
-            print(f" Loading {self.url}...")
-            self.driver.get(self.url)
+            load_stats = self.load_page()
+            self._stage('loaded')
+            capture = self.capture()
+            self._stage('axe')
 
-            # Wait for page to load
-            time.sleep(2)
+            print("Extracting page elements...")
+            raw_elements = capture['elements'] or self._extract_elements(capture['soup'])
 
-            # Run Axe-core for technical analysis
-            print(" Running Axe-core analysis...")
-            axe = Axe(self.driver)
-            axe.inject()
-            axe_results = axe.run()
+            result = self._analyze_elements(capture['axe_results'], raw_elements, capture['titles'])
+            result['site_wide'] = capture['site_wide']
+            result['load_stats'] = load_stats
+            result['degraded'] = self.degraded or None
+            return result
 
-            # Get HTML for context extraction
-            print("Extracting page elements...")
-            html = self.driver.page_source
-            soup = BeautifulSoup(html, 'lxml')
+        except Exception as e:
+            print(f" Error during extraction: {e}")
+            raise
+        finally:
+            self.close()
+
+    # Audits the page under several viewports and interaction states
+    # States are applied cumulatively in the given order within each viewport; when states
+    # are given, the page is reloaded with its cookies and storage cleared for every further
+    # viewport, so each starts clean; without states it is loaded once and only re-rendered
+    # Returns:  dict: Same shape as extract_data, plus a summary per state under 'states'
+    def extract_states(self, viewports=('desktop', 'mobile'), states=()):
+        if not viewports:
+            self.close()
+            raise ValueError("extract_states needs at least one viewport")
+        try:
+            load_stats = self.load_page()
+            self._stage('loaded')
+            captures = []
+            site_wide = None
+
+            for index, viewport in enumerate(map(resolve_viewport, viewports)):
+                print(f" Emulating {viewport['name']} ({viewport['width']}x{viewport['height']})...")
+                apply_viewport(self.driver, viewport)
+                if index and states:
+                    self._reload()
+                steps = [None] + [resolve_state(state) for state in states]
+
+                for state in steps:
+                    name = viewport['name'] if state is None else f"{viewport['name']}:{state['name']}"
+                    if state is not None:
+                        changed = run_state(self.driver, state)
+                        print(f" State {name}: {changed} element(s) changed")
+
+                    capture = self.capture(compact=False)
+                    site_wide = site_wide or capture['site_wide']
+                    captures.append({
+                        'state': name,
+                        'axe_results': capture['axe_results'],
+                        'raw_elements': capture['elements'] or self._extract_elements(capture['soup']),
+                        'titles': capture['titles']
+                    })
 
-            # Extract elements with context for AI analysis
-            raw_elements = {
-                'links': self._extract_links(soup),
-                'images': self._extract_images(soup),
-                'text_blocks': self._extract_text_blocks(soup)
-            }
-
-            semantic_elements = enrich_elements(raw_elements)
-
-            elements_for_ai = {
-                **semantic_elements,
-                'page_title': soup.find('title').get_text() if soup.find('title') else '',
-                'main_heading': soup.find('h1').get_text() if soup.find('h1') else ''
-            }
-
-            print(f" Extraction complete!")
-            print(f"   - Found {len(elements_for_ai['links'])} links")
-            print(f"   - Found {len(elements_for_ai['images'])} images")
-            print(f"   - Found {len(elements_for_ai['text_blocks'])} text blocks")
-            print(f"   - Axe found {len(axe_results.get('violations', []))} violations")
-
-            week2 = {
-                "readability": [],
-                "images": [],
-                "links": []
-            }
-
-            ai_results = None
-
-            if self.use_ai and self.ai_analyzer:
-                print(" Running AI semantic analysis...")
-                ai_results = self.ai_analyzer.analyze(raw_elements)
-
-            # Analyze text readability
-            for block in semantic_elements["text_blocks"]:
-                readability = analyze_readability(block["text"])
-                week2["readability"].append(readability)
-
-            # Analyze images
-            for image in semantic_elements["images"]:
-                result = analyze_alt_text(image)
-                if result["issue"]:
-                    week2["images"].append(result)
-
-            # Analyze links
-            for link in semantic_elements["links"]:
-                result = analyze_links(link)
-                if result["issue"]:
-                    week2["links"].append(result)
-
-            return {
-                'url': self.url,
-                'axe_results': axe_results,
-                'raw_elements': raw_elements,
-                'semantic_elements': semantic_elements,
-                "week2": week2,
-                'ai_results': ai_results
-            }
+            clear_viewport(self.driver)
+            self._stage('axe')
+
+            merged = merge_captures(captures)
+            axe_results = merged['axe_results']
+            if self.compact_axe:
+                axe_results = self._compact(axe_results)
+
+            result = self._analyze_elements(axe_results, merged['raw_elements'], captures[0]['titles'])
+            result['site_wide'] = site_wide
+            result['load_stats'] = load_stats
+            result['degraded'] = self.degraded or None
+            result['states'] = [{
+                'name': c['state'],
+                'violations': len(c['axe_results'].get('violations', [])),
+                'links': len(c['raw_elements']['links']),
+                'images': len(c['raw_elements']['images']),
+                'text_blocks': len(c['raw_elements']['text_blocks'])
+            } for c in captures]
+            return result
 
         except Exception as e:
             print(f" Error during extraction: {e}")
             raise
         finally:
+            self.close()
+
+    # Rule based (and optionally AI) analysis of already fetched HTML, without browser or axe
+    # Returns:  dict: Same shape as extract_data with empty axe results
+    def analyze_html(self, html):
+        from bs4 import BeautifulSoup
+
+        self.degraded = {}
+        if self.limits.over_dom_size(len(html)):
+            chunk = self.limits.chunk_size
+            raw_elements, titles = self._stream_elements((html[i:i + chunk] for i in range(0, len(html), chunk)),
+                                                         len(html))
+        else:
+            soup = BeautifulSoup(html, 'lxml')
+            raw_elements, titles = self._extract_elements(soup), self._titles(soup)
+        result = self._analyze_elements({'violations': []}, raw_elements, titles)
+        result['site_wide'] = None
+        result['load_stats'] = None
+        result['degraded'] = self.degraded or None
+        return result
+
+    def _stage(self, stage):
+        if self.on_stage:
+            self.on_stage(stage)
+
+    # Quits the browser unless it was passed in by the caller
+    def close(self):
+        if self._owns_driver:
             self.driver.quit()
 
+    # Navigates to the URL and waits for it to load
+    # Returns:  dict: Network stats of the load profile, or None
+    def load_page(self):
+        print(f" Loading {self.url}...")
+        self.degraded = {}
+        if self.load_profile:
+            self.load_profile.start_page(self.driver)
+        self.driver.get(self.url)
+
+        # Wait for page to load
+        time.sleep(2)
+
+        load_stats = self.load_profile.page_stats(self.driver) if self.load_profile else None
+        if load_stats:
+            print(f"   - {load_stats['requests_loaded']} requests loaded ({load_stats['bytes_loaded']} bytes), "
+                  f"{load_stats['requests_blocked']} blocked, {load_stats['requests_from_cache']} from cache")
+        return load_stats
+
+    # Loads the URL again to undo interaction states, dropping the page origin's cookies and
+    # storage so consent banners and remembered menus come back; other sites in a shared
+    # or pooled browser keep theirs
+    def _reload(self):
+        current = urlparse(self.driver.current_url)
+        self.driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+            "origin": f"{current.scheme}://{current.netloc}", "storageTypes": "cookies,local_storage"})
+        self.driver.execute_script("window.sessionStorage.clear();")
+        self.driver.get(self.url)
+        time.sleep(2)
+
+    # Runs Axe-core on the page as currently rendered and parses its HTML
+    # Pages above limits.max_dom_size are streamed instead: 'soup' is None and
+    # 'elements' already holds the extracted elements
+    # Returns:  dict: Contains 'axe_results', 'soup', 'elements', 'titles' and 'site_wide'
+    def capture(self, compact=True):
+        from axe_selenium_python import Axe
+        from bs4 import BeautifulSoup
+
+        # Get HTML for context extraction
+        html, size = read_page_source(self.driver, self.limits)
+        if html is None:
+            print(f" Page is {size} characters, extracting in streaming mode...")
+            soup = None
+            elements, titles = self._stream_elements(read_chunks(self.driver, size, self.limits.chunk_size), size)
+        else:
+            soup = BeautifulSoup(html, 'lxml')
+            del html
+            elements, titles = None, self._titles(soup)
+
+        # Run Axe-core for technical analysis
+        print(" Running Axe-core analysis...")
+        axe = Axe(self.driver)
+        axe.inject()
+
+        # Regions seen on enough pages are site-wide: analysed once, then skipped
+        regions = self._site_wide_regions(soup) if self.template_detector and soup else []
+        if self.template_detector and soup is None:
+            self.degraded['templates_skipped'] = True
+        if regions:
+            axe_results = self._run_axe(axe, context={'exclude': [[r['selector']] for r in regions]})
+            site_wide = self._analyze_template_regions(axe, regions)
+        else:
+            axe_results = self._run_axe(axe)
+            site_wide = None
+
+        if compact and self.compact_axe:
+            axe_results = self._compact(axe_results)
+
+        return {'axe_results': axe_results, 'soup': soup, 'elements': elements, 'titles': titles,
+                'site_wide': site_wide}
+
+    # Runs axe within limits.axe_timeout; a timeout is reported as degraded, not raised
+    # The driver's script timeout is restored afterwards, pooled drivers and tabs are reused
+    def _run_axe(self, axe, context=None):
+        from selenium.common.exceptions import TimeoutException
+
+        previous = self.driver.timeouts.script if self.limits.axe_timeout else None
+        if self.limits.axe_timeout:
+            self.driver.set_script_timeout(self.limits.axe_timeout)
+        try:
+            return axe.run(context=context)
+        except TimeoutException:
+            print(f" Axe-core did not finish within {self.limits.axe_timeout}s, continuing without it")
+            self.degraded['axe_timeout'] = self.limits.axe_timeout
+            return {'violations': [], 'passes': [], 'incomplete': [], 'inapplicable': []}
+        finally:
+            if previous is not None:
+                self.driver.set_script_timeout(previous)
+
+    # Extracts elements from HTML chunks without building a tree
+    # Returns:  tuple: (elements, (page_title, main_heading))
+    def _stream_elements(self, chunks, size):
+        elements, info = stream_extract(chunks, self.limits)
+        self.degraded['streamed'] = {'dom_size': size, 'max_dom_size': self.limits.max_dom_size}
+        for category, found in info['found'].items():
+            if found > len(elements[category]):
+                self.degraded.setdefault('sampled', {})[category] = {'found': found, 'kept': len(elements[category])}
+        if info['truncated']:
+            self.degraded['truncated_text_blocks'] = info['truncated']
+        return elements, (info['page_title'], info['main_heading'])
+
+    def _titles(self, soup):
+        return (soup.find('title').get_text() if soup.find('title') else '',
+                soup.find('h1').get_text() if soup.find('h1') else '')
+
+    # Keeps at most limits.max_elements items, spread over the page
+    def _sample(self, category, items):
+        kept = spread_sample(items, self.limits.max_elements)
+        if len(kept) < len(items):
+            self.degraded.setdefault('sampled', {})[category] = {'found': len(items), 'kept': len(kept)}
+        return kept
+
+    def _compact(self, axe_results):
+        options = self.compact_axe if isinstance(self.compact_axe, dict) else {}
+        return compact_axe_results(axe_results, **options)
+
+    # Extract elements with context for AI analysis
+    def _extract_elements(self, soup):
+        return {
+            'links': self._extract_links(soup),
+            'images': self._extract_images(soup),
+            'text_blocks': self._extract_text_blocks(soup)
+        }
+
+    # Runs the rule based checks and, when enabled, the AI analysis
+    # titles: (page_title, main_heading)
+    def _analyze_elements(self, axe_results, raw_elements, titles):
+        semantic_elements = enrich_elements(raw_elements)
+
+        elements_for_ai = {
+            **semantic_elements,
+            'page_title': titles[0],
+            'main_heading': titles[1]
+        }
+
+        print(" Extraction complete!")
+        print(f"   - Found {len(elements_for_ai['links'])} links")
+        print(f"   - Found {len(elements_for_ai['images'])} images")
+        print(f"   - Found {len(elements_for_ai['text_blocks'])} text blocks")
+        print(f"   - Axe found {len(axe_results.get('violations', []))} violations")
+
+        week2 = {
+            "readability": [],
+            "images": [],
+            "links": []
+        }
+
+        ai_results = None
+
+        if self.use_ai and self.ai_analyzer and not self.defer_ai:
+            print(" Running AI semantic analysis...")
+            ai_results = self.ai_analyzer.analyze(raw_elements, base_url=self.url)
+
+        # Analyze text readability
+        for block in semantic_elements["text_blocks"]:
+            readability = analyze_readability(block["text"])
+            week2["readability"].append(readability)
+
+        # Analyze images
+        for image in semantic_elements["images"]:
+            result = analyze_alt_text(image)
+            if result["issue"]:
+                week2["images"].append(result)
+
+        # Analyze links
+        for link in semantic_elements["links"]:
+            result = analyze_links(link)
+            if result["issue"]:
+                week2["links"].append(result)
+
+        return {
+            'url': self.url,
+            'axe_results': axe_results,
+            'raw_elements': raw_elements,
+            'semantic_elements': semantic_elements,
+            "week2": week2,
+            'ai_results': ai_results
+        }
+
+    # Records the template candidates of this page and returns those that are site-wide
+    def _site_wide_regions(self, soup):
+        regions = self.template_detector.find_regions(soup)
+        for region in regions:
+            self.template_detector.mark_seen(region['fingerprint'], self.url)
+        return [r for r in regions if self.template_detector.is_site_wide(r['fingerprint'])]
+
+    # Analyses new site-wide regions once and removes all of them from the soup
+    # Returns: dict: References to the site-wide templates found on this page
+    def _analyze_template_regions(self, axe, regions):
+        refs = []
+        for region in regions:
+            fingerprint = region['fingerprint']
+            is_new = not self.template_detector.is_known(fingerprint)
+
+            if is_new:
+                print(f" Analyzing template region <{region['region']}>...")
+                region_axe = self._run_axe(axe, context={'include': [[region['selector']]]})
+                elements = enrich_elements({
+                    'links': self._extract_links(region['element']),
+                    'images': self._extract_images(region['element']),
+                    'text_blocks': []
+                })
+                findings = {
+                    'axe_violations': violation_summaries(region_axe),
+                    'links': [r for r in map(analyze_links, elements['links']) if r['issue']],
+                    'images': [r for r in map(analyze_alt_text, elements['images']) if r['issue']],
+                    'element_counts': {'links': len(elements['links']), 'images': len(elements['images'])},
+                    # Kept so crawlers can still follow navigation links in skipped regions
+                    'hrefs': [link['href'] for link in elements['links']],
+                    'ai_results': None
+                }
+                if self.use_ai and self.ai_analyzer:
+                    findings['ai_results'] = self.ai_analyzer.analyze(elements, base_url=self.url)
+                self.template_detector.register(region, self.url, findings)
+
+            refs.append({'fingerprint': fingerprint, 'region': region['region'], 'new': is_new})
+
+            # Page level extraction must not see the region again
+            region['element'].decompose()
+
+        return {'templates': refs}
+
         # Extract all links with context
 
     def _extract_links(self, soup):
-        links = []
+        candidates = []
         for link in soup.find_all('a', href=True):
             link_text = link.get_text(strip=True)
 
             # Skip empty links or navigation symbols
             if not link_text or link_text in ['', '«', '»', '<', '>']:
                 continue
+            candidates.append((link, link_text))
 
+        links = []
+        # Context is only built for the links that are kept
+        for link, link_text in self._sample('links', candidates):
             context = self._get_context(link)
             links.append({
                 'text': link_text,
@@ -148,7 +445,7 @@ class AccessibilityScraper:
 
     def _extract_images(self, soup):
         images = []
-        for img in soup.find_all('img'):
+        for img in self._sample('images', soup.find_all('img')):
             context = self._get_context(img)
 
             # Get image description from various sources
@@ -175,17 +472,26 @@ class AccessibilityScraper:
         main_content = soup.find('main') or soup.find('article') or soup.find('body')
 
         if main_content:
+            paragraphs = []
             for paragraph in main_content.find_all('p'):
                 text = paragraph.get_text(strip=True)
 
                 # Only include substantial paragraphs
                 if len(text.split()) > 15:
-                    heading_context = self._get_heading_context(paragraph)
-                    text_blocks.append({
-                        'text': text,
-                        'heading_context': heading_context,
-                        'word_count': len(text.split())
-                    })
+                    paragraphs.append((paragraph, text))
+
+            truncated = 0
+            for paragraph, text in self._sample('text_blocks', paragraphs):
+                heading_context = self._get_heading_context(paragraph)
+                block_text, was_truncated = self.limits.truncate(text)
+                truncated += was_truncated
+                text_blocks.append({
+                    'text': block_text,
+                    'heading_context': heading_context,
+                    'word_count': len(text.split())
+                })
+            if truncated:
+                self.degraded['truncated_text_blocks'] = truncated
         return text_blocks
 
     # Get surrounding context for an element
@@ -204,9 +510,8 @@ class AccessibilityScraper:
         p_parent = element.find_parent('p')
         if p_parent:
             para_text = p_parent.get_text(strip=True)
-            # Limit to 200 chars to avoid token overflow
-            if len(para_text) > 200:
-                para_text = para_text[:200] + "..."
+            # Limit length to avoid token overflow
+            para_text, _ = self.limits.truncate(para_text, self.limits.max_context_chars)
             context.append(f"Paragraph: {para_text}")
 
         # Get surrounding text
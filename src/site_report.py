@@ -0,0 +1,440 @@
+import html
+import json
+import os
+from datetime import datetime
+
+from src.axe_compactor import violation_summaries
+from src.results_store import SEVERITY_ORDER, flatten_findings, normalize_severity
+
+# Pages per detail shard, a shard is loaded when one of its pages is opened
+SHARD_SIZE = 100
+
+# Rows rendered at once in the page and rule tables
+PAGE_SIZE = 100
+
+
+class SiteReportBuilder:
+    """
+    Builds one navigable HTML report for a whole crawl.
+
+    Pages are added one at a time while the crawl runs. Only the indexes
+    (site summary, per-rule and per-page counts) stay in memory; the page
+    details are written to small JS shards that the report loads with a
+    script tag when a page is opened, so it also works from file://.
+    The pages each rule was found on are kept out of index.js the same way,
+    one file per rule, loaded when the rule is opened.
+
+    Layout of out_dir:
+        index.html            report shell and viewer
+        data/index.js         precomputed summary, rule and page indexes
+        data/shard_00000.js   details of pages 0 .. shard_size - 1
+        data/rule_00000.js    ids of the pages the first rule in the index was found on
+
+    Args:
+        out_dir (str): Directory for the report
+        shard_size (int): Pages per detail shard
+    """
+
+    def __init__(self, out_dir, shard_size=SHARD_SIZE):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.pages = []
+        self.rules = {}
+        # Keyed by URL: a page retried by the crawl is reported once, and not at all once it succeeds
+        self.errors = {}
+        self._shard = []
+        os.makedirs(os.path.join(out_dir, 'data'), exist_ok=True)
+
+    def add(self, results: dict) -> int:
+        """Indexes one extract_data result and queues its details; returns the page id"""
+        if 'error' in results:
+            self.errors[results.get('url')] = {'url': results.get('url'), 'error': results['error']}
+            return None
+        self.errors.pop(results.get('url'), None)
+
+        page_id = len(self.pages)
+        counts = dict.fromkeys(SEVERITY_ORDER, 0)
+        for source, rule, criterion, severity, target, message in flatten_findings(results):
+            counts[severity if severity in counts else 'moderate'] += 1
+
+            key = f"{source}:{rule}"
+            entry = self.rules.setdefault(key, {
+                'key': key, 'source': source, 'rule': rule, 'criterion': criterion,
+                'severity': severity, 'findings': 0, 'pages': []
+            })
+            entry['findings'] += 1
+            if not entry['pages'] or entry['pages'][-1] != page_id:
+                entry['pages'].append(page_id)
+            if _rank(severity) < _rank(entry['severity']):
+                entry['severity'] = severity
+
+        # Index row: id, url, total, one count per severity, shard
+        self.pages.append([page_id, results.get('url', ''), sum(counts.values()),
+                           *(counts[s] for s in SEVERITY_ORDER), page_id // self.shard_size])
+
+        self._shard.append(page_details(page_id, results))
+        if len(self._shard) >= self.shard_size:
+            self._flush_shard()
+        return page_id
+
+    def finish(self, title: str = None, templates: dict = None) -> str:
+        """Writes the indexes and the report shell; returns the path of index.html"""
+        self._flush_shard()
+
+        totals = dict.fromkeys(SEVERITY_ORDER, 0)
+        for row in self.pages:
+            for i, severity in enumerate(SEVERITY_ORDER):
+                totals[severity] += row[3 + i]
+        sources = {}
+        for entry in self.rules.values():
+            sources[entry['source']] = sources.get(entry['source'], 0) + entry['findings']
+
+        # Sorted once here, the viewer only slices
+        rules = []
+        for number, entry in enumerate(sorted(self.rules.values(),
+                                              key=lambda r: (-len(r['pages']), -r['findings'], r['key']))):
+            self._write_js(f"rule_{number:05d}.js", f"siteReport.loadRulePages({number}, {_to_json(entry['pages'])});\n")
+            rules.append(dict(entry, pages=len(entry['pages']), file=number))
+
+        index = {
+            'title': title or (self.pages[0][1] if self.pages else 'Site'),
+            'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'severities': SEVERITY_ORDER,
+            'summary': {
+                'pages': len(self.pages),
+                'errors': len(self.errors),
+                'findings': sum(totals.values()),
+                'severity': totals,
+                'source': sources,
+                'clean_pages': sum(1 for row in self.pages if row[2] == 0)
+            },
+            'rules': rules,
+            'pages': sorted(self.pages, key=lambda row: (-row[2], row[0])),
+            'errors': list(self.errors.values()),
+            'templates': template_summaries(templates or {}),
+            'page_size': PAGE_SIZE
+        }
+        self._write_js('index.js', f"siteReport.setIndex({_to_json(index)});\n")
+
+        path = os.path.join(self.out_dir, 'index.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(REPORT_TEMPLATE.replace('{{title}}', html.escape(index['title'])))
+        return path
+
+    def _flush_shard(self):
+        if not self._shard:
+            return
+        shard = self._shard[0]['id'] // self.shard_size
+        self._write_js(f"shard_{shard:05d}.js", f"siteReport.loadShard({shard}, {_to_json(self._shard)});\n")
+        self._shard = []
+
+    def _write_js(self, name, content):
+        with open(os.path.join(self.out_dir, 'data', name), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def page_details(page_id: int, results: dict) -> dict:
+    """Everything the viewer shows for one page, without raw HTML or DOM data"""
+    week2 = results.get('week2') or {}
+    advice = (results.get('ai_results') or {}).get('ai_advice', {})
+    ai_issues = []
+    for category, items in advice.items():
+        for item in items:
+            analysis = item.get('ai_analysis') or {}
+            if analysis.get('is_accessible') is False or analysis.get('issue'):
+                element = item.get('link') or item.get('image') or item.get('text_block') or {}
+                ai_issues.append({
+                    'category': category,
+                    'element': element.get('text') or element.get('alt') or element.get('src') or '',
+                    'severity': normalize_severity(analysis.get('severity')) or 'moderate',
+                    'issue': analysis.get('issue', ''),
+                    'recommendation': analysis.get('recommendation', '')
+                })
+
+    return {
+        'id': page_id,
+        'url': results.get('url', ''),
+        'axe': [{k: v.get(k) for k in ('id', 'impact', 'description', 'helpUrl', 'node_count')}
+                for v in violation_summaries(results.get('axe_results') or {})],
+        'rules': [dict(issue, category=category, severity=normalize_severity(issue.get('severity')))
+                  for category in ('links', 'images') for issue in week2.get(category, [])],
+        'ai': ai_issues,
+        'templates': [ref['fingerprint'] for ref in (results.get('site_wide') or {}).get('templates', [])]
+    }
+
+
+def template_summaries(templates: dict) -> list:
+    return [{
+        'fingerprint': fingerprint,
+        'region': template.get('region'),
+        'pages': len(template.get('pages', [])),
+        'first_url': template.get('first_url'),
+        'violations': [v['id'] for v in template.get('findings', {}).get('axe_violations', [])]
+    } for fingerprint, template in templates.items()]
+
+
+def build_site_report(results_iter, out_dir: str, title: str = None, templates: dict = None,
+                      shard_size: int = SHARD_SIZE) -> str:
+    builder = SiteReportBuilder(out_dir, shard_size=shard_size)
+    for results in results_iter:
+        builder.add(results)
+    return builder.finish(title=title, templates=templates)
+
+
+def _rank(severity):
+    return SEVERITY_ORDER.index(severity) if severity in SEVERITY_ORDER else len(SEVERITY_ORDER)
+
+
+def _to_json(data):
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+
+REPORT_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Site Accessibility Report - {{title}}</title>
+    <style>
+        body { font-family: system-ui, sans-serif; line-height: 1.6; max-width: 1200px; margin: 0 auto; padding: 20px; background: #f5f5f5; }
+        .container { background: white; padding: 40px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        h1 { color: #667eea; border-bottom: 3px solid #667eea; padding-bottom: 10px; }
+        h2 { color: #555; margin-top: 30px; }
+        nav button { margin-right: 8px; padding: 6px 14px; border: 1px solid #667eea; background: white; color: #667eea; border-radius: 4px; cursor: pointer; }
+        nav button[aria-pressed="true"] { background: #667eea; color: white; }
+        .summary { display: grid; grid-template-columns: repeat(auto-fit, minmax(160px, 1fr)); gap: 15px; margin: 20px 0; }
+        .card { background: #f8f9fa; padding: 20px; border-radius: 6px; border-left: 4px solid #667eea; }
+        .card h3 { margin: 0 0 10px 0; font-size: 0.9em; color: #666; }
+        .card .value { font-size: 2em; font-weight: bold; color: #333; }
+        table { width: 100%; border-collapse: collapse; margin: 10px 0; }
+        th, td { text-align: left; padding: 6px 8px; border-bottom: 1px solid #eee; }
+        td.num { text-align: right; }
+        .issue { background: white; border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 4px; }
+        .badge { display: inline-block; padding: 4px 10px; border-radius: 12px; font-size: 0.85em; font-weight: bold; }
+        .critical { background: #dc3545; color: white; }
+        .serious { background: #fd7e14; color: white; }
+        .moderate { background: #ffc107; color: #333; }
+        .minor { background: #28a745; color: white; }
+        .recommendation { background: #d4edda; padding: 10px; margin-top: 10px; border-left: 4px solid #28a745; border-radius: 4px; }
+        .wcag-link { display: inline-block; background: #e7f3ff; color: #0066cc; padding: 4px 10px; border-radius: 4px; text-decoration: none; margin: 5px 5px 0 0; }
+        .link { background: none; border: none; color: #0066cc; cursor: pointer; padding: 0; text-align: left; font: inherit; text-decoration: underline; }
+        code { background: #f4f4f4; padding: 2px 6px; border-radius: 3px; font-size: 0.9em; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1> Site Accessibility Report</h1>
+        <p><strong>Site:</strong> {{title}}</p>
+        <p id="generated"></p>
+        <nav>
+            <button data-view="summary">Summary</button>
+            <button data-view="rules">Rules</button>
+            <button data-view="pages">Pages</button>
+        </nav>
+        <main id="view" aria-live="polite"><p>Loading...</p></main>
+    </div>
+    <script>
+    var siteReport = (function () {
+        var index = null, loaded = {}, waiting = {};
+        var view = document.getElementById('view');
+
+        function el(tag, attrs, children) {
+            var node = document.createElement(tag);
+            Object.keys(attrs || {}).forEach(function (key) {
+                if (key === 'onclick') node.onclick = attrs[key];
+                else node.setAttribute(key, attrs[key]);
+            });
+            (children || []).forEach(function (child) {
+                node.appendChild(typeof child === 'object' ? child : document.createTextNode(String(child)));
+            });
+            return node;
+        }
+
+        function badge(severity) {
+            return el('span', {'class': 'badge ' + (severity || 'moderate')}, [severity || 'moderate']);
+        }
+
+        function show(name, arg) {
+            document.querySelectorAll('nav button').forEach(function (b) {
+                b.setAttribute('aria-pressed', b.dataset.view === name);
+            });
+            view.textContent = '';
+            views[name](arg);
+            location.hash = arg === undefined ? name : name + '/' + encodeURIComponent(arg);
+        }
+
+        // Renders rows page by page, so 10k rows never hit the DOM at once
+        function pagedTable(headers, rows, renderRow) {
+            var table = el('table', {}, [el('thead', {}, [el('tr', {}, headers.map(function (h) { return el('th', {}, [h]); }))])]);
+            var body = el('tbody'), shown = 0;
+            var more = el('button', {}, ['Show more']);
+            function next() {
+                rows.slice(shown, shown + index.page_size).forEach(function (row) { body.appendChild(renderRow(row)); });
+                shown += index.page_size;
+                more.hidden = shown >= rows.length;
+                more.textContent = 'Show more (' + Math.max(rows.length - shown, 0) + ' left)';
+            }
+            more.onclick = next;
+            table.appendChild(body);
+            next();
+            return el('div', {}, [table, more]);
+        }
+
+        function pageLink(row) {
+            return el('button', {'class': 'link', onclick: function () { show('page', row[0]); }}, [row[1]]);
+        }
+
+        function pageRow(row) {
+            return el('tr', {}, [el('td', {}, [pageLink(row)]), el('td', {'class': 'num'}, [row[2]])].concat(
+                index.severities.map(function (s, i) { return el('td', {'class': 'num'}, [row[3 + i]]); })));
+        }
+
+        var pageHeaders = function () { return ['Page', 'Findings'].concat(index.severities); };
+
+        var views = {
+            summary: function () {
+                var s = index.summary;
+                var cards = [['Pages', s.pages], ['Findings', s.findings], ['Pages without findings', s.clean_pages],
+                             ['Pages with errors', s.errors]];
+                index.severities.forEach(function (sev) { cards.push([sev, s.severity[sev]]); });
+                Object.keys(s.source).forEach(function (src) { cards.push(['Source: ' + src, s.source[src]]); });
+                view.appendChild(el('h2', {}, ['Summary']));
+                view.appendChild(el('div', {'class': 'summary'}, cards.map(function (c) {
+                    return el('div', {'class': 'card'}, [el('h3', {}, [c[0]]), el('div', {'class': 'value'}, [c[1]])]);
+                })));
+                view.appendChild(el('h2', {}, ['Most affected pages']));
+                view.appendChild(pagedTable(pageHeaders(), index.pages.slice(0, 10), pageRow));
+                if (index.templates.length) {
+                    view.appendChild(el('h2', {}, ['Site-wide Findings']));
+                    index.templates.forEach(function (t) {
+                        view.appendChild(el('div', {'class': 'issue'}, [
+                            el('strong', {}, ['<' + t.region + '> ']), el('code', {}, [t.fingerprint]),
+                            el('p', {}, ['Seen on ' + t.pages + ' page(s), first on ' + t.first_url]),
+                            el('p', {}, ['Axe: ' + (t.violations.join(', ') || 'no violations')])
+                        ]));
+                    });
+                }
+                if (index.errors.length) {
+                    view.appendChild(el('h2', {}, ['Pages with errors']));
+                    view.appendChild(el('ul', {}, index.errors.map(function (e) { return el('li', {}, [e.url + ': ' + e.error]); })));
+                }
+            },
+            rules: function () {
+                view.appendChild(el('h2', {}, ['Rules']));
+                view.appendChild(pagedTable(['Rule', 'Source', 'WCAG', 'Severity', 'Pages', 'Findings'], index.rules, function (r) {
+                    return el('tr', {}, [
+                        el('td', {}, [el('button', {'class': 'link', onclick: function () { show('rule', r.key); }}, [r.rule])]),
+                        el('td', {}, [r.source]), el('td', {}, [r.criterion || '']), el('td', {}, [badge(r.severity)]),
+                        el('td', {'class': 'num'}, [r.pages]), el('td', {'class': 'num'}, [r.findings])
+                    ]);
+                }));
+            },
+            rule: function (key) {
+                var rule = index.rules.filter(function (r) { return r.key === key; })[0];
+                if (!rule) return views.summary();
+                view.appendChild(el('h2', {}, [rule.rule + ' (' + rule.source + ')']));
+                view.appendChild(el('p', {}, [rule.findings + ' finding(s) on ' + rule.pages + ' page(s)']));
+                var body = el('div', {}, [el('p', {}, ['Loading pages...'])]);
+                view.appendChild(body);
+                withData(dataFile('rule', rule.file), function (ids) {
+                    var affected = {};
+                    ids.forEach(function (id) { affected[id] = true; });
+                    body.textContent = '';
+                    body.appendChild(pagedTable(pageHeaders(), index.pages.filter(function (row) { return affected[row[0]]; }), pageRow));
+                });
+            },
+            pages: function () {
+                view.appendChild(el('h2', {}, ['Pages']));
+                view.appendChild(pagedTable(pageHeaders(), index.pages, pageRow));
+            },
+            page: function (id) {
+                var row = index.pages.filter(function (r) { return r[0] === Number(id); })[0];
+                if (!row) return views.summary();
+                view.appendChild(el('h2', {}, [row[1]]));
+                var body = el('div', {}, [el('p', {}, ['Loading details...'])]);
+                view.appendChild(body);
+                withData(dataFile('shard', row[4]), function (pages) {
+                    body.textContent = '';
+                    renderPage(body, pages.filter(function (p) { return p.id === row[0]; })[0]);
+                });
+            }
+        };
+
+        function renderPage(body, page) {
+            body.appendChild(el('h3', {}, ['Technical Issues (Axe-core)']));
+            if (!page.axe.length) body.appendChild(el('p', {}, ['No violations found!']));
+            page.axe.forEach(function (v) {
+                body.appendChild(el('div', {'class': 'issue'}, [
+                    el('strong', {}, [v.id]), ' ', badge(v.impact), el('p', {}, [v.description || '']),
+                    el('p', {}, ['Affected: ' + v.node_count + ' element(s)']),
+                    el('a', {'class': 'wcag-link', href: v.helpUrl || '#', target: '_blank'}, ['Learn More'])
+                ]));
+            });
+            body.appendChild(el('h3', {}, ['Semantic Issues (Rule-Based)']));
+            if (!page.rules.length) body.appendChild(el('p', {}, ['No issues found!']));
+            page.rules.forEach(function (issue) {
+                body.appendChild(el('div', {'class': 'issue'}, [el('strong', {}, [issue.category + ': ' + issue.issue]), ' ', badge(issue.severity)]));
+            });
+            if (page.ai.length) {
+                body.appendChild(el('h3', {}, ['AI Contextual Analysis']));
+                page.ai.forEach(function (item) {
+                    body.appendChild(el('div', {'class': 'issue'}, [
+                        el('strong', {}, [item.category + ': "' + item.element + '"']), ' ', badge(item.severity),
+                        el('p', {}, ['Issue: ' + item.issue]),
+                        el('div', {'class': 'recommendation'}, ['AI Suggests: ' + item.recommendation])
+                    ]));
+                });
+            }
+            if (page.templates.length) {
+                body.appendChild(el('p', {}, ['Shares ' + page.templates.length + ' site-wide region(s), see Summary']));
+            }
+        }
+
+        function load(src) {
+            document.body.appendChild(el('script', {src: src}));
+        }
+
+        function dataFile(kind, number) {
+            return kind + '_' + String(number).padStart(5, '0');
+        }
+
+        // Loads data/<name>.js once; it calls back through loadShard or loadRulePages
+        function withData(name, callback) {
+            if (loaded[name]) return callback(loaded[name]);
+            if (!waiting[name]) {
+                waiting[name] = [];
+                load('data/' + name + '.js');
+            }
+            waiting[name].push(callback);
+        }
+
+        function received(name, data) {
+            loaded[name] = data;
+            (waiting[name] || []).forEach(function (callback) { callback(data); });
+            delete waiting[name];
+        }
+
+        document.querySelectorAll('nav button').forEach(function (b) {
+            b.onclick = function () { show(b.dataset.view); };
+        });
+        load('data/index.js');
+
+        return {
+            setIndex: function (data) {
+                index = data;
+                document.getElementById('generated').textContent = 'Generated: ' + data.generated;
+                var hash = location.hash.slice(1).split('/');
+                show(views[hash[0]] ? hash[0] : 'summary', hash[1] && decodeURIComponent(hash[1]));
+            },
+            loadShard: function (shard, pages) {
+                received(dataFile('shard', shard), pages);
+            },
+            loadRulePages: function (rule, ids) {
+                received(dataFile('rule', rule), ids);
+            }
+        };
+    })();
+    </script>
+</body>
+</html>
+"""
@@ -0,0 +1,385 @@
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import urlopen
+
+# selenium and websocket-client (a selenium dependency) are imported where they are used
+
+PAGE_LOAD_TIMEOUT = 30
+
+# Network events summarize_network_log reads, kept per tab when a load profile collects stats
+NETWORK_EVENTS = ("Network.requestWillBeSent", "Network.responseReceived", "Network.requestServedFromCache",
+                  "Network.loadingFinished", "Network.loadingFailed")
+
+# Wraps a script like WebDriver does: arguments[] holds the arguments, 'return' gives the result
+SYNC_TEMPLATE = "(function() { %s }).apply(null, %s)"
+ASYNC_TEMPLATE = "new Promise(function(resolve) { (function() { %s }).apply(null, %s.concat([resolve])); })"
+
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo in MB, None where it cannot be read"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def _exceptions():
+    from selenium.common.exceptions import JavascriptException, TimeoutException, WebDriverException
+    return JavascriptException, TimeoutException, WebDriverException
+
+
+class CDPConnection:
+    """
+    One DevTools protocol websocket, to the browser or to a single tab.
+    Commands wait for their own response; events received meanwhile are kept
+    when they are in keep_events, the ones wait_event may be asked for.
+    """
+
+    def __init__(self, ws_url, timeout=PAGE_LOAD_TIMEOUT, keep_events=()):
+        import websocket
+
+        # Chrome refuses websocket clients sending an Origin it was not started to allow
+        self.ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True)
+        self.keep_events = set(keep_events)
+        self.events = []
+        self._ids = itertools.count(1)
+
+    def send(self, method, params=None, timeout=PAGE_LOAD_TIMEOUT):
+        _, TimeoutException, WebDriverException = _exceptions()
+        message_id = next(self._ids)
+        self.ws.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+        message = self._receive(lambda m: m.get("id") == message_id, timeout, f"{method} did not answer")
+        if "error" in message:
+            raise WebDriverException(f"{method}: {message['error'].get('message')}")
+        return message.get("result", {})
+
+    def wait_event(self, method, timeout):
+        for event in self.events:
+            if event["method"] == method:
+                self.events.remove(event)
+                return event
+        return self._receive(lambda m: m.get("method") == method, timeout, f"No {method} event")
+
+    def _receive(self, wanted, timeout, error):
+        import websocket
+
+        _, TimeoutException, WebDriverException = _exceptions()
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutException(f"{error} within {timeout:g}s")
+            self.ws.settimeout(remaining)
+            try:
+                message = json.loads(self.ws.recv())
+            except websocket.WebSocketTimeoutException:
+                raise TimeoutException(f"{error} within {timeout:g}s")
+            except (websocket.WebSocketException, OSError) as e:
+                raise WebDriverException(f"DevTools connection lost: {e}")
+            if wanted(message):
+                return message
+            if message.get("method") == "Inspector.targetCrashed":
+                raise WebDriverException("Tab crashed")
+            if message.get("method") in self.keep_events:
+                self.events.append(message)
+
+    def close(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+class TabDriver:
+    """
+    One tab of a shared browser with the WebDriver methods the scraper uses
+    (get, execute_script, execute_async_script, page_source, execute_cdp_cmd,
+    timeouts and their setters). Every command also counts against the tab's audit deadline.
+
+    Args:
+        connection (CDPConnection): Connection to this tab's target
+        target_id (str): DevTools target id
+        context_id (str): Isolated browser context the tab lives in
+        deadline (float): time.monotonic() after which every command times out
+    """
+
+    def __init__(self, connection, target_id, context_id, deadline=None):
+        self.connection = connection
+        self.target_id = target_id
+        self.context_id = context_id
+        self.deadline = deadline
+        self.broken = False
+        self.page_load_timeout = PAGE_LOAD_TIMEOUT
+        self.script_timeout = PAGE_LOAD_TIMEOUT
+        self.connection.send("Page.enable")
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeout = seconds
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    @property
+    def timeouts(self):
+        from selenium.webdriver.common.timeouts import Timeouts
+        return Timeouts(page_load=self.page_load_timeout, script=self.script_timeout)
+
+    def get(self, url):
+        self.connection.events.clear()
+        result = self._send("Page.navigate", {"url": url}, self.page_load_timeout)
+        if result.get("errorText"):
+            _, _, WebDriverException = _exceptions()
+            raise WebDriverException(f"Navigation to {url} failed: {result['errorText']}")
+        self._call(lambda timeout: self.connection.wait_event("Page.loadEventFired", timeout), self.page_load_timeout)
+
+    def execute_script(self, script, *args):
+        return self._evaluate(SYNC_TEMPLATE % (script, json.dumps(list(args))), False)
+
+    def execute_async_script(self, script, *args):
+        return self._evaluate(ASYNC_TEMPLATE % (script, json.dumps(list(args))), True)
+
+    @property
+    def page_source(self):
+        return self.execute_script("return document.documentElement.outerHTML;")
+
+    @property
+    def current_url(self):
+        return self.execute_script("return location.href;")
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self._send(cmd, cmd_args, self.script_timeout)
+
+    def get_log(self, log_type):
+        # Network events received so far, in the shape of chromedriver's performance log
+        if log_type != "performance":
+            return []
+        entries = [{"message": json.dumps({"message": event})} for event in self.connection.events
+                   if event["method"] in NETWORK_EVENTS]
+        self.connection.events = [event for event in self.connection.events if event["method"] not in NETWORK_EVENTS]
+        return entries
+
+    def quit(self):
+        # Closing is up to the pool, the browser is shared
+        self.broken = True
+
+    def _evaluate(self, expression, await_promise):
+        JavascriptException, _, _ = _exceptions()
+        result = self._send("Runtime.evaluate", {"expression": expression, "returnByValue": True,
+                                                 "awaitPromise": await_promise}, self.script_timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise JavascriptException(details.get("exception", {}).get("description") or details.get("text"))
+        return result.get("result", {}).get("value")
+
+    def _send(self, method, params, timeout):
+        return self._call(lambda remaining: self.connection.send(method, params, remaining), timeout)
+
+    def _call(self, command, timeout):
+        # A command timing out or failing may leave the tab hung, so it is not handed out again
+        _, TimeoutException, _ = _exceptions()
+        if self.deadline is not None:
+            timeout = min(timeout, self.deadline - time.monotonic())
+            if timeout <= 0:
+                self.broken = True
+                raise TimeoutException("Tab exceeded its audit timeout")
+        try:
+            return command(timeout)
+        except Exception:
+            self.broken = True
+            raise
+
+
+class TabPool:
+    """
+    Runs concurrent audits as tabs of one Chrome instead of one Chrome each.
+
+    Every tab gets its own browser context (cookies, storage and cache are
+    not shared) and a deadline of tab_timeout seconds. A tab that crashed,
+    hung or timed out is closed on its own; the browser is only restarted
+    when it died itself. New tabs wait while max_tabs are open, or while
+    available memory is below min_free_mb (one tab can always run).
+
+    A load profile is applied to every tab: its requests are blocked and,
+    with collect_stats, its network events are kept for page_stats.
+
+    Same interface as DriverPool: use `with pool.driver() as driver`.
+
+    Args:
+        max_tabs (int): Tabs open at the same time
+        driver_factory (callable): Starts the browser, defaults to create_driver
+        tab_timeout (float): Seconds a tab may be used for one audit, None for no limit
+        min_free_mb (int): Available memory needed to open another tab, None to disable
+        memory_probe (callable): Returns available memory in MB, defaults to available_memory_mb
+        tab_factory (callable): tab_factory(pool) -> TabDriver, defaults to a new CDP target
+        load_profile (LoadProfile): Request blocking and network stats for every tab
+    """
+
+    def __init__(self, max_tabs=8, driver_factory=None, tab_timeout=300, min_free_mb=500,
+                 memory_probe=None, tab_factory=None, load_profile=None):
+        self.max_tabs = max_tabs
+        self.driver_factory = driver_factory
+        self.tab_timeout = tab_timeout
+        self.min_free_mb = min_free_mb
+        self.memory_probe = memory_probe or available_memory_mb
+        self.tab_factory = tab_factory or self._open_tab
+        self.load_profile = load_profile
+        self.browser = None
+        self.stats = {"tabs_opened": 0, "tabs_killed": 0, "browser_restarts": 0, "memory_waits": 0}
+        self._browser_connection = None
+        self._browser_lock = threading.Lock()
+        self._closed = False
+        self._open = 0
+        self._slots = threading.Condition()
+
+    @contextmanager
+    def driver(self):
+        self._acquire()
+        try:
+            tab = self.tab_factory(self)
+        except Exception:
+            self._release()
+            raise
+        if self.tab_timeout:
+            tab.deadline = time.monotonic() + self.tab_timeout
+        try:
+            yield tab
+        except Exception:
+            tab.broken = True
+            raise
+        finally:
+            self._close_tab(tab)
+            self._release()
+
+    def close(self):
+        # Audits still running lose their tab; no new browser is started afterwards
+        with self._browser_lock:
+            self._closed = True
+            self._quit_browser()
+
+    def _acquire(self):
+        with self._slots:
+            waited = False
+            while True:
+                if self._open < self.max_tabs and (self._open == 0 or self._memory_ok()):
+                    self._open += 1
+                    return
+                if self._open < self.max_tabs and not waited:
+                    waited = True
+                    self.stats["memory_waits"] += 1
+                    print(f" Low memory, waiting before opening tab {self._open + 1}")
+                # Memory is polled, tabs closing wake the waiters right away
+                self._slots.wait(0.5)
+
+    def _release(self):
+        with self._slots:
+            self._open -= 1
+            self._slots.notify()
+
+    def _memory_ok(self):
+        if self.min_free_mb is None:
+            return True
+        available = self.memory_probe()
+        return available is None or available >= self.min_free_mb
+
+    def _open_tab(self, pool):
+        with self._browser_lock:
+            try:
+                context_id, target_id = self._create_target()
+            except Exception as e:
+                if self._browser_alive():
+                    # The other tabs still run, so only the browser connection is renewed
+                    print(f" Could not open a tab ({e}), reconnecting to the browser")
+                    self._browser_connection.close()
+                    self._browser_connection = None
+                else:
+                    print(f" Browser not responding ({e}), restarting it")
+                    self._quit_browser()
+                    self.stats["browser_restarts"] += 1
+                context_id, target_id = self._create_target()
+            host = self._debugger_address()
+            self.stats["tabs_opened"] += 1
+        keep_events = ("Page.loadEventFired",)
+        if self.load_profile is not None and self.load_profile.collect_stats:
+            keep_events += NETWORK_EVENTS
+        connection = CDPConnection(f"ws://{host}/devtools/page/{target_id}", keep_events=keep_events)
+        tab = TabDriver(connection, target_id, context_id)
+        if self.load_profile is not None:
+            # Blocking is set per target, the browser level settings do not reach new tabs
+            try:
+                self.load_profile.apply(tab)
+            except Exception:
+                self._close_tab(tab)
+                raise
+        return tab
+
+    def _create_target(self):
+        browser = self._browser()
+        context_id = browser.send("Target.createBrowserContext", {"disposeOnDetach": False})["browserContextId"]
+        target_id = browser.send("Target.createTarget", {"url": "about:blank",
+                                                         "browserContextId": context_id})["targetId"]
+        return context_id, target_id
+
+    def _close_tab(self, tab):
+        connection = getattr(tab, "connection", None)
+        if connection is not None:
+            connection.close()
+        with self._browser_lock:
+            if getattr(tab, "broken", False):
+                self.stats["tabs_killed"] += 1
+            if self._browser_connection is None or not getattr(tab, "target_id", None):
+                return
+            # Closing from the browser connection works even when the tab's renderer hangs
+            try:
+                self._browser_connection.send("Target.closeTarget", {"targetId": tab.target_id}, 10)
+                self._browser_connection.send("Target.disposeBrowserContext", {"browserContextId": tab.context_id}, 10)
+            except Exception as e:
+                print(f" Could not close tab {tab.target_id}: {e}")
+
+    def _browser(self):
+        if self._closed:
+            raise RuntimeError("Tab pool is closed")
+        if self._browser_connection is None:
+            if self.browser is None:
+                from src.scraper import create_driver
+                if self.driver_factory:
+                    self.browser = self.driver_factory()
+                else:
+                    self.browser = create_driver(load_profile=self.load_profile)
+            with urlopen(f"http://{self._debugger_address()}/json/version", timeout=10) as response:
+                ws_url = json.loads(response.read())["webSocketDebuggerUrl"]
+            self._browser_connection = CDPConnection(ws_url)
+        return self._browser_connection
+
+    # Alive while chromedriver runs and Chrome answers on its debugging port
+    def _browser_alive(self):
+        if self.browser is None or self._browser_connection is None:
+            return False
+        process = getattr(getattr(self.browser, "service", None), "process", None)
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with urlopen(f"http://{self._debugger_address()}/json/version", timeout=5):
+                return True
+        except Exception:
+            return False
+
+    def _debugger_address(self):
+        return self.browser.capabilities["goog:chromeOptions"]["debuggerAddress"]
+
+    def _quit_browser(self):
+        if self._browser_connection is not None:
+            self._browser_connection.close()
+            self._browser_connection = None
+        if self.browser is not None:
+            try:
+                self.browser.quit()
+            except Exception:
+                pass
+            self.browser = None
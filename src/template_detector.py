@@ -0,0 +1,149 @@
+import hashlib
+import re
+
+from bs4 import Tag
+
+# Regions that usually repeat on every page of a site
+TEMPLATE_SELECTORS = [
+    "header", "nav", "footer", "aside",
+    "[role=banner]", "[role=navigation]", "[role=contentinfo]",
+    "[id*=cookie]", "[class*=cookie]"
+]
+
+# Ids that are safe to use as CSS selector without escaping
+SAFE_ID = re.compile(r"^[A-Za-z][\w-]*$")
+
+
+class TemplateDetector:
+    """
+    Detects site-wide template blocks (header, nav, footer, cookie banner)
+    by comparing structural fingerprints of DOM regions across pages.
+
+    Every page records the regions it contains. Until a region has been seen
+    on min_pages pages it stays part of the page and is audited with it. From
+    then on the region is analysed once, its findings are stored under the
+    fingerprint, and later pages skip it and only reference the findings.
+
+    Args:
+        min_pages (int): Pages a region must appear on before it is treated as site-wide
+    """
+
+    def __init__(self, min_pages=2):
+        self.min_pages = min_pages
+        self.templates = {}
+        # Pages each candidate region was seen on, site-wide or not yet
+        self.sightings = {}
+        # Changes since the last call of changes(), for incremental checkpoints
+        self._new_templates = []
+        self._new_sightings = []
+
+    def find_regions(self, soup) -> list:
+        """Returns the outermost template candidate regions on a page"""
+        # Tags compare by content, so track candidates by identity
+        candidates = {}
+        for selector in TEMPLATE_SELECTORS:
+            for element in soup.select(selector):
+                candidates.setdefault(id(element), element)
+
+        # Root elements and wrappers of the main content may carry classes like has-cookie-banner
+        candidates = {key: element for key, element in candidates.items() if not _wraps_content(element)}
+
+        regions = []
+        for element in candidates.values():
+            # Nested candidates are covered by their outer region
+            if any(id(parent) in candidates for parent in element.parents):
+                continue
+            regions.append({
+                "fingerprint": fingerprint(element),
+                "region": element.get("role") or element.name,
+                "selector": css_selector(element),
+                "element": element
+            })
+        return regions
+
+    def is_known(self, fingerprint: str) -> bool:
+        return fingerprint in self.templates
+
+    def is_site_wide(self, fingerprint: str) -> bool:
+        return len(self.sightings.get(fingerprint, [])) >= self.min_pages
+
+    def register(self, region: dict, url: str, findings: dict):
+        """Stores the findings of a region analysed for the first time"""
+        pages = self.sightings.setdefault(region["fingerprint"], [])
+        self.templates[region["fingerprint"]] = {
+            "fingerprint": region["fingerprint"],
+            "region": region["region"],
+            "first_url": pages[0] if pages else url,
+            "pages": pages,
+            "findings": findings
+        }
+        self._new_templates.append(self.templates[region["fingerprint"]])
+
+    def mark_seen(self, fingerprint: str, url: str):
+        pages = self.sightings.setdefault(fingerprint, [])
+        if url not in pages:
+            pages.append(url)
+            self._new_sightings.append((fingerprint, url))
+
+    def changes(self):
+        """Returns (templates, sightings) added since the last call"""
+        changes = self._new_templates, self._new_sightings
+        self._new_templates, self._new_sightings = [], []
+        return changes
+
+    def restore(self, templates: dict, sightings: dict):
+        """Restores state saved from templates and sightings, e.g. when a crawl resumes"""
+        self.sightings = sightings
+        self.templates = templates
+        for fingerprint, template in templates.items():
+            template["pages"] = sightings.setdefault(fingerprint, template.get("pages", []))
+
+    def site_wide(self) -> dict:
+        """Templates found on at least min_pages pages, keyed by fingerprint"""
+        return {fp: t for fp, t in self.templates.items() if len(t["pages"]) >= self.min_pages}
+
+
+def _wraps_content(element: Tag) -> bool:
+    if element.name in ("html", "body", "main") or element.get("role") == "main":
+        return True
+    return element.find(["main", "article"]) is not None or element.find(attrs={"role": "main"}) is not None
+
+
+# Structural hash of an element: tags, roles, classes, link targets and normalised text
+def fingerprint(element: Tag) -> str:
+    parts = []
+    for node in [element, *element.find_all(True)]:
+        classes = " ".join(sorted(node.get("class", [])))
+        part = f"{node.name}|{node.get('role', '')}|{classes}"
+        if node.name == "a":
+            part += f"|{node.get('href', '')}"
+        elif node.name == "img":
+            part += f"|{node.get('src', '')}|{node.get('alt', '')}"
+        parts.append(part)
+
+    # Digits are masked so counters and dates do not break the match
+    text = re.sub(r"\s+", " ", element.get_text(" ", strip=True))
+    parts.append(re.sub(r"\d", "0", text))
+
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+# Builds a CSS selector that axe can use to include or exclude the element
+def css_selector(element: Tag) -> str:
+    path = []
+    node = element
+    while node is not None and node.name not in (None, "[document]"):
+        element_id = node.get("id")
+        if element_id and SAFE_ID.match(element_id):
+            path.append(f"#{element_id}")
+            break
+
+        siblings = node.parent.find_all(node.name, recursive=False) if node.parent else [node]
+        if len(siblings) > 1:
+            position = next(i for i, s in enumerate(siblings) if s is node) + 1
+            path.append(f"{node.name}:nth-of-type({position})")
+        else:
+            path.append(node.name)
+        node = node.parent
+
+    return " > ".join(reversed(path))
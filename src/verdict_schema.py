@@ -0,0 +1,139 @@
+import math
+
+VERDICT_TOOL = "report_verdict"
+
+FIX_TOOL = "fix_verdict_fields"
+
+PARAGRAPHS_TOOL = "report_paragraph_verdicts"
+
+# Severities each criterion may use, None when the element is accessible
+CRITERIA = {
+    "2.4.4": {"name": "Link Purpose in Context", "severities": ["critical", "serious", "moderate", "minor"]},
+    "1.1.1": {"name": "Non-text Content", "severities": ["critical", "serious", "moderate", "minor"]},
+    "3.1.5": {"name": "Reading Level", "severities": ["moderate", "minor"]},
+}
+
+# Starting output token limits per criterion; a verdict tool call is about 100-200 tokens
+MAX_TOKENS = {"2.4.4": 300, "1.1.1": 300, "3.1.5": 300}
+
+# Limits never go above the old fixed limit or below what a short verdict needs
+MAX_TOKENS_CEILING = 500
+MAX_TOKENS_FLOOR = 120
+
+
+def verdict_schema(criterion: str) -> dict:
+    return {
+        "type": "object",
+        "properties": {
+            "is_accessible": {"type": "boolean"},
+            "wcag_criterion": {"type": "string", "enum": [criterion]},
+            "severity": {"type": ["string", "null"], "enum": CRITERIA[criterion]["severities"] + [None]},
+            "issue": {"type": ["string", "null"], "maxLength": 200,
+                      "description": "Brief description if problematic, otherwise null"},
+            "recommendation": {"type": ["string", "null"], "maxLength": 300,
+                               "description": "Specific improvement, otherwise null"},
+            "reasoning": {"type": "string", "maxLength": 300, "description": "One sentence"}
+        },
+        "required": ["is_accessible", "wcag_criterion", "severity", "issue", "recommendation", "reasoning"]
+    }
+
+
+def verdict_tool(criterion: str, fields: list = None) -> dict:
+    """Tool the model must call with its verdict; with fields, a tool asking only for those"""
+    schema = verdict_schema(criterion)
+    if fields is None:
+        return {
+            "name": VERDICT_TOOL,
+            "description": f"Report the WCAG {criterion} ({CRITERIA[criterion]['name']}) verdict",
+            "input_schema": schema
+        }
+    return {
+        "name": FIX_TOOL,
+        "description": f"Report corrected values for: {', '.join(fields)}",
+        "input_schema": {
+            "type": "object",
+            "properties": {field: schema["properties"][field] for field in fields},
+            "required": list(fields)
+        }
+    }
+
+
+def paragraph_verdicts_tool(criterion: str, count: int, paragraphs: list = None) -> dict:
+    """
+    Tool for one verdict per numbered paragraph (1 to count) of a text chunk;
+    with paragraphs, a tool asking again for the verdicts of only those
+    """
+    numbers = list(paragraphs or range(1, count + 1))
+    item = verdict_schema(criterion)
+    item["properties"] = {"paragraph": {"type": "integer", "enum": numbers}, **item["properties"]}
+    item["required"] = ["paragraph"] + item["required"]
+    if paragraphs is None:
+        name = PARAGRAPHS_TOOL
+        description = f"Report the WCAG {criterion} ({CRITERIA[criterion]['name']}) verdict of every paragraph"
+    else:
+        name = FIX_TOOL
+        description = f"Report corrected verdicts for paragraphs: {', '.join(map(str, numbers))}"
+    return {
+        "name": name,
+        "description": description,
+        "input_schema": {
+            "type": "object",
+            "properties": {"verdicts": {"type": "array", "items": item,
+                                        "minItems": len(numbers), "maxItems": len(numbers)}},
+            "required": ["verdicts"]
+        }
+    }
+
+
+_TYPES = {"boolean": bool, "string": str, "integer": int, "null": type(None)}
+
+
+def invalid_fields(verdict: dict, schema: dict) -> dict:
+    """Returns {field: reason} for every required field that is missing or does not match the schema"""
+    problems = {}
+    for field in schema["required"]:
+        rules = schema["properties"][field]
+        if field not in verdict:
+            problems[field] = "missing"
+            continue
+        value = verdict[field]
+        types = rules["type"] if isinstance(rules["type"], list) else [rules["type"]]
+        if not any(isinstance(value, _TYPES[t]) for t in types):
+            problems[field] = f"must be {' or '.join(types)}"
+        elif "enum" in rules and value not in rules["enum"]:
+            problems[field] = f"must be one of {rules['enum']}"
+        elif isinstance(value, str) and len(value) > rules.get("maxLength", math.inf):
+            problems[field] = f"must be at most {rules['maxLength']} characters"
+    return problems
+
+
+class TokenBudget:
+    """
+    Output token limit per criterion, tuned from the output tokens verdicts
+    actually use: after every min_samples calls the limit becomes the 99th
+    percentile times headroom. A truncated response raises the limit again.
+    """
+
+    def __init__(self, limits=None, min_samples=20, headroom=1.3, history=200):
+        self.limits = dict(limits or MAX_TOKENS)
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.history = history
+        self.samples = {criterion: [] for criterion in self.limits}
+        self.calls = dict.fromkeys(self.limits, 0)
+
+    def limit(self, criterion: str) -> int:
+        return self.limits[criterion]
+
+    def record(self, criterion: str, output_tokens: int, truncated: bool = False):
+        samples = self.samples[criterion]
+        samples.append(output_tokens)
+        del samples[:-self.history]
+        self.calls[criterion] += 1
+
+        if truncated:
+            self.limits[criterion] = min(self.limits[criterion] * 2, MAX_TOKENS_CEILING)
+        elif self.calls[criterion] % self.min_samples == 0:
+            ordered = sorted(samples)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            self.limits[criterion] = max(MAX_TOKENS_FLOOR, min(MAX_TOKENS_CEILING, math.ceil(p99 * self.headroom)))
@@ -0,0 +1,169 @@
+import os
+import socket
+import threading
+import time
+from urllib.parse import urljoin
+
+from src.crawler import discovered_links, is_crawlable, normalize_url
+
+
+class Coordinator:
+    """
+    Owns the URL frontier of a distributed crawl: seeds the queue, collects
+    finished jobs and queues the links they discovered.
+
+    Args:
+        queue (JobQueue): Queue shared with the workers
+        start_url (str): First page, also defines the host that is crawled
+        max_pages (int): Maximum number of pages queued in total
+        max_depth (int): Maximum link distance from the start page
+        options (dict): Passed to the workers with every job (e.g. use_ai, compact_axe)
+    """
+
+    def __init__(self, queue, start_url, max_pages=50, max_depth=3, options=None):
+        self.queue = queue
+        self.start_url = normalize_url(start_url)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.options = options or {}
+        self.queued = 0
+
+    def seed(self):
+        self.queued += self.queue.put([(self.start_url, self._payload(self.start_url, 0))])
+
+    def run(self, poll_interval=1.0):
+        """Yields every finished job until no work is pending or leased"""
+        self.seed()
+        while True:
+            # Stats are read first, so a job finishing in between is still collected below
+            stats = self.queue.stats()
+            finished = self.queue.collect()
+            for job in finished:
+                if job["state"] == "done" and job["payload"]["depth"] < self.max_depth:
+                    self._queue_links(job)
+                yield job
+
+            if not finished and stats["pending"] == 0 and stats["leased"] == 0:
+                return
+            if not finished:
+                time.sleep(poll_interval)
+
+    def _queue_links(self, job):
+        url = job["payload"]["url"]
+        depth = job["payload"]["depth"] + 1
+        links = []
+        for href in discovered_links(job["result"], {}):
+            link = normalize_url(urljoin(url, href))
+            if is_crawlable(link, self.start_url):
+                links.append((link, self._payload(link, depth)))
+
+        # Keys are unique, so links already queued by other pages do not use up room
+        room = self.max_pages - self.queued
+        while links and room > 0:
+            batch, links = links[:room], links[room:]
+            added = self.queue.put(batch)
+            self.queued += added
+            room -= added
+
+    def _payload(self, url, depth):
+        return {"url": url, "depth": depth, "options": self.options}
+
+
+class Worker:
+    """
+    Leases audit jobs from the queue and runs the scraper (and AI) pipeline on them.
+
+    A heartbeat thread extends the lease while a page is audited, so only
+    workers that die or hang lose their job to another worker.
+
+    Args:
+        queue (JobQueue): Queue shared with the coordinator
+        worker_id (str): Name stored with each lease, defaults to host:pid
+        headless (bool): Run browser in background
+        audit_fn (callable): audit_fn(payload) -> dict, replaces the scraper pipeline
+        heartbeat_interval (float): Seconds between lease extensions
+    """
+
+    def __init__(self, queue, worker_id=None, headless=True, audit_fn=None, heartbeat_interval=None):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.headless = headless
+        self.audit_fn = audit_fn or self._audit_page
+        self.heartbeat_interval = heartbeat_interval or max(getattr(queue, "visibility_timeout", 300) / 3, 0.05)
+        self.driver = None
+        self.ai_analyzer = None
+        self.processed = 0
+
+    def run(self, max_jobs=None, idle_timeout=None, poll_interval=1.0):
+        """Processes jobs until max_jobs are done or the queue stayed empty for idle_timeout seconds"""
+        idle_since = time.time()
+        try:
+            while max_jobs is None or self.processed < max_jobs:
+                job = self.queue.lease(self.worker_id)
+                if job is None:
+                    if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+
+                self._process(job)
+                self.processed += 1
+                idle_since = time.time()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def _process(self, job):
+        url = job["payload"]["url"]
+        print(f" [{self.worker_id}] {url} (attempt {job['attempts']})")
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, stop), daemon=True)
+        heartbeat.start()
+        try:
+            result = self.audit_fn(job["payload"])
+        except Exception as e:
+            print(f" [{self.worker_id}] failed: {e}")
+            stop.set()
+            heartbeat.join()
+            self.queue.fail(job["id"], job["lease_id"], str(e))
+            # The browser may have crashed, the next job starts a fresh one
+            self.close()
+            return
+
+        stop.set()
+        heartbeat.join()
+        if not self.queue.complete(job["id"], job["lease_id"], result):
+            print(f" [{self.worker_id}] lease lost for {url}, result dropped")
+
+    def _heartbeat(self, job, stop):
+        while not stop.wait(self.heartbeat_interval):
+            if not self.queue.extend(job["id"], job["lease_id"]):
+                return
+
+    def _audit_page(self, payload):
+        from src.scraper import AccessibilityScraper, create_driver
+
+        options = payload.get("options", {})
+        if self.driver is None:
+            self.driver = create_driver(self.headless)
+        if options.get("use_ai") and self.ai_analyzer is None:
+            from src.ai_analyzer import AIAnalyzer
+            self.ai_analyzer = AIAnalyzer()
+
+        # Template detection stays off: its findings would live in one worker's memory only
+        scraper = AccessibilityScraper(
+            payload["url"],
+            use_ai=bool(options.get("use_ai")),
+            ai_analyzer=self.ai_analyzer,
+            compact_axe=options.get("compact_axe", False),
+            driver=self.driver
+        )
+        return scraper.extract_data()
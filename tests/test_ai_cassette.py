@@ -0,0 +1,101 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai_analyzer import AIAnalyzer
+from src.ai_cassette import CassetteClient, CassetteMissError
+
+ELEMENTS = {
+    "links": [{"text": "read more", "href": "/a", "context": "Section: News"},
+              {"text": "Contact us", "href": "/contact", "context": "Footer"}],
+    "images": [{"src": "/logo.png", "alt": "", "context": "Header", "is_decorative": True}],
+    "text_blocks": [{"text": "Words " * 20, "heading_context": "Intro", "word_count": 20}],
+}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        prompt = kwargs["messages"][0]["content"]
+        verdict = {"is_accessible": "read more" not in prompt, "issue": None, "call": self.calls}
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=json.dumps(verdict))],
+                               stop_reason="end_turn", usage=SimpleNamespace(input_tokens=10, output_tokens=5))
+
+
+def test_record_then_replay_offline(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    live = FakeClient()
+    recorded = AIAnalyzer(use_vision=False, client=live, cassette=path, cassette_mode="record").analyze(ELEMENTS)
+    assert live.calls == 4
+
+    # No client at all: replay must not need the SDK, a key or the network
+    replay = AIAnalyzer(use_vision=False, cassette=path, cassette_mode="replay")
+    replayed = replay.analyze(ELEMENTS)
+
+    assert replayed["ai_advice"] == recorded["ai_advice"]
+    assert replay.client.stats == {"replayed": 4, "recorded": 0, "missed": 0}
+    assert replayed["ai_advice"]["links"][0]["ai_analysis"]["is_accessible"] is False
+
+
+def test_auto_mode_records_only_new_requests(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    live = FakeClient()
+    client = CassetteClient(path, mode="auto", client=live)
+    client.messages.create(model="m", max_tokens=10, messages=[{"role": "user", "content": "one"}])
+    client.messages.create(model="m", max_tokens=10, messages=[{"role": "user", "content": "one"}])
+    client.messages.create(model="m", max_tokens=10, messages=[{"role": "user", "content": "two"}])
+
+    assert live.calls == 2
+    assert client.stats == {"replayed": 1, "recorded": 2, "missed": 0}
+
+
+def test_strict_miss_and_lenient_match(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    CassetteClient(path, mode="record", client=FakeClient()).messages.create(
+        model="old-model", max_tokens=500, messages=[{"role": "user", "content": "Link Text: \"home\"\n  Context: nav"}])
+
+    strict = CassetteClient(path)
+    with pytest.raises(CassetteMissError) as error:
+        strict.messages.create(model="old-model", max_tokens=500,
+                               messages=[{"role": "user", "content": "Link Text: \"start\"\n  Context: nav"}])
+    assert "No recorded response" in str(error.value) and "Link Text: \"home\"" in str(error.value)
+
+    lenient = CassetteClient(path, match="lenient")
+    response = lenient.messages.create(model="new-model", max_tokens=800,
+                                       messages=[{"role": "user", "content": "Link Text: \"home\" Context:   nav"}])
+    assert json.loads(response.content[0].text)["call"] == 1
+
+
+def test_lenient_key_includes_tool_schemas():
+    from src.ai_cassette import request_key
+    from src.verdict_schema import verdict_tool
+
+    base = {"model": "m", "messages": [{"role": "user", "content": "Link Text: \"home\""}]}
+    link = dict(base, tools=[verdict_tool("2.4.4")], tool_choice={"type": "tool", "name": "report_verdict"})
+    image = dict(base, tools=[verdict_tool("1.1.1")], tool_choice={"type": "tool", "name": "report_verdict"})
+
+    assert request_key(link, "lenient") != request_key(image, "lenient")
+    assert request_key(link, "lenient") == request_key(dict(link, model="other", max_tokens=1), "lenient")
+    # Token limits change at runtime, so strict matching leaves them out too
+    assert request_key(dict(link, max_tokens=300)) == request_key(dict(link, max_tokens=129))
+    assert request_key(link) != request_key(dict(link, model="other"))
+
+
+def test_recording_loads_the_env_file(tmp_path, monkeypatch):
+    import anthropic
+
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    # Stands in for the repo's .env file
+    monkeypatch.setattr("dotenv.load_dotenv", lambda: monkeypatch.setenv("ANTHROPIC_API_KEY", "from-dotenv"))
+    created = []
+    monkeypatch.setattr(anthropic, "Anthropic", lambda api_key: created.append(api_key) or FakeClient())
+
+    client = CassetteClient(str(tmp_path / "cassette.jsonl"), mode="record")
+    client.messages.create(model="m", max_tokens=10, messages=[{"role": "user", "content": "one"}])
+
+    assert created == ["from-dotenv"]
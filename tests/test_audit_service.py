@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from src.audit_service import AuditService, DriverPool, serve
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+def _request(base, method, path, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(base + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.read().decode("utf-8")
+
+
+@pytest.fixture
+def service():
+    gate = threading.Event()
+    audited = []
+
+    def audit(url, driver, options, ai_analyzer):
+        gate.wait(5)
+        if url.endswith("/broken"):
+            raise RuntimeError("Chrome crashed")
+        audited.append(url)
+        return {"url": url, "axe_results": {"violations": []}}
+
+    service = AuditService(workers=1, driver_factory=FakeDriver, audit_fn=audit)
+    service.gate, service.audited = gate, audited
+    server = serve(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service.base = f"http://127.0.0.1:{server.server_port}"
+    yield service
+    gate.set()
+    server.shutdown()
+    service.shutdown()
+
+
+def test_submit_poll_and_stream(service):
+    job = json.loads(_request(service.base, "POST", "/jobs", {"urls": ["https://a.test/", "https://a.test/broken"]}))
+    service.gate.set()
+
+    lines = _request(service.base, "GET", f"/jobs/{job['id']}/results").splitlines()
+    status = json.loads(_request(service.base, "GET", f"/jobs/{job['id']}"))
+
+    assert [json.loads(line)["url"] for line in lines] == ["https://a.test/"]
+    assert status["status"] == "done"
+    assert status["errors"] == [{"url": "https://a.test/broken", "error": "Chrome crashed"}]
+
+
+def test_priority_and_cancellation(service):
+    blocker = service.submit(["https://slow.test/"])
+    # Wait until the single worker is busy so the queue order decides the rest
+    while blocker.status != "running":
+        time.sleep(0.01)
+    low = service.submit(["https://low.test/1", "https://low.test/2"], priority=0)
+    high = service.submit(["https://high.test/"], priority=5)
+    service.cancel(low.id)
+    service.gate.set()
+
+    list(service.stream(high.id, timeout=5))
+    list(service.stream(blocker.id, timeout=5))
+
+    assert service.audited == ["https://slow.test/", "https://high.test/"]
+    assert service.jobs[low.id].status == "cancelled"
+
+
+def test_invalid_job_is_rejected(service):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _request(service.base, "POST", "/jobs", {"urls": "https://a.test/"})
+    assert error.value.code == 400
+
+    for body in ({"urls": [], "priority": "high"}, {"urls": [], "options": ["use_ai"]}):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _request(service.base, "POST", "/jobs", body)
+        assert error.value.code == 400
+
+
+def test_driver_pool_keeps_only_live_drivers():
+    started, quit = [], []
+
+    class Driver:
+        def __init__(self):
+            if started and started[-1] == "fail":
+                started.append("failed")
+                raise RuntimeError("no Chrome")
+            started.append(self)
+
+        def quit(self):
+            quit.append(self)
+
+    pool = DriverPool(1, driver_factory=Driver)
+    first = started[0]
+    started.append("fail")
+    with pytest.raises(RuntimeError, match="page crashed"):
+        with pool.driver():
+            raise RuntimeError("page crashed")
+    # The crashed driver is quit and not handed out again, the empty slot starts a new one
+    assert quit == [first]
+    with pool.driver() as driver:
+        assert driver is started[-1] and driver is not first
+
+    with pool.driver() as driver:
+        pool.close()
+    assert quit[-1] is driver
+
+
+def test_finished_jobs_are_evicted():
+    service = AuditService(workers=1, driver_factory=FakeDriver, audit_fn=lambda *args: {}, job_ttl=60,
+                           max_finished_jobs=2)
+    try:
+        jobs = [service.submit([]) for _ in range(3)]
+        jobs[0].finished -= 120
+        running = service.submit(["https://a.test/"], options={})
+        with running.changed:
+            running.changed.wait_for(lambda: running.status == "done", 5)
+
+        # The expired job goes first, then the oldest finished jobs beyond the limit
+        service.submit([])
+        assert jobs[0].id not in service.jobs and jobs[1].id not in service.jobs
+        assert len([job for job in service.jobs.values() if job.finished]) == 3
+        assert service.evict_finished() == 1 and running.id in service.jobs
+    finally:
+        service.shutdown()
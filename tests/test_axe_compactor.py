@@ -0,0 +1,105 @@
+from src.axe_compactor import compact_axe_results, expand_axe_results, violation_summaries
+from src.reporter import AccessibilityReporter
+
+
+def _check(message, related=()):
+    return {"id": "color-contrast", "impact": "serious", "message": message, "data": None,
+            "relatedNodes": [{"html": html, "target": ["div"]} for html in related]}
+
+
+AXE_RESULTS = {
+    "url": "https://example.com",
+    "timestamp": "2026-01-01T00:00:00.000Z",
+    "testEngine": {"name": "axe-core", "version": "4.8.0"},
+    "violations": [{
+        "id": "color-contrast",
+        "impact": "serious",
+        "description": "Ensures contrast is sufficient",
+        "help": "Elements must have sufficient color contrast",
+        "helpUrl": "https://dequeuniversity.com/rules/axe/4.8/color-contrast",
+        "tags": ["wcag2aa", "wcag143"],
+        "nodes": [
+            {"html": "<p class='muted'>" + "x" * 500 + "</p>", "target": ["p.muted"], "impact": "serious",
+             "failureSummary": "Fix any of the following: low contrast",
+             "any": [_check("low contrast", ["<div class='bg'>" + "y" * 500 + "</div>"])], "all": [], "none": []},
+            {"html": "<span>short</span>", "target": ["span"], "impact": "serious",
+             "failureSummary": "Fix any of the following: low contrast", "any": [_check("low contrast")],
+             "all": [], "none": []},
+        ]
+    }],
+    "incomplete": [],
+    "passes": [{
+        "id": "html-has-lang", "impact": None, "description": "Ensures html has lang",
+        "help": "html must have lang", "helpUrl": "https://example.com/lang", "tags": ["wcag311"],
+        "nodes": [{"html": "<html>", "target": ["html"], "impact": None, "any": []}]
+    }, {
+        "id": "region", "impact": "moderate", "description": "Content is in landmarks",
+        "help": "Content must be in landmarks", "helpUrl": "https://example.com/region", "tags": ["best-practice"],
+        "nodes": [{"html": "<body>", "target": ["body"], "impact": "moderate", "any": [], "all": [], "none": []}]
+    }],
+    "inapplicable": []
+}
+
+
+def test_compact_stores_shared_data_once():
+    compact = compact_axe_results(AXE_RESULTS)
+
+    assert compact["rules"]["color-contrast"]["helpUrl"].endswith("color-contrast")
+    assert len(compact["checks"]) == 2
+    assert len(compact["summaries"]) == 1
+    assert compact["passes"] == {"html-has-lang": {"nodes": 1, "impact": None},
+                                 "region": {"nodes": 1, "impact": "moderate"}}
+
+    long_node = compact["violations"][0]["nodes"][0]
+    assert long_node["html_truncated"] is True
+    assert len(long_node["html"]) == 200
+    assert "nodes:html" in compact["lossy"]
+    assert "passes:nodes" in compact["lossy"]
+
+    # HTML of related nodes inside checks is limited too
+    related = compact["checks"][long_node["any"][0]]["relatedNodes"][0]
+    assert len(related["html"]) == 200 and related["target"] == ["div"]
+    assert "checks:html" in compact["lossy"]
+
+
+def test_round_trip_is_exact_without_loss():
+    compact = compact_axe_results(AXE_RESULTS, html_limit=None, passes="full")
+    expanded = expand_axe_results(compact)
+
+    assert "_lossy" not in expanded
+    assert expanded["violations"] == AXE_RESULTS["violations"]
+    assert expanded["passes"] == AXE_RESULTS["passes"]
+    assert expanded["testEngine"] == AXE_RESULTS["testEngine"]
+
+
+def test_round_trip_reports_loss():
+    compact = compact_axe_results(AXE_RESULTS, hash_html=True, passes="drop")
+    expanded = expand_axe_results(compact)
+
+    assert expanded["passes"] == []
+    assert expanded["violations"][0]["nodes"][1]["html"].startswith("<!-- sha1:")
+    assert expanded["violations"][0]["nodes"][0]["any"][0]["relatedNodes"][0]["html"].startswith("<!-- sha1:")
+    assert set(expanded["_lossy"]) == {"passes:dropped", "nodes:html", "checks:html"}
+
+
+def test_counts_keep_impact_and_absent_keys_stay_absent():
+    expanded = expand_axe_results(compact_axe_results(AXE_RESULTS))
+
+    assert [(e["id"], e["impact"], e["_node_count"]) for e in expanded["passes"]] == [
+        ("html-has-lang", None, 1), ("region", "moderate", 1)]
+    # Older compact results stored counts alone
+    assert expand_axe_results({"format": "axe-compact/1", "passes": {"region": 2}})["passes"][0]["_node_count"] == 2
+
+    expanded = expand_axe_results(compact_axe_results(AXE_RESULTS, passes="full"))
+    assert expanded["passes"][0]["nodes"][0] == AXE_RESULTS["passes"][0]["nodes"][0]
+    assert "all" not in expanded["passes"][0]["nodes"][0]
+
+
+def test_reporter_accepts_compact_results():
+    compact = compact_axe_results(AXE_RESULTS)
+
+    assert violation_summaries(compact) == violation_summaries(AXE_RESULTS)
+
+    html = AccessibilityReporter().generate_report({"url": "https://example.com", "axe_results": compact})
+    assert "Ensures contrast is sufficient" in html
+    assert "2 element(s)" in html
@@ -0,0 +1,113 @@
+import pytest
+
+import src.ai_analyzer
+import src.crawler
+from src.checkpoint import CrawlCheckpoint
+from src.crawler import Crawler
+
+SITE = {
+    "https://site.test/": ["/a", "/b", "https://other.test/x", "/file.pdf"],
+    "https://site.test/a": ["/b", "/c#top"],
+    "https://site.test/b": [],
+    "https://site.test/c": ["/"],
+}
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+class FakeScraper:
+    audited = []
+
+    def __init__(self, url, on_stage=None, **kwargs):
+        self.url = url
+        self.on_stage = on_stage
+
+    def extract_data(self):
+        self.on_stage("loaded")
+        self.on_stage("axe")
+        FakeScraper.audited.append(self.url)
+        return {"url": self.url, "axe_results": {"violations": []},
+                "raw_elements": {"links": [{"href": h} for h in SITE[self.url]], "images": [], "text_blocks": []}}
+
+
+class FakeAnalyzer:
+    calls = []
+
+    def analyze(self, elements, base_url=None):
+        FakeAnalyzer.calls.append(base_url)
+        return {"ai_advice": {"links": [], "images": [], "text_blocks": []}}
+
+
+def _setup(monkeypatch):
+    FakeScraper.audited, FakeAnalyzer.calls = [], []
+    monkeypatch.setattr(src.crawler, "create_driver", lambda *args: FakeDriver())
+    monkeypatch.setattr(src.crawler, "AccessibilityScraper", FakeScraper)
+    monkeypatch.setattr(src.ai_analyzer, "AIAnalyzer", FakeAnalyzer)
+
+
+def test_frontier_and_stages(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path / "crawl.db"))
+
+    assert checkpoint.add_urls([("https://site.test/", 0), ("https://site.test/", 1)]) == 1
+    checkpoint.set_stage("https://site.test/", "extracted", {"url": "https://site.test/"})
+    checkpoint.fail("https://site.test/", "Chrome crashed")
+
+    assert checkpoint.next_page(max_attempts=2) == (1, "https://site.test/", 0, "extracted")
+    assert checkpoint.next_page(max_attempts=1) is None
+    assert checkpoint.progress()["failed"] == 1
+    assert checkpoint.load("https://site.test/", "extracted") == {"url": "https://site.test/"}
+
+
+def test_crawl_follows_same_host_links(monkeypatch):
+    _setup(monkeypatch)
+
+    urls = [r["url"] for r in Crawler("https://site.test/", max_pages=10, detect_templates=False).crawl()]
+
+    assert urls == ["https://site.test/", "https://site.test/a", "https://site.test/b", "https://site.test/c"]
+
+
+def test_resume_skips_completed_work(monkeypatch, tmp_path):
+    _setup(monkeypatch)
+    path = str(tmp_path / "crawl.db")
+
+    # Stop while the second page is being processed, after its AI call
+    crawl = Crawler("https://site.test/", use_ai=True, detect_templates=False, checkpoint=CrawlCheckpoint(path)).crawl()
+    next(crawl)
+    next(crawl)
+    crawl.close()
+    assert FakeAnalyzer.calls == ["https://site.test/", "https://site.test/a"]
+
+    resumed = Crawler("https://site.test/", use_ai=True, detect_templates=False, checkpoint=CrawlCheckpoint(path))
+    urls = [r["url"] for r in resumed.crawl()]
+
+    assert urls == ["https://site.test/a", "https://site.test/b", "https://site.test/c"]
+    assert FakeScraper.audited == ["https://site.test/", "https://site.test/a",
+                                   "https://site.test/b", "https://site.test/c"]
+    assert FakeAnalyzer.calls.count("https://site.test/a") == 1
+    assert resumed.checkpoint.progress()["reported"] == 4
+
+
+def test_resume_restores_results_and_templates(monkeypatch, tmp_path):
+    _setup(monkeypatch)
+    path = str(tmp_path / "crawl.db")
+    crawl = Crawler("https://site.test/", detect_templates=False, checkpoint=CrawlCheckpoint(path)).crawl()
+    next(crawl)
+    next(crawl)
+    crawl.close()
+
+    checkpoint = CrawlCheckpoint(path)
+    # The second page was yielded but not acknowledged, so only the first counts as finished
+    assert [(r["url"], r["page_number"]) for r in checkpoint.results()] == [("https://site.test/", 1)]
+
+    header = {"fingerprint": "f1", "region": "header", "first_url": "https://site.test/", "findings": {}}
+    checkpoint.save_templates([header], [("f1", "https://site.test/"), ("f2", "https://site.test/")])
+    checkpoint.save_templates([], [("f1", "https://site.test/a"), ("f1", "https://site.test/")])
+    templates, sightings = checkpoint.load_templates()
+    assert templates == {"f1": header}
+    assert sightings == {"f1": ["https://site.test/", "https://site.test/a"], "f2": ["https://site.test/"]}
+
+    with pytest.raises(ValueError):
+        next(Crawler("https://other.test/", detect_templates=False, checkpoint=checkpoint).crawl())
@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["selenium", "axe_selenium_python", "anthropic", "dotenv", "PIL", "requests"]
+
+# Generous enough for slow CI machines, far below the cost of selenium + anthropic
+IMPORT_BUDGET_SECONDS = 0.5
+
+
+def _run(code):
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def test_cli_import_is_cheap():
+    loaded = _run(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import src.cli, src.scraper, src.reporter\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))"
+    )
+
+    assert loaded["heavy"] == []
+    assert loaded["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+def test_report_and_rules_commands_skip_heavy_imports(tmp_path):
+    results = tmp_path / "results.json"
+    results.write_text(json.dumps({"url": "https://example.com", "axe_results": {"violations": []},
+                                   "week2": {"links": [], "images": [], "readability": []}}))
+    page = tmp_path / "page.html"
+    page.write_text('<html><body><main><a href="/x">klik hier</a><img src="a.png"></main></body></html>')
+    report = tmp_path / "report.html"
+    rules_json = tmp_path / "rules.json"
+
+    loaded = _run(
+        "import json, sys\n"
+        "from src import cli\n"
+        f"cli.main(['report', {str(results)!r}, '-o', {str(report)!r}])\n"
+        f"cli.main(['rules', {str(page)!r}, '--json', {str(rules_json)!r}])\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+
+    assert loaded == []
+    assert "Accessibility Analysis Report" in report.read_text()
+    week2 = json.loads(rules_json.read_text())["week2"]
+    assert week2["links"] == [{"issue": "vague_link_text", "severity": "medium"}]
+    assert week2["images"] == [{"issue": "missing_alt", "severity": "high"}]
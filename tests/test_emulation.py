@@ -0,0 +1,123 @@
+import pytest
+
+from src.emulation import apply_viewport, merge_captures, resolve_state, resolve_viewport
+
+
+class FakeDriver:
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append(command)
+
+
+def _capture(state, targets, links):
+    return {
+        "state": state,
+        "axe_results": {
+            "testEngine": {"name": "axe-core"},
+            "violations": [{"id": "link-name", "impact": "serious",
+                            "nodes": [{"target": [t], "html": "<a>"} for t in targets]}],
+            "passes": []
+        },
+        "raw_elements": {
+            "links": [{"text": text, "href": "/" + text} for text in links],
+            "images": [],
+            "text_blocks": []
+        }
+    }
+
+
+def test_merge_deduplicates_across_states():
+    merged = merge_captures([
+        _capture("desktop", ["#a", "#b"], ["Home", "Contact"]),
+        _capture("mobile", ["#b", "#menu"], ["Home", "Menu"]),
+    ])
+
+    violations = merged["axe_results"]["violations"]
+    assert len(violations) == 1
+    assert violations[0]["states"] == ["desktop", "mobile"]
+    assert {str(n["target"]): n["states"] for n in violations[0]["nodes"]} == {
+        "['#a']": ["desktop"], "['#b']": ["desktop", "mobile"], "['#menu']": ["mobile"]
+    }
+    assert merged["axe_results"]["testEngine"] == {"name": "axe-core"}
+
+    links = {link["text"]: link["states"] for link in merged["raw_elements"]["links"]}
+    assert links == {"Home": ["desktop", "mobile"], "Contact": ["desktop"], "Menu": ["mobile"]}
+
+
+def test_resolve_profiles_and_states():
+    mobile = resolve_viewport("mobile")
+    custom = resolve_viewport({"width": 1024, "height": 600})
+
+    assert mobile["name"] == "mobile" and mobile["mobile"] is True
+    assert custom["name"] == "1024x600"
+    assert "aria-expanded" in resolve_state("open_menu")["script"]
+
+
+def test_apply_viewport_sends_cdp_commands():
+    driver = FakeDriver()
+    apply_viewport(driver, resolve_viewport("mobile"))
+
+    assert driver.commands == ["Emulation.setDeviceMetricsOverride",
+                               "Emulation.setTouchEmulationEnabled",
+                               "Emulation.setUserAgentOverride"]
+
+
+class FakePage:
+    """Page with a menu toggle and a cookie banner, reset by navigation"""
+
+    def __init__(self):
+        self.loads = 0
+        self.menu_open = False
+        self.cleared = []
+        self.current_url = "https://a.test/start?x=1"
+
+    def get(self, url):
+        self.loads += 1
+        self.menu_open = False
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Storage.clearDataForOrigin":
+            self.cleared.append(params["origin"])
+
+    def execute_script(self, script, *args):
+        if "aria-expanded=false" in script:
+            changed = 0 if self.menu_open else 1
+            self.menu_open = True
+            return changed
+        return 0
+
+
+def test_each_viewport_starts_from_a_fresh_page(monkeypatch):
+    from src.scraper import AccessibilityScraper
+
+    monkeypatch.setattr("src.scraper.time.sleep", lambda seconds: None)
+    page = FakePage()
+    scraper = AccessibilityScraper("https://a.test/", driver=page)
+    seen = []
+
+    def capture(compact=True):
+        seen.append(page.menu_open)
+        return {"axe_results": {"violations": []}, "soup": None, "titles": ("A", "A"), "site_wide": None,
+                "elements": {"links": [], "images": [], "text_blocks": []}}
+
+    monkeypatch.setattr(scraper, "capture", capture)
+    result = scraper.extract_states(viewports=("desktop", "mobile"), states=("open_menu",))
+
+    # The mobile base capture sees the menu closed again, and opening it changes something
+    assert seen == [False, True, False, True] and page.loads == 2
+    assert [state["name"] for state in result["states"]] == [
+        "desktop", "desktop:open_menu", "mobile", "mobile:open_menu"]
+    # Only this site's cookies and storage are cleared
+    assert page.cleared == ["https://a.test"]
+
+    # Without states the page is loaded once and only re-rendered per viewport
+    page = FakePage()
+    scraper = AccessibilityScraper("https://a.test/", driver=page)
+    monkeypatch.setattr(scraper, "capture", capture)
+    scraper.extract_states(viewports=("desktop", "mobile"))
+    assert page.loads == 1 and page.cleared == []
+
+    with pytest.raises(ValueError):
+        AccessibilityScraper("https://a.test/", driver=FakePage()).extract_states(viewports=())
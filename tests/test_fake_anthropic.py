@@ -0,0 +1,75 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+from anthropic import Anthropic, RateLimitError
+
+from src.ai_analyzer import AIAnalyzer
+from src.fake_anthropic import FakeAnthropic, rule_verdict, serve
+from src.load_test import run_load_test
+
+
+def _client(server, max_retries=0):
+    return Anthropic(api_key="fake-key", base_url=f"http://127.0.0.1:{server.server_port}", max_retries=max_retries)
+
+
+def test_rule_verdicts_through_the_analyzer():
+    server = serve(FakeAnthropic())
+    try:
+        analyzer = AIAnalyzer(use_vision=False, client=_client(server))
+        advice = analyzer.analyze({
+            "links": [{"text": "klik hier", "href": "/a"}, {"text": "Opening hours", "href": "/b"}],
+            "images": [{"src": "a.png", "alt": "Children reading in the garden"}],
+            "text_blocks": []
+        })["ai_advice"]
+    finally:
+        server.shutdown()
+
+    assert [item["ai_analysis"]["is_accessible"] for item in advice["links"]] == [False, True]
+    assert advice["links"][0]["ai_analysis"]["severity"] == "moderate"
+    assert advice["images"][0]["ai_analysis"]["is_accessible"] is True
+    assert rule_verdict('WCAG 1.1.1\nAlt Text: "(missing)"')["severity"] == "serious"
+
+
+def test_injected_errors_and_rate_limit_headers():
+    server = serve(FakeAnthropic(error_429=1.0))
+    try:
+        with pytest.raises(RateLimitError):
+            _client(server).messages.create(model="m", max_tokens=10, messages=[{"role": "user", "content": "hi"}])
+    finally:
+        server.shutdown()
+
+    fake = FakeAnthropic(requests_per_minute=1)
+    server = serve(fake)
+    body = json.dumps({"model": "m", "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]}).encode()
+    url = f"http://127.0.0.1:{server.server_port}/v1/messages"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, body)) as response:
+            assert response.headers["anthropic-ratelimit-requests-remaining"] == "0"
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(urllib.request.Request(url, body))
+    finally:
+        server.shutdown()
+
+    assert error.value.code == 429 and int(error.value.headers["retry-after"]) >= 1
+    assert fake.stats["429"] == 1 and fake.stats["ok"] == 1
+
+
+def test_load_driver_reports(capsys):
+    report = run_load_test(pages=4, concurrency=2, latency="fixed:0", error_529=0.2, max_retries=3)
+
+    assert report["pages"] == 4 and report["audit_errors"] == 0
+    # 8 links, 4 images and one readability chunk for the 3 paragraphs of each page
+    assert report["ai_calls"] == 4 * (8 + 4 + 1)
+    # Every 529 was retried by the client and every call eventually succeeded
+    assert report["api"]["retries"] == report["api"]["529"] > 0
+    assert report["api"]["ok"] == report["ai_calls"]
+    assert set(report["audit_latency_s"]) == {"p50", "p90", "p99", "max"}
+
+
+def test_load_test_exercises_vision():
+    report = run_load_test(pages=3, concurrency=2, latency="fixed:0", use_vision=True)
+
+    assert report["audit_errors"] == 0 and report["api"]["vision_requests"] > 0
+    assert report["ai_calls"] == report["api"]["requests"]
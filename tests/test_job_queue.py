@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from src.job_queue import JobQueue, SQLiteJobQueue
+from src.worker import Coordinator, Worker
+
+SITE = {
+    "https://site.test/": ["/a", "/b", "https://other.test/"],
+    "https://site.test/a": ["/b", "/c"],
+    "https://site.test/b": ["/"],
+    "https://site.test/c": [],
+}
+
+
+def test_lease_complete_and_priority(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "queue.db"))
+    assert queue.put([("low", {"url": "low"})]) == 1
+    assert queue.put([("high", {"url": "high"}), ("low", {"url": "again"})], priority=5) == 1
+
+    first = queue.lease("w1")
+    second = queue.lease("w2")
+    assert first["payload"] == {"url": "high"}
+    assert second["payload"] == {"url": "low"}
+    assert queue.lease("w3") is None
+
+    assert queue.complete(first["id"], first["lease_id"], {"ok": True})
+    assert queue.stats() == {"pending": 0, "leased": 1, "done": 1, "dead": 0}
+    assert [job["result"] for job in queue.collect()] == [{"ok": True}]
+    assert queue.collect() == []
+
+
+def test_expired_lease_is_retried_then_dead(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = SQLiteJobQueue(path, visibility_timeout=0.05, max_attempts=2)
+    other = SQLiteJobQueue(path, visibility_timeout=0.05, max_attempts=2)
+    queue.put([("page", {"url": "page"})])
+
+    lost = queue.lease("crashed-worker")
+    time.sleep(0.1)
+    retry = other.lease("w2")
+
+    assert retry["id"] == lost["id"] and retry["attempts"] == 2
+    # The first worker's late result must not overwrite the new lease
+    assert not queue.complete(lost["id"], lost["lease_id"], {"stale": True})
+
+    time.sleep(0.1)
+    assert other.lease("w3") is None
+    assert other.stats()["dead"] == 1
+    assert other.collect()[0]["error"] == "Lease expired"
+
+
+def test_status_check_gives_up_expired_leases(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "queue.db"), visibility_timeout=0.05, max_attempts=1)
+    queue.put([("page", {"url": "page"})])
+    queue.lease("crashed-worker")
+    time.sleep(0.1)
+
+    # No worker leases again, the coordinator's status check alone finishes the job
+    assert queue.stats() == {"pending": 0, "leased": 0, "done": 0, "dead": 1}
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+def test_failed_job_is_retried(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    queue.put([("page", {"url": "page"})])
+
+    job = queue.lease("w1")
+    assert queue.fail(job["id"], job["lease_id"], "Chrome crashed")
+    job = queue.lease("w1")
+    assert queue.fail(job["id"], job["lease_id"], "Chrome crashed again")
+
+    assert queue.stats()["dead"] == 1
+
+
+def test_coordinator_and_workers_crawl_site(tmp_path):
+    path = str(tmp_path / "queue.db")
+    audited = []
+
+    def audit(payload):
+        audited.append(payload["url"])
+        links = [{"href": href} for href in SITE[payload["url"]]]
+        return {"url": payload["url"], "raw_elements": {"links": links, "images": [], "text_blocks": []}}
+
+    workers = [Worker(SQLiteJobQueue(path), worker_id=f"w{i}", audit_fn=audit) for i in range(2)]
+    threads = [threading.Thread(target=w.run, kwargs={"idle_timeout": 1, "poll_interval": 0.01}) for w in workers]
+    for thread in threads:
+        thread.start()
+
+    coordinator = Coordinator(SQLiteJobQueue(path), "https://site.test/", max_pages=3)
+    jobs = list(coordinator.run(poll_interval=0.01))
+    for thread in threads:
+        thread.join()
+
+    assert sorted(job["payload"]["url"] for job in jobs) == [
+        "https://site.test/", "https://site.test/a", "https://site.test/b"]
+    assert sorted(audited) == sorted(job["payload"]["url"] for job in jobs)
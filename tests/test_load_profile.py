@@ -0,0 +1,86 @@
+import json
+import re
+
+from selenium.webdriver.chrome.options import Options
+
+from src.load_profile import LoadProfile, summarize_network_log
+
+
+def matches_pattern(url, pattern):
+    # Chrome's blocked URL matching: the whole URL, '*' is the only wildcard
+    return re.fullmatch(".*".join(re.escape(part) for part in pattern.split("*")), url) is not None
+
+
+def _event(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+class FakeDriver:
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+
+
+def test_lightweight_profile_patterns():
+    with_vision = LoadProfile.lightweight(use_vision=True).blocked_patterns()
+    without_vision = LoadProfile.lightweight(use_vision=False).blocked_patterns()
+
+    assert "*.mp4" in with_vision and "*.woff2?*" in with_vision
+    assert "*googletagmanager.com*" in with_vision
+    assert "*.png" not in with_vision
+    assert "*.png" in without_vision
+
+
+def test_media_patterns_match_the_extension_only():
+    patterns = LoadProfile().blocked_patterns()
+
+    def blocked(url):
+        return any(matches_pattern(url, pattern) for pattern in patterns)
+
+    assert blocked("https://cdn.test/intro.mov") and blocked("https://cdn.test/clip.mp4?v=2")
+    # The audited document and its assets load even when a host or path contains ".mov"
+    assert not blocked("https://www.movistar.es/")
+    assert not blocked("https://www.movistar.es/static/app.js")
+    assert not blocked("https://a.test/news/2024.ogg-results/page.html")
+
+
+def test_profile_configures_chrome():
+    options = Options()
+    profile = LoadProfile(cache_dir="/tmp/audit-cache")
+    profile.configure_options(options)
+
+    assert "--disk-cache-dir=/tmp/audit-cache" in options.arguments
+    assert "--mute-audio" in options.arguments
+    assert options.to_capabilities()["goog:loggingPrefs"] == {"performance": "ALL"}
+
+    driver = FakeDriver()
+    profile.apply(driver)
+    assert ("Network.setBlockedURLs", {"urls": profile.blocked_patterns()}) in driver.commands
+
+
+def test_summarize_network_log():
+    entries = [
+        _event("Network.requestWillBeSent", requestId="1", type="Document"),
+        _event("Network.loadingFinished", requestId="1", encodedDataLength=1000),
+        _event("Network.requestWillBeSent", requestId="2", type="Media"),
+        _event("Network.loadingFailed", requestId="2", type="Media", blockedReason="inspector"),
+        _event("Network.requestWillBeSent", requestId="3", type="Script"),
+        _event("Network.responseReceived", requestId="3",
+               response={"fromDiskCache": True, "headers": {"Content-Length": "500"}}),
+        _event("Network.loadingFinished", requestId="3", encodedDataLength=0),
+        _event("Network.requestWillBeSent", requestId="4", type="Script"),
+        _event("Network.loadingFailed", requestId="4", errorText="net::ERR_FAILED"),
+        {"message": "not json"},
+    ]
+
+    stats = summarize_network_log(entries)
+
+    assert stats["requests"] == 4
+    assert stats["requests_loaded"] == 2
+    assert stats["bytes_loaded"] == 1000
+    assert stats["requests_blocked"] == 1
+    assert stats["blocked_by_type"] == {"Media": 1}
+    assert stats["requests_from_cache"] == 1
+    assert stats["bytes_saved_by_cache"] == 500
@@ -0,0 +1,100 @@
+import tracemalloc
+
+from src.page_limits import PageLimits, read_page_source, spread_sample, stream_extract
+from src.reporter import AccessibilityReporter
+from src.scraper import AccessibilityScraper
+
+PARAGRAPH = "<p>" + "Lorem ipsum dolor sit amet consectetur " * 10 + "<a href='/more'>read more</a></p>"
+
+
+def _huge_page(rows):
+    yield "<html><head><title>Dump</title></head><body><h1>Orders</h1><table>"
+    for i in range(rows):
+        yield f"<tr><td><a href='/order/{i}'>Order {i}</a></td><td><img src='/i/{i}.png'></td></tr>"
+    yield f"</table><h2>Notes</h2>{PARAGRAPH}</body></html>"
+
+
+def test_spread_sample_keeps_order():
+    assert spread_sample(list(range(10)), 5) == [0, 2, 4, 6, 8]
+    assert spread_sample([1, 2], 5) == [1, 2]
+
+
+def test_stream_extract_is_bounded():
+    limits = PageLimits(max_elements=50, max_text_chars=100)
+
+    # Warm up, so lxml's import is not counted
+    stream_extract(["<p></p>"], limits)
+    tracemalloc.start()
+    elements, info = stream_extract(_huge_page(20_000), limits)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # The page is ~1.7 MB of HTML; the kept samples, not the page, decide the peak
+    assert peak < 500_000
+    assert info["found"] == {"links": 20_001, "images": 20_000, "text_blocks": 1}
+    assert len(elements["links"]) == len(elements["images"]) == 50
+    assert (info["page_title"], info["main_heading"]) == ("Dump", "Orders")
+
+    block = elements["text_blocks"][0]
+    assert block["heading_context"] == "Notes" and block["text"].endswith("...") and block["word_count"] == 62
+
+    links = stream_extract(["<h2>Notes</h2>", PARAGRAPH], limits)[0]["links"]
+    assert links[0]["context"].startswith("Section: Notes | Paragraph: Lorem ipsum")
+
+
+def test_analyze_html_reports_degradation():
+    html = "".join(_huge_page(2_000))
+    scraper = AccessibilityScraper("https://site.test/", browser=False,
+                                   limits=PageLimits(max_dom_size=100_000, max_elements=100, max_text_chars=100))
+    results = scraper.analyze_html(html)
+
+    assert results["degraded"]["streamed"]["dom_size"] == len(html)
+    assert results["degraded"]["sampled"]["links"] == {"found": 2001, "kept": 100}
+    assert results["degraded"]["truncated_text_blocks"] == 1
+    assert "Only 100 of 2001 links were analyzed" in AccessibilityReporter().generate_report(results)
+
+    small = AccessibilityScraper("https://site.test/", browser=False).analyze_html("<p>Hi</p>")
+    assert small["degraded"] is None
+
+
+class ScriptDriver:
+    """Answers execute_script like a browser holding html, and records script timeouts"""
+
+    def __init__(self, html):
+        self.html = html
+        self.scripts = []
+        self.script_timeouts = [30]
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+        return self.html if len(self.html) <= args[0] else len(self.html)
+
+    @property
+    def page_source(self):
+        raise AssertionError("the page was already serialized")
+
+    @property
+    def timeouts(self):
+        from selenium.webdriver.common.timeouts import Timeouts
+        return Timeouts(script=self.script_timeouts[-1])
+
+    def set_script_timeout(self, seconds):
+        self.script_timeouts.append(seconds)
+
+
+def test_page_is_serialized_once():
+    assert read_page_source(ScriptDriver("<p>Hi</p>"), PageLimits()) == ("<p>Hi</p>", 9)
+    assert read_page_source(ScriptDriver("<p>Hi</p>"), PageLimits(max_dom_size=5)) == (None, 9)
+
+
+def test_axe_restores_the_script_timeout():
+    from selenium.common.exceptions import TimeoutException
+
+    class SlowAxe:
+        def run(self, context=None):
+            raise TimeoutException("axe")
+
+    scraper = AccessibilityScraper("https://site.test/", browser=False, limits=PageLimits(axe_timeout=5))
+    scraper.driver = ScriptDriver("")
+    assert scraper._run_axe(SlowAxe())["violations"] == []
+    assert scraper.driver.script_timeouts == [30, 5, 30] and scraper.degraded["axe_timeout"] == 5
@@ -0,0 +1,135 @@
+import pytest
+
+from src.axe_compactor import compact_axe_results, violation_summaries
+from src.results_store import ResultsStore, flatten_findings, wcag_criterion
+
+
+def _axe(*violations):
+    return {"violations": [
+        {"id": rule, "impact": impact, "tags": tags, "help": f"{rule} help",
+         "nodes": [{"target": [f"#{rule}-{i}"], "html": "<x>"} for i in range(nodes)]}
+        for rule, impact, tags, nodes in violations
+    ], "passes": [], "incomplete": [], "inapplicable": []}
+
+
+IMAGE_ALT = ("image-alt", "critical", ["wcag2a", "wcag111"], 2)
+CONTRAST = ("color-contrast", "serious", ["wcag2aa", "wcag143"], 1)
+REGION = ("region", "moderate", ["best-practice"], 1)
+
+
+def _page(url, *violations, week2=None, advice=None):
+    return {"url": url, "axe_results": _axe(*violations),
+            "week2": week2 or {"links": [], "images": []},
+            "ai_results": {"ai_advice": advice or {}}}
+
+
+def test_flatten_findings_covers_all_sources():
+    advice = {"links": [
+        {"link": {"href": "/more"}, "ai_analysis": {"is_accessible": False, "issue": "Vague", "severity": "high"}},
+        {"link": {"href": "/ok"}, "ai_analysis": {"is_accessible": True}}
+    ]}
+    week2 = {"links": [{"issue": "vague_link_text", "severity": "medium"}], "images": []}
+    page = _page("https://site.test/", IMAGE_ALT, REGION, week2=week2, advice=advice)
+
+    findings = flatten_findings(page)
+    assert findings == flatten_findings(dict(page, axe_results=compact_axe_results(page["axe_results"])))
+    assert ("axe", "image-alt", "1.1.1", "critical", "#image-alt-1", "image-alt help") in findings
+    assert ("axe", "region", None, "moderate", "#region-0", "region help") in findings
+    assert ("rule", "vague_link_text", "2.4.4", "moderate", None, None) in findings
+    assert ("ai", "ai-link-purpose", "2.4.4", "serious", "/more", "Vague") in findings
+    assert len(findings) == 5
+    assert wcag_criterion(["wcag21aa", "wcag1410"]) == "1.4.10"
+
+
+def test_failed_ai_answers_are_not_findings():
+    advice = {"links": [
+        {"link": {"href": "/a"}, "ai_analysis": {"is_accessible": None, "issue": "Invalid AI response format"}},
+        {"link": {"href": "/b"}, "ai_analysis": {"error": "overloaded"}},
+        {"link": {"href": "/c"}, "ai_analysis": {"is_accessible": False, "issue": "Vague", "invalid_fields": ["severity"]}},
+        {"link": {"href": "/d"}, "ai_analysis": {"is_accessible": False, "issue": "Vague"}},
+    ]}
+    findings = flatten_findings(_page("https://site.test/", advice=advice))
+    assert [f[4] for f in findings] == ["/d"]
+
+
+def test_site_wide_templates_are_stored_once(tmp_path):
+    template = {"fingerprint": "abc", "region": "header", "first_url": "https://site.test/", "pages": [],
+                "findings": {"axe_violations": violation_summaries(_axe(IMAGE_ALT)),
+                             "links": [{"issue": "vague_link_text", "severity": "medium"}], "images": []}}
+    store = ResultsStore(str(tmp_path / "results.db"))
+    run = store.create_run()
+    store.ingest_templates(run, {"abc": template})
+    store.ingest_templates(run, {"abc": template})
+
+    assert {row["rule"]: row["findings"] for row in store.aggregate(run)} == {"image-alt": 2, "vague_link_text": 1}
+    assert store.top_offenders(run)[0]["url"] == "site-wide:header:abc"
+
+
+def test_aggregate_and_top_offenders(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    run = store.create_run("nightly")
+    store.ingest(run, [
+        _page("https://site.test/", IMAGE_ALT, CONTRAST),
+        _page("https://site.test/a", IMAGE_ALT, REGION),
+        {"url": "https://site.test/broken", "error": "timeout"},
+    ])
+
+    by_rule = store.aggregate(run)
+    assert by_rule[0] == {"source": "axe", "rule": "image-alt", "criterion": "1.1.1", "findings": 4, "pages": 2}
+    assert store.aggregate(run, by="criterion", criterion="1.4.3") == [
+        {"criterion": "1.4.3", "findings": 1, "pages": 1}]
+    assert {row["severity"]: row["findings"] for row in store.aggregate(run, by="severity")} == {
+        "critical": 4, "serious": 1, "moderate": 1}
+
+    top = store.top_offenders(run, limit=1, min_severity="serious")
+    assert top == [{"url": "https://site.test/", "findings": 3, "rules": 2}]
+    assert store.runs()[0]["pages"] == 2
+
+
+def test_diff_between_runs(tmp_path):
+    path = str(tmp_path / "results.db")
+    store = ResultsStore(path)
+    base = store.create_run("before")
+    store.ingest(base, [_page("https://site.test/", IMAGE_ALT), _page("https://site.test/a", CONTRAST),
+                        _page("https://site.test/gone", REGION)])
+    store.close()
+
+    # A new connection must reuse the rule rows instead of duplicating them
+    store = ResultsStore(path)
+    run = store.create_run("after")
+    store.ingest(run, [_page("https://site.test/", CONTRAST), _page("https://site.test/a", CONTRAST, REGION)])
+
+    diff = store.diff(base, run)
+    assert [(d["url"], d["rule"], d["before"], d["after"]) for d in diff["regressed"]] == [
+        ("https://site.test/", "color-contrast", 0, 1), ("https://site.test/a", "region", 0, 1)]
+    assert [(d["url"], d["rule"], d["before"], d["after"]) for d in diff["fixed"]] == [
+        ("https://site.test/", "image-alt", 2, 0)]
+    assert store.db.execute("SELECT COUNT(*) FROM rules").fetchone()[0] == 3
+
+
+def test_queries_use_indexes(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    where, params = store._filters(1, "axe", "1.1.1")
+    plan = store.db.execute(
+        f"EXPLAIN QUERY PLAN SELECT r.rule, COUNT(*) FROM findings f JOIN rules r ON r.id = f.rule_id "
+        f"WHERE {where} GROUP BY r.rule", params
+    ).fetchall()
+    details = " ".join(row[-1] for row in plan)
+
+    assert "SCAN f" not in details and "SCAN findings" not in details
+
+
+def test_rolled_back_ingest_leaves_no_stale_rule_ids(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    run = store.create_run()
+
+    def pages():
+        yield _page("https://site.test/", CONTRAST)
+        raise RuntimeError("crawl aborted")
+
+    with pytest.raises(RuntimeError):
+        store.ingest(run, pages())
+    assert store.db.execute("SELECT COUNT(*) FROM rules").fetchone()[0] == 0
+
+    store.ingest(run, [_page("https://site.test/", CONTRAST)])
+    assert store.aggregate(run)[0]["rule"] == "color-contrast"
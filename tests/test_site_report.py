@@ -0,0 +1,55 @@
+import json
+import os
+
+from src.site_report import SiteReportBuilder
+
+
+def _page(i):
+    violations = [{"id": "image-alt", "impact": "critical", "tags": ["wcag111"], "description": "Alt",
+                   "nodes": [{"target": ["img"]}] * (i % 3)}] if i % 3 else []
+    return {"url": f"https://site.test/{i}", "axe_results": {"violations": violations},
+            "week2": {"links": [{"issue": "vague_link_text", "severity": "medium"}], "images": []}}
+
+
+def _load(path, call):
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    assert content.startswith(f"siteReport.{call}(") and content.endswith(");\n")
+    args = content[len(f"siteReport.{call}("):-3]
+    # loadShard(number, pages) and loadRulePages(number, ids)
+    return json.loads(args.split(",", 1)[1] if call != "setIndex" else args)
+
+
+def test_indexes_and_shards(tmp_path):
+    builder = SiteReportBuilder(str(tmp_path), shard_size=100)
+    for i in range(250):
+        builder.add(_page(i))
+    # A page that failed on every attempt is one error, one that succeeded on retry is none
+    builder.add({"url": "https://site.test/broken", "error": "timeout"})
+    builder.add({"url": "https://site.test/broken", "error": "timeout"})
+    builder.add({"url": "https://site.test/250", "error": "timeout"})
+    builder.add(_page(250))
+    path = builder.finish(title="site.test")
+
+    index = _load(tmp_path / "data" / "index.js", "setIndex")
+    assert index["summary"]["pages"] == 251 and index["errors"] == [{"url": "https://site.test/broken", "error": "timeout"}]
+    assert index["summary"]["severity"]["critical"] == 250
+    rules = {rule["key"]: rule for rule in index["rules"]}
+    assert rules["rule:vague_link_text"]["pages"] == 251
+    assert rules["axe:image-alt"]["pages"] == 167
+    # The pages of each rule are in their own file, not in the index
+    image_alt = _load(tmp_path / "data" / f"rule_{rules['axe:image-alt']['file']:05d}.js", "loadRulePages")
+    assert len(image_alt) == 167 and image_alt[:3] == [1, 2, 4]
+    # Pages are ranked by findings once, at build time
+    assert index["pages"][0][2] == 3 and index["pages"][-1][2] == 1
+
+    assert sorted(os.listdir(tmp_path / "data")) == [
+        "index.js", "rule_00000.js", "rule_00001.js", "shard_00000.js", "shard_00001.js", "shard_00002.js"]
+    shard = _load(tmp_path / "data" / "shard_00002.js", "loadShard")
+    assert [page["id"] for page in shard] == list(range(200, 251))
+    assert shard[0]["axe"][0]["node_count"] == 2
+
+    # The shell only loads data on demand
+    with open(path, encoding="utf-8") as f:
+        shell = f.read()
+    assert "https://site.test/1" not in shell and "data/index.js" in shell
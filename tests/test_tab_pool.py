@@ -0,0 +1,192 @@
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import JavascriptException, TimeoutException
+
+from src.tab_pool import TabDriver, TabPool
+
+
+class FakeConnection:
+    def __init__(self, evaluate=None, delay=0):
+        self.sent = []
+        self.events = []
+        self.evaluate = evaluate or (lambda params: {"result": {"value": 42}})
+        self.delay = delay
+        self.closed = False
+
+    def send(self, method, params=None, timeout=30):
+        self.sent.append((method, params, timeout))
+        if self.delay > timeout:
+            raise TimeoutException(f"{method} did not answer")
+        return self.evaluate(params) if method == "Runtime.evaluate" else {}
+
+    def wait_event(self, method, timeout):
+        return {"method": method}
+
+    def close(self):
+        self.closed = True
+
+
+def test_tab_driver_runs_scripts_like_webdriver():
+    tab = TabDriver(FakeConnection(), "target", "context")
+    assert tab.execute_script("return arguments[0] + arguments[1];", 40, 2) == 42
+    _, params, _ = tab.connection.sent[-1]
+    assert params["expression"].endswith(".apply(null, [40, 2])") and not params["awaitPromise"]
+
+    tab.execute_async_script("var callback = arguments[arguments.length - 1]; callback(1);")
+    assert tab.connection.sent[-1][1]["awaitPromise"] is True
+
+    # A script error is the page's problem, the tab stays usable
+    tab.connection.evaluate = lambda params: {"exceptionDetails": {"text": "Uncaught", "exception": {
+        "description": "ReferenceError: axe is not defined"}}}
+    with pytest.raises(JavascriptException, match="axe is not defined"):
+        tab.execute_script("return axe;")
+    assert not tab.broken
+
+
+def test_tab_timeouts_mark_the_tab_broken():
+    tab = TabDriver(FakeConnection(delay=5), "target", "context")
+    tab.set_script_timeout(2)
+    with pytest.raises(TimeoutException):
+        tab.execute_script("while (true) {}")
+    assert tab.broken
+
+    # The audit deadline caps every command, however long its own timeout
+    tab = TabDriver(FakeConnection(), "target", "context", deadline=time.monotonic() + 1)
+    tab.execute_script("return 1;")
+    assert tab.connection.sent[-1][2] <= 1
+    tab.deadline = time.monotonic() - 1
+    with pytest.raises(TimeoutException, match="audit timeout"):
+        tab.get("https://a.test/")
+
+
+def test_pool_limits_tabs_by_memory_and_closes_broken_tabs():
+    memory = {"mb": 2000}
+    opened = []
+
+    def open_tab(pool):
+        opened.append(TabDriver(FakeConnection(), f"t{len(opened)}", "c"))
+        return opened[-1]
+
+    pool = TabPool(max_tabs=4, tab_timeout=60, min_free_mb=500, memory_probe=lambda: memory["mb"], tab_factory=open_tab)
+    release = threading.Event()
+    started = []
+
+    def audit():
+        with pool.driver() as tab:
+            started.append(tab)
+            release.wait(5)
+
+    first = threading.Thread(target=audit)
+    first.start()
+    while not started:
+        time.sleep(0.01)
+
+    # Low memory holds back the second tab until the first one closes
+    memory["mb"] = 100
+    second = threading.Thread(target=audit)
+    second.start()
+    time.sleep(0.2)
+    assert len(started) == 1 and pool.stats["memory_waits"] == 1
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert len(started) == 2
+
+    with pytest.raises(RuntimeError):
+        with pool.driver() as tab:
+            assert tab.deadline is not None
+            raise RuntimeError("renderer crashed")
+    assert pool.stats["tabs_killed"] == 1 and opened[-1].connection.closed
+
+
+def test_failed_tab_does_not_restart_a_live_browser(monkeypatch):
+    import src.tab_pool as tab_pool
+
+    class Browser:
+        quit_calls = 0
+
+        def quit(self):
+            Browser.quit_calls += 1
+
+    pool = TabPool(max_tabs=2)
+    pool.browser = Browser()
+    pool._browser_connection = FakeConnection()
+    answers = [RuntimeError("Target.createTarget did not answer"), ("c1", "t1")]
+
+    def create_target():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(pool, "_create_target", create_target)
+    monkeypatch.setattr(pool, "_browser_alive", lambda: True)
+    monkeypatch.setattr(pool, "_debugger_address", lambda: "127.0.0.1:9222")
+    monkeypatch.setattr(tab_pool, "CDPConnection", lambda url, **kwargs: FakeConnection())
+
+    tab = pool._open_tab(pool)
+    assert tab.target_id == "t1" and pool.browser is not None
+    assert Browser.quit_calls == 0 and pool.stats["browser_restarts"] == 0
+
+
+def test_connection_keeps_only_awaited_events(monkeypatch):
+    import json
+
+    import websocket
+
+    from src.tab_pool import CDPConnection
+
+    class Socket:
+        def __init__(self):
+            self.incoming = [{"method": "Network.dataReceived"}, {"method": "Page.loadEventFired"},
+                             {"method": "Log.entryAdded"}, {"id": 1, "result": {}}]
+
+        def send(self, message):
+            pass
+
+        def settimeout(self, timeout):
+            pass
+
+        def recv(self):
+            return json.dumps(self.incoming.pop(0))
+
+    monkeypatch.setattr(websocket, "create_connection", lambda *args, **kwargs: Socket())
+    connection = CDPConnection("ws://x", keep_events=("Page.loadEventFired",))
+    connection.send("Page.navigate")
+    assert connection.events == [{"method": "Page.loadEventFired"}]
+    assert connection.wait_event("Page.loadEventFired", 1) and connection.events == []
+
+
+def test_tabs_get_the_load_profile(monkeypatch):
+    import src.tab_pool as tab_pool
+    from src.load_profile import LoadProfile
+
+    pool = TabPool(max_tabs=2, load_profile=LoadProfile())
+    pool.browser = object()
+    pool._browser_connection = FakeConnection()
+    kept = []
+
+    def connect(url, keep_events=()):
+        kept.extend(keep_events)
+        return FakeConnection()
+
+    monkeypatch.setattr(pool, "_create_target", lambda: ("c1", "t1"))
+    monkeypatch.setattr(pool, "_debugger_address", lambda: "127.0.0.1:9222")
+    monkeypatch.setattr(tab_pool, "CDPConnection", connect)
+    tab = pool._open_tab(pool)
+
+    sent = [method for method, _, _ in tab.connection.sent]
+    assert "Network.enable" in sent and "Network.setBlockedURLs" in sent
+    assert "Network.loadingFailed" in kept
+
+    # Network events the tab received are its performance log
+    tab.connection.events = [
+        {"method": "Network.requestWillBeSent", "params": {"requestId": "1", "type": "Media"}},
+        {"method": "Network.loadingFailed", "params": {"requestId": "1", "blockedReason": "inspector"}},
+        {"method": "Page.loadEventFired", "params": {}},
+    ]
+    stats = pool.load_profile.page_stats(tab)
+    assert stats["requests_blocked"] == 1 and stats["blocked_by_type"] == {"Media": 1}
+    assert tab.connection.events == [{"method": "Page.loadEventFired", "params": {}}]
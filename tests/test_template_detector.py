@@ -0,0 +1,98 @@
+from bs4 import BeautifulSoup
+
+from src.reporter import AccessibilityReporter
+from src.template_detector import TemplateDetector, css_selector
+
+PAGE = """<html><body>
+<header><nav><a href="/">Home</a><a href="/contact">Contact</a></nav></header>
+<main><h1>{title}</h1><p>{body}</p></main>
+<footer><p>© 2026</p><a href="/privacy">Privacy</a></footer>
+<footer><p>Second footer</p></footer>
+</body></html>"""
+
+
+def _soup(title, body, year="2026"):
+    return BeautifulSoup(PAGE.format(title=title, body=body).replace("2026", year), "lxml")
+
+
+def test_same_regions_match_across_pages():
+    detector = TemplateDetector()
+    first = detector.find_regions(_soup("Home", "Welcome"))
+    second = detector.find_regions(_soup("About", "About us", year="2027"))
+
+    # nav is nested in header, so only the outer regions are returned
+    assert [r["region"] for r in first] == ["header", "footer", "footer"]
+    assert [r["fingerprint"] for r in first] == [r["fingerprint"] for r in second]
+
+
+def test_changed_region_gets_new_fingerprint():
+    detector = TemplateDetector()
+    soup = _soup("Home", "Welcome")
+    original = detector.find_regions(soup)[0]["fingerprint"]
+    soup.find("nav").append(soup.new_tag("a", href="/new"))
+
+    assert detector.find_regions(soup)[0]["fingerprint"] != original
+
+
+def test_selectors_distinguish_identical_siblings():
+    soup = _soup("Home", "Welcome")
+    footers = soup.find_all("footer")
+
+    assert css_selector(footers[0]) == "html > body > footer:nth-of-type(1)"
+    assert css_selector(footers[1]) == "html > body > footer:nth-of-type(2)"
+
+
+def test_site_wide_after_min_pages():
+    detector = TemplateDetector(min_pages=2)
+    header = detector.find_regions(_soup("Home", "Welcome"))[0]
+    detector.register(header, "https://example.com/", {"axe_violations": [], "links": [], "images": []})
+    detector.mark_seen(header["fingerprint"], "https://example.com/")
+
+    assert detector.site_wide() == {}
+
+    detector.mark_seen(header["fingerprint"], "https://example.com/about")
+    assert list(detector.site_wide()) == [header["fingerprint"]]
+
+
+def test_report_shows_site_wide_findings():
+    detector = TemplateDetector()
+    header = detector.find_regions(_soup("Home", "Welcome"))[0]
+    detector.register(header, "https://example.com/", {
+        "axe_violations": [{"id": "region", "impact": "moderate"}],
+        "links": [{"issue": "vague_link_text", "severity": "medium"}],
+        "images": []
+    })
+    detector.mark_seen(header["fingerprint"], "https://example.com/")
+
+    results = {"url": "https://example.com/",
+               "site_wide": {"templates": [{"fingerprint": header["fingerprint"], "region": "header", "new": True}]}}
+    html = AccessibilityReporter().generate_report(results, templates=detector.templates)
+
+    assert "Site-wide Findings" in html
+    assert header["fingerprint"] in html
+
+
+def test_page_wrappers_are_not_template_regions():
+    soup = BeautifulSoup("""<html class="has-cookie-banner"><body class="cookie-consent-open">
+        <div class="page-cookie-wrapper"><main><p>Content</p></main></div>
+        <div id="cookie-banner"><button>Accept</button></div></body></html>""", "lxml")
+
+    assert [r["selector"] for r in TemplateDetector().find_regions(soup)] == ["#cookie-banner"]
+
+
+def test_regions_are_skipped_only_once_site_wide():
+    from src.scraper import AccessibilityScraper
+
+    detector = TemplateDetector(min_pages=2)
+    scraper = AccessibilityScraper("https://example.com/", browser=False, template_detector=detector)
+    breadcrumb = '<nav class="crumbs"><a href="/a">A</a></nav>'
+
+    first = scraper._site_wide_regions(_soup("Home", "Welcome"))
+    scraper.url = "https://example.com/about"
+    second = scraper._site_wide_regions(BeautifulSoup(
+        PAGE.format(title="About", body="About us").replace("<main>", "<main>" + breadcrumb), "lxml"))
+
+    # Nothing is site-wide on the first page; the breadcrumb nav is only on one page
+    assert first == []
+    assert [r["region"] for r in second] == ["header", "footer", "footer"]
+    assert detector.is_site_wide(second[0]["fingerprint"])
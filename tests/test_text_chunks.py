@@ -0,0 +1,71 @@
+from anthropic import Anthropic
+
+from src.ai_analyzer import AIAnalyzer, chunk_text_blocks
+from src.fake_anthropic import FakeAnthropic, serve
+from src.reporter import AccessibilityReporter
+
+EASY = "The cat sat on the mat. It was warm. The sun was out. We had tea. It was a good day for all of us."
+HARD = ("The municipal administration, having considered the recommendations of the advisory committee concerning "
+        "the reorganisation of public library services, has resolved that opening hours shall be harmonised")
+MEDIUM = "Members of the library can borrow twenty books at a time and renew them online"
+
+
+def _block(text, heading):
+    return {"text": text, "heading_context": heading, "word_count": len(text.split())}
+
+
+def test_sections_stay_together_within_the_budget():
+    blocks = [_block("x" * 400, "A"), _block("x" * 400, "B"), _block("x" * 400, "B"), _block("x" * 400, "A")]
+    # Sections are consecutive paragraphs under one heading, B does not fit next to A and starts its own chunk
+    assert chunk_text_blocks(blocks, max_tokens=300) == [[0], [1, 2], [3]]
+
+    # A section larger than a chunk is split by paragraph, and the paragraph count is capped too
+    assert chunk_text_blocks(blocks, max_tokens=130) == [[0], [1], [2], [3]]
+    assert chunk_text_blocks(blocks, max_tokens=10_000, max_paragraphs=3) == [[0, 1, 2], [3]]
+
+    # The same heading further down the page, or no heading at all, is not merged with earlier paragraphs
+    blocks = [_block("x" * 40, ""), _block("x" * 40, "A"), _block("x" * 40, "")]
+    assert chunk_text_blocks(blocks, max_tokens=60) == [[0], [1], [2]]
+
+
+def test_whole_page_readability_in_few_requests():
+    blocks = []
+    for section in range(6):
+        blocks += [_block(HARD, f"Section {section}"), _block(MEDIUM, f"Section {section}"),
+                   _block(EASY, f"Section {section}"), _block(HARD, f"Section {section}")]
+
+    fake = FakeAnthropic()
+    server = serve(fake)
+    try:
+        client = Anthropic(api_key="fake-key", base_url=f"http://127.0.0.1:{server.server_port}", max_retries=0)
+        analyzer = AIAnalyzer(use_vision=False, client=client)
+        results = analyzer._analyze_text_blocks(blocks)
+    finally:
+        server.shutdown()
+
+    # 18 paragraphs in two chunks of at most 12, where 5 requests used to cover 5 paragraphs
+    assert fake.stats["requests"] == 2 and len(results) == 24
+    verdicts = [item["ai_analysis"] for item in results]
+    assert verdicts[2::4] == [{"skipped": "easy"}] * 6
+    assert [v["is_accessible"] for v in verdicts[0::4] + verdicts[3::4]] == [False] * 12
+    assert all(v["is_accessible"] is True and v["wcag_criterion"] == "3.1.5" for v in verdicts[1::4])
+    assert analyzer.stats["invalid_paragraphs"] == 0
+
+
+def test_chunk_limit_is_optional_and_reported():
+    blocks = [_block(HARD, f"Section {section}") for section in range(3)]
+    client = object()
+    analyzer = AIAnalyzer(use_vision=False, client=client, max_text_chunks=1)
+    analyzer._ask_paragraph_verdicts = lambda prompt, count: [{"error": "overloaded"} for _ in range(count)]
+    results = analyzer._analyze_text_blocks(blocks * 6)
+
+    skipped = [item for item in results if item["ai_analysis"] == {"skipped": "chunk_limit"}]
+    assert skipped and results[0]["ai_analysis"] is not results[1]["ai_analysis"]
+    report = AccessibilityReporter().generate_report({"url": "https://site.test/", "ai_results": {
+        "ai_advice": {"links": [], "images": [], "text_blocks": results}}})
+    assert f"{len(skipped)} paragraph(s) were past the text chunk limit" in report
+
+    analyzer = AIAnalyzer(use_vision=False, client=client)
+    analyzer._ask_paragraph_verdicts = lambda prompt, count: [{"error": "overloaded"} for _ in range(count)]
+    assert not any(item["ai_analysis"].get("skipped") == "chunk_limit"
+                   for item in analyzer._analyze_text_blocks(blocks * 6))
@@ -0,0 +1,109 @@
+import json
+from types import SimpleNamespace
+
+from src.ai_analyzer import AIAnalyzer
+from src.verdict_schema import MAX_TOKENS_CEILING, MAX_TOKENS_FLOOR, TokenBudget, invalid_fields, verdict_schema
+
+GOOD = {"is_accessible": False, "wcag_criterion": "2.4.4", "severity": "moderate",
+        "issue": "Vague link text", "recommendation": "Describe the destination", "reasoning": "Says 'click here'"}
+
+
+class ToolClient:
+    """Answers each call with the next tool input, or text when the answer is a string"""
+
+    def __init__(self, *answers, output_tokens=80):
+        self.answers = list(answers)
+        self.requests = []
+        self.output_tokens = output_tokens
+        self.messages = SimpleNamespace(create=self.create)
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        answer = self.answers.pop(0)
+        if isinstance(answer, str):
+            block = SimpleNamespace(type="text", text=answer)
+        else:
+            block = SimpleNamespace(type="tool_use", id=f"toolu_{len(self.requests)}",
+                                    name=kwargs["tool_choice"]["name"], input=answer)
+        return SimpleNamespace(content=[block], stop_reason="tool_use",
+                               usage=SimpleNamespace(input_tokens=100, output_tokens=self.output_tokens))
+
+
+def test_invalid_fields():
+    schema = verdict_schema("3.1.5")
+
+    assert invalid_fields(dict(GOOD, wcag_criterion="3.1.5"), schema) == {}
+    problems = invalid_fields({**GOOD, "wcag_criterion": "3.1.5", "severity": "critical",
+                               "is_accessible": "no", "reasoning": "x" * 301}, schema)
+    assert set(problems) == {"severity", "is_accessible", "reasoning"}
+    assert invalid_fields({}, schema)["issue"] == "missing"
+
+
+def test_reask_only_invalid_fields():
+    client = ToolClient(dict(GOOD, severity="high", extra="dropped"), {"severity": "serious"})
+    verdict = AIAnalyzer(use_vision=False, client=client)._ask_verdict("WCAG 2.4.4 prompt", "2.4.4")
+
+    assert verdict == dict(GOOD, severity="serious")
+    first, reask = client.requests
+    assert first["tool_choice"] == {"type": "tool", "name": "report_verdict"}
+    # The re-ask asks only for the broken field and explains what was wrong with it
+    fix_tool = next(tool for tool in reask["tools"] if tool["name"] == reask["tool_choice"]["name"])
+    assert list(fix_tool["input_schema"]["properties"]) == ["severity"]
+    assert "severity must be one of" in reask["messages"][-1]["content"][0]["content"]
+
+
+def test_still_invalid_after_reask_and_text_fallback():
+    analyzer = AIAnalyzer(use_vision=False, client=ToolClient(dict(GOOD, severity="high"), {"severity": "urgent"}))
+    verdict = analyzer._ask_verdict("prompt", "2.4.4")
+
+    assert verdict["severity"] is None and verdict["invalid_fields"] == ["severity"]
+    assert verdict["issue"] == GOOD["issue"]
+    assert analyzer.stats["reasks"] == analyzer.stats["invalid_after_reask"] == 1
+
+    analyzer = AIAnalyzer(use_vision=False, client=ToolClient(json.dumps(GOOD)))
+    assert analyzer._ask_verdict("prompt", "2.4.4") == GOOD
+    assert analyzer.stats["text_fallbacks"] == 1
+
+
+def test_token_budget_tunes_from_measured_output():
+    budget = TokenBudget({"2.4.4": 300}, min_samples=20, history=20)
+    for tokens in range(80, 100):
+        budget.record("2.4.4", tokens)
+    assert budget.limit("2.4.4") == 129  # p99 of 99 tokens with 30% headroom
+
+    budget.record("2.4.4", 129, truncated=True)
+    assert budget.limit("2.4.4") == 258
+    # Only the recent history counts once output gets shorter
+    for _ in range(39):
+        budget.record("2.4.4", 10)
+    assert budget.limit("2.4.4") == MAX_TOKENS_FLOOR
+    budget.record("2.4.4", 120, truncated=True)
+    budget.record("2.4.4", 240, truncated=True)
+    budget.record("2.4.4", 480, truncated=True)
+    assert budget.limit("2.4.4") == MAX_TOKENS_CEILING
+
+
+def test_reask_invalid_and_missing_paragraphs():
+    first = {"verdicts": [dict(GOOD, paragraph=1, wcag_criterion="3.1.5", severity="minor"),
+                          dict(GOOD, paragraph=2, wcag_criterion="3.1.5", severity="high")]}
+    fixed = {"verdicts": [dict(GOOD, paragraph=2, wcag_criterion="3.1.5", severity="moderate")]}
+    client = ToolClient(first, fixed)
+    analyzer = AIAnalyzer(use_vision=False, client=client)
+    verdicts = analyzer._ask_paragraph_verdicts("prompt", 3)
+
+    assert [v.get("severity") for v in verdicts] == ["minor", "moderate", None]
+    assert verdicts[2] == {"error": "No verdict for this paragraph"}
+    # Only the paragraphs with a problem are asked again, in one call
+    reask = client.requests[1]
+    fix_tool = next(tool for tool in reask["tools"] if tool["name"] == reask["tool_choice"]["name"])
+    assert fix_tool["input_schema"]["properties"]["verdicts"]["items"]["properties"]["paragraph"]["enum"] == [2, 3]
+    assert "Paragraph 3: verdict missing" in reask["messages"][-1]["content"][0]["content"]
+    assert analyzer.stats["reasks"] == 1 and analyzer.stats["invalid_paragraphs"] == 0
+
+
+def test_reasks_do_not_tune_the_token_budget():
+    analyzer = AIAnalyzer(use_vision=False, client=ToolClient(dict(GOOD, severity="high"), {"severity": "serious"},
+                                                              output_tokens=30))
+    analyzer._ask_verdict("prompt", "2.4.4")
+
+    assert analyzer.stats["calls"] == 2 and analyzer.token_budget.samples["2.4.4"] == [30]
@@ -0,0 +1,134 @@
+import base64
+import io
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+from PIL import Image
+
+from src.vision_analyzer import (
+    ImageFetcher,
+    ImageFetchError,
+    VisionPipeline,
+    analyze_image_with_vision,
+)
+
+
+def _png(color, size=(1200, 800)):
+    image = Image.new("RGB", size, color)
+    # Left half darker so the perceptual hash has some structure
+    image.paste((0, 0, 0), (0, 0, size[0] // 2, size[1]))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+LOGO = _png((200, 30, 30))
+FILES = {
+    "/logo.png": ("image/png", LOGO),
+    "/logo-copy.png": ("image/png", LOGO),
+    "/photo.png": ("image/png", _png((30, 200, 30), size=(800, 1200))),
+    "/page.html": ("text/html", b"<html></html>"),
+    "/huge.png": ("image/png", b"0" * 4096),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in FILES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content_type, body = FILES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def image_server():
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_fetcher_enforces_type_and_size(image_server):
+    fetcher = ImageFetcher(max_bytes=2048)
+
+    with pytest.raises(ImageFetchError):
+        fetcher.fetch(image_server + "page.html")
+    with pytest.raises(ImageFetchError):
+        fetcher.fetch(image_server + "huge.png")
+
+
+def test_pipeline_downscales_and_dedupes(image_server):
+    calls = []
+
+    def describe(data, media_type):
+        image = Image.open(io.BytesIO(base64.b64decode(data)))
+        calls.append(image.size)
+        return "red company logo"
+
+    pipeline = VisionPipeline(describe=describe, max_side=256)
+
+    first = pipeline.describe_image("logo.png", base_url=image_server)
+    second = pipeline.describe_image("/logo-copy.png", base_url=image_server)
+    third = pipeline.describe_image("logo.png", base_url=image_server)
+
+    assert first["cached"] is False
+    assert second["cached"] is True and third["cached"] is True
+    assert calls == [(256, 171)]
+    assert pipeline.stats["fetched"] == 2
+    assert pipeline.stats["described"] == 1
+
+
+def test_pipeline_validate_compares_alt_text(image_server):
+    pipeline = VisionPipeline(describe=lambda data, media_type: "A red company logo on black")
+
+    good = pipeline.validate({"src": "logo.png", "alt": "Company logo"}, base_url=image_server)
+    bad = pipeline.validate({"src": "logo.png", "alt": "Students in a classroom"}, base_url=image_server)
+    missing = pipeline.validate({"src": "missing.png", "alt": "Logo"}, base_url=image_server)
+
+    assert good["issue"] is False
+    assert bad["issue"] is True
+    assert missing["issue"] is None
+    assert pipeline.stats["failed"] == 1
+
+
+def test_missing_alt_is_an_issue():
+    assert analyze_image_with_vision({"alt": ""}, "a dog")["reason"] == "Missing alt text"
+
+
+def test_decorative_images_are_not_fetched():
+    pipeline = VisionPipeline(describe=lambda data, media_type: pytest.fail("described"))
+    result = pipeline.validate({"src": "spacer.png", "alt": "", "is_decorative": True}, base_url="http://x.test/")
+    assert result["issue"] is None and pipeline.stats["fetched"] == 0
+
+
+def test_caches_are_capped(image_server):
+    pipeline = VisionPipeline(describe=lambda data, media_type: "red company logo", max_cached=1)
+    pipeline.describe_image("logo.png", base_url=image_server)
+    pipeline.describe_image("/logo-copy.png", base_url=image_server)
+    assert list(pipeline._by_url) == [image_server + "logo-copy.png"] and len(pipeline._by_hash) == 1
+
+    # A near duplicate is found through a shared band, an evicted hash is gone from every band
+    known = next(iter(pipeline._by_hash))
+    assert pipeline._similar_hash(known ^ 0b1011) == known
+    pipeline._remember_hash(~known & (2 ** 64 - 1), "other")
+    assert pipeline._similar_hash(known) is None
+    assert sum(len(hashes) for hashes in pipeline._bands.values()) == 5
+
+
+def test_bad_data_url_is_a_fetch_error():
+    with pytest.raises(ImageFetchError, match="Invalid base64"):
+        ImageFetcher().fetch("data:image/png;base64,not*base64!")
+
+    result = analyze_image_with_vision({"alt": "Puppy"}, "A young dog on grass")
+    assert result["issue"] is True and "synonyms" in result["limitation"]